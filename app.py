@@ -1,25 +1,52 @@
 from flask import Flask
 from config import Config
 from database import init_db
+from commands import register_commands
 from routes.auth import auth_bp
 from routes.tasks import tasks_bp
 from routes.shipments import shipments_bp
 from routes.main import main_bp
+from routes.api import api_bp
+from routes.admin import admin_bp
+from utils.startup import StartupProfile
+from utils.memory import configure_memory
+from utils.metrics import configure_metrics
+from utils.profiling import configure_profiling
+from utils.templating import configure_templates
+from utils.tracing import configure_tracing
 
 def create_app():
-    app = Flask(__name__)
-    app.config.from_object(Config)
-    
-    # Initialize database
-    with app.app_context():
-        init_db()
-    
+    profile = StartupProfile()
+
+    with profile.phase('config'):
+        app = Flask(__name__)
+        app.config.from_object(Config)
+        configure_templates(app)
+        configure_tracing(app)
+        configure_metrics(app)
+        configure_profiling(app)
+        configure_memory(app)
+
+    # Initialize database (a single PRAGMA read when the schema is current)
+    with profile.phase('init_db'):
+        if app.config['AUTO_MIGRATE']:
+            with app.app_context():
+                init_db()
+
     # Register blueprints
-    app.register_blueprint(main_bp)
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-    app.register_blueprint(tasks_bp, url_prefix='/tasks')
-    app.register_blueprint(shipments_bp, url_prefix='/shipments')
-    
+    with profile.phase('blueprints'):
+        app.register_blueprint(main_bp)
+        app.register_blueprint(auth_bp, url_prefix='/auth')
+        app.register_blueprint(tasks_bp, url_prefix='/tasks')
+        app.register_blueprint(shipments_bp, url_prefix='/shipments')
+        app.register_blueprint(api_bp, url_prefix='/api/v1')
+        app.register_blueprint(admin_bp, url_prefix='/admin')
+
+    # Register CLI commands
+    with profile.phase('commands'):
+        register_commands(app)
+
+    app.extensions['startup_profile'] = profile
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+"""
+Hot/cold archival of delivered and returned shipments
+
+Terminal-status shipments untouched for ARCHIVE_AFTER_DAYS move from the hot
+`shipments` table into `archive.shipments`, a separate database file attached
+to every connection. Rollups are left as they are, so archived parcels still
+count in dashboard history.
+"""
+
+import time
+from database import archive_attached, execute_query, transaction
+from models.enums import TERMINAL_STATUSES
+from models.shipment import SHIPMENT_COLUMNS
+
+def archive_batch(older_than_days, batch_size=500):
+    """Move one chunk of old terminal-status shipments to the archive; returns rows moved"""
+    if not archive_attached():
+        raise ValueError("ARCHIVE_DATABASE_PATH is not configured")
+
+    status_marks = ', '.join('?' * len(TERMINAL_STATUSES))
+    rows = execute_query(
+        f'''SELECT id FROM main.shipments
+            WHERE status IN ({status_marks}) AND updated_at < datetime('now', ?)
+            ORDER BY id LIMIT ?''',
+        (*TERMINAL_STATUSES, f'-{int(older_than_days)} days', batch_size),
+        fetch_all=True
+    )
+    ids = [row[0] for row in rows]
+    if not ids:
+        return 0
+    id_marks = ', '.join('?' * len(ids))
+
+    # Two commits, copy then delete: SQLite cannot commit two WAL databases
+    # atomically, and this order means a crash leaves a duplicate, never a loss
+    with transaction():
+        execute_query(
+            f'''INSERT OR REPLACE INTO archive.shipments ({SHIPMENT_COLUMNS})
+                SELECT {SHIPMENT_COLUMNS} FROM main.shipments WHERE id IN ({id_marks})''',
+            ids
+        )
+    with transaction():
+        # Skip rows edited since they were copied (every update bumps the
+        # version); they are retried next run
+        execute_query(
+            f'''DELETE FROM main.shipments
+                WHERE id IN ({id_marks}) AND EXISTS (
+                    SELECT 1 FROM archive.shipments AS archived
+                    WHERE archived.id = main.shipments.id
+                      AND archived.version = main.shipments.version)''',
+            ids
+        )
+    return len(ids)
+
+def archive_shipments(older_than_days, batch_size=500, pause=0.05, max_batches=None):
+    """Archive eligible shipments in chunks, pausing so requests get the write lock"""
+    moved = 0
+    batches = 0
+    while True:
+        count = archive_batch(older_than_days, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size or (max_batches and batches >= max_batches):
+            return moved
+        time.sleep(pause)
+
+def get_archive_stats():
+    """Count hot and archived shipments"""
+    hot = execute_query('SELECT COUNT(*) FROM main.shipments', fetch_one=True)[0]
+    archived = 0
+    if archive_attached():
+        archived = execute_query('SELECT COUNT(*) FROM archive.shipments', fetch_one=True)[0]
+    return {'hot': hot, 'archived': archived}
+
+def start_archiver(app):
+    """Start the periodic archival job for this process"""
+    from utils.scheduler import PeriodicTask
+
+    config = app.config
+    if not config.get('ARCHIVE_DATABASE_PATH') or not config.get('ARCHIVE_INTERVAL'):
+        return None
+
+    def run_archival():
+        with app.app_context():
+            archive_shipments(config['ARCHIVE_AFTER_DAYS'], config['ARCHIVE_BATCH_SIZE'])
+
+    return PeriodicTask('archiver', config['ARCHIVE_INTERVAL'], run_archival).start()
@@ -0,0 +1,138 @@
+"""
+Online backups and read-only reporting snapshots
+
+Both are copies of the live database made with the SQLite backup API in small
+page steps, sleeping between steps so request threads keep getting the
+database, and renamed into place only once complete.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+BACKUP_PREFIX = 'shipments-'
+BACKUP_SUFFIX = '.db'
+
+def _copy_pages(source_path, tmp_path, pages, step_sleep):
+    """Run the throttled backup into tmp_path and verify the result"""
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True, timeout=20)
+    target = sqlite3.connect(tmp_path)
+    try:
+        # Pin one read snapshot for the whole copy: with WAL, writers carry on,
+        # and the backup never has to restart because the source changed
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+
+        def throttle(status, remaining, total):
+            time.sleep(step_sleep)
+
+        source.backup(target, pages=pages, progress=throttle if step_sleep else None,
+                      sleep=max(step_sleep, 0.001))
+        source.rollback()
+
+        result = target.execute('PRAGMA quick_check').fetchone()[0]
+        if result != 'ok':
+            raise ValueError(f"Backup failed integrity check: {result}")
+        # A self-contained file, so copies can be shipped or opened immutable
+        target.execute('PRAGMA journal_mode = DELETE').fetchone()
+    finally:
+        target.close()
+        source.close()
+
+def copy_database(source_path, target_path, pages=256, step_sleep=0.005, finish=None):
+    """Copy a live database into target_path, replacing any existing file atomically
+
+    finish(tmp_path) runs on the complete copy just before it is renamed into place.
+    """
+    if source_path == ':memory:':
+        raise ValueError("Cannot back up an in-memory database")
+
+    os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+    tmp_path = f'{target_path}.partial'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        _copy_pages(source_path, tmp_path, pages, step_sleep)
+        if finish is not None:
+            finish(tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, target_path)
+    return target_path
+
+def list_backups(backup_dir, prefix=BACKUP_PREFIX):
+    """Return backup file paths, oldest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(name for name in os.listdir(backup_dir)
+                   if name.startswith(prefix) and name.endswith(BACKUP_SUFFIX))
+    return [os.path.join(backup_dir, name) for name in names]
+
+def prune_backups(backup_dir, keep, prefix=BACKUP_PREFIX):
+    """Delete all but the newest `keep` backups; returns the removed paths"""
+    backups = list_backups(backup_dir, prefix)
+    removed = backups[:-keep] if keep > 0 else backups
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def run_backup(source_path, backup_dir, keep=7, pages=256, step_sleep=0.005, prefix=BACKUP_PREFIX):
+    """Write a timestamped backup into backup_dir and apply retention"""
+    # Timestamped names sort chronologically, which list_backups relies on
+    name = f"{prefix}{datetime.utcnow():%Y%m%dT%H%M%S%fZ}{BACKUP_SUFFIX}"
+    path = copy_database(source_path, os.path.join(backup_dir, name), pages, step_sleep)
+    prune_backups(backup_dir, keep, prefix)
+    return path
+
+def backup_sources():
+    """(backup name prefix, path) for the main database and, when sharded, every shard"""
+    from flask import current_app
+    from database import shard_path, sharding_enabled
+    sources = [(BACKUP_PREFIX, current_app.config['DATABASE_PATH'])]
+    if sharding_enabled():
+        # Each file is consistent on its own; shards are not snapshotted at one instant
+        sources += [(f'shard-{index:02d}-', shard_path(index))
+                    for index in range(current_app.config['SHARD_COUNT'])]
+    return sources
+
+def run_backups(sources, backup_dir, keep=7, pages=256, step_sleep=0.005):
+    """Back up every source database; returns the new backup paths"""
+    return [run_backup(path, backup_dir, keep, pages, step_sleep, prefix)
+            for prefix, path in sources]
+
+def refresh_reporting_snapshot(source_path, snapshot_path, pages=256, step_sleep=0.005):
+    """Replace the read-only reporting snapshot with a fresh copy of the database"""
+    return copy_database(source_path, snapshot_path, pages, step_sleep)
+
+def start_maintenance(app):
+    """Start the scheduled backup and reporting snapshot jobs for this process"""
+    from utils.scheduler import PeriodicTask
+
+    config = app.config
+    db_path = config['DATABASE_PATH']
+    pages = config.get('BACKUP_PAGES_PER_STEP', 256)
+    step_sleep = config.get('BACKUP_STEP_SLEEP', 0.005)
+    tasks = []
+
+    if config.get('BACKUP_DIR') and config.get('BACKUP_INTERVAL'):
+        with app.app_context():
+            sources = backup_sources()
+        tasks.append(PeriodicTask(
+            'backup', config['BACKUP_INTERVAL'],
+            lambda: run_backups(sources, config['BACKUP_DIR'], config.get('BACKUP_RETENTION', 7),
+                                pages, step_sleep)
+        ).start())
+
+    if config.get('REPORTING_SNAPSHOT_PATH') and config.get('REPORTING_SNAPSHOT_INTERVAL'):
+        tasks.append(PeriodicTask(
+            'reporting-snapshot', config['REPORTING_SNAPSHOT_INTERVAL'],
+            lambda: refresh_reporting_snapshot(db_path, config['REPORTING_SNAPSHOT_PATH'],
+                                               pages, step_sleep),
+            run_immediately=True
+        ).start())
+
+    return tasks
@@ -0,0 +1,358 @@
+import click
+from flask.cli import AppGroup, with_appcontext
+
+db_cli = AppGroup('db', help='Schema migrations (run with AUTO_MIGRATE=0 to inspect before applying).')
+
+@db_cli.command('version')
+def db_version():
+    """Show the current and latest schema versions"""
+    from database import get_db_connection
+    from migrations import LATEST_VERSION, get_schema_version
+    click.echo(f"Schema version {get_schema_version(get_db_connection())} (latest {LATEST_VERSION})")
+
+@db_cli.command('plan')
+@click.option('--target', type=int, default=None, help='Stop at this schema version.')
+def db_plan(target):
+    """List pending migrations without applying them"""
+    from database import get_db_connection
+    from migrations import plan
+    pending = plan(get_db_connection(), target)
+    if not pending:
+        click.echo("Schema is up to date")
+    for migration in pending:
+        kind = 'online' if migration.online else 'transactional'
+        click.echo(f"{migration.version:>4}  [{kind}]  {migration.description}")
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help='Stop at this schema version.')
+@click.option('--dry-run', is_flag=True, help='Only print the migrations that would run.')
+def db_upgrade(target, dry_run):
+    """Apply pending migrations"""
+    from database import get_db_connection
+    from migrations import migrate
+    migrations = migrate(get_db_connection(), target=target, dry_run=dry_run)
+    verb = 'Would apply' if dry_run else 'Applied'
+    click.echo(f"{verb} {len(migrations)} migration(s)")
+
+@db_cli.command('checkpoint')
+@click.option('--mode', type=click.Choice(['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE']),
+              default='TRUNCATE', show_default=True)
+def db_checkpoint(mode):
+    """Checkpoint the WAL into the database file"""
+    from database import checkpoint_wal
+    busy, wal_pages, checkpointed = checkpoint_wal(mode)
+    click.echo(f"{mode}: {checkpointed}/{wal_pages} WAL pages checkpointed" + (" (busy)" if busy else ""))
+
+@db_cli.command('build-image')
+@click.argument('path', default='build/shipments-image.db')
+def db_build_image(path):
+    """Build a migrated database image with schema, indexes and reference data"""
+    from database import build_database_image
+    applied = build_database_image(path)
+    click.echo(f"Built {path} at schema version {applied[-1].version if applied else 0}")
+
+@db_cli.command('seed')
+@click.option('--users', type=int, default=100, show_default=True)
+@click.option('--shipments', type=int, default=10000, show_default=True)
+@click.option('--tasks', type=int, default=1000, show_default=True)
+@click.option('--seed', type=int, default=42, show_default=True, help='Same seed, same rows.')
+@click.option('--password', default='seedpass', show_default=True, help='Password of every seeded user.')
+@click.option('--batch-size', type=int, default=100000, show_default=True, help='Rows per transaction.')
+def db_seed(users, shipments, tasks, seed, password, batch_size):
+    """Bulk-load deterministic synthetic users, shipments and tasks"""
+    import time
+    from database import get_db_connection, sharding_enabled
+    from seed import seed_database
+    if sharding_enabled():
+        raise click.UsageError('Seeding writes to the primary database; unset SHARD_COUNT')
+    started = time.perf_counter()
+
+    def progress(table, done):
+        elapsed = time.perf_counter() - started
+        if table == 'indexes':
+            click.echo(f"  rebuilding {done} deferred indexes ({elapsed:.1f}s)")
+        else:
+            click.echo(f"  {table}: {done:,} rows ({elapsed:.1f}s)")
+
+    try:
+        counts = seed_database(get_db_connection(), users=users, shipments=shipments, tasks=tasks,
+                               seed=seed, password=password, batch_size=batch_size, progress=progress)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    click.echo(f"Seeded {total:,} rows in {elapsed:.1f}s ({total / elapsed * 60:,.0f} rows/min)")
+
+snapshot_cli = AppGroup('snapshot', help='Columnar analytics snapshots.')
+
+@snapshot_cli.command('export')
+@click.argument('path')
+@click.option('--user-id', type=int, default=None, help='Only export shipments for this user.')
+@click.option('--batch-size', type=int, default=5000, show_default=True)
+def snapshot_export(path, user_id, batch_size):
+    """Write the shipments table to a columnar snapshot file"""
+    from utils.columnar import export_snapshot
+    rows = export_snapshot(path, user_id=user_id, batch_size=batch_size)
+    click.echo(f"Wrote {rows} shipments to {path}")
+
+@snapshot_cli.command('summary')
+@click.argument('path')
+@click.option('--by', 'group_by', default='status', show_default=True,
+              help='Comma-separated group keys: status, priority, is_express, user_id, day.')
+def snapshot_summary(path, group_by):
+    """Print grouped weight and cost aggregates from a snapshot file"""
+    from utils.columnar import ColumnarSnapshot
+    keys = tuple(key.strip() for key in group_by.split(',') if key.strip())
+    with ColumnarSnapshot(path) as snapshot:
+        groups = snapshot.group_by(keys)
+    for group, summary in sorted(groups.items()):
+        label = ', '.join(str(value) for value in group)
+        click.echo(f"{label}: {summary}")
+
+rollups_cli = AppGroup('rollups', help='Time-bucketed dashboard rollups.')
+
+@rollups_cli.command('backfill')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rollups for this user.')
+def rollups_backfill(user_id):
+    """Rebuild hourly and daily rollups from the shipments table"""
+    from models.rollup import ShipmentRollup
+    ShipmentRollup.backfill(user_id)
+    click.echo("Rollups rebuilt" + (f" for user {user_id}" if user_id is not None else ""))
+
+backup_cli = AppGroup('backup', help='Online backups and the reporting snapshot.')
+
+@backup_cli.command('run')
+@click.option('--dir', 'backup_dir', default=None, help='Backup directory (default BACKUP_DIR).')
+@click.option('--keep', type=int, default=None, help='Backups to keep (default BACKUP_RETENTION).')
+def backup_run(backup_dir, keep):
+    """Copy the live database (and any shard files) into timestamped backup files"""
+    from flask import current_app
+    from backup import backup_sources, run_backups
+    config = current_app.config
+    paths = run_backups(backup_sources(), backup_dir or config['BACKUP_DIR'],
+                        keep=config['BACKUP_RETENTION'] if keep is None else keep,
+                        pages=config['BACKUP_PAGES_PER_STEP'], step_sleep=config['BACKUP_STEP_SLEEP'])
+    for path in paths:
+        click.echo(f"Backed up to {path}")
+
+@backup_cli.command('list')
+@click.option('--dir', 'backup_dir', default=None, help='Backup directory (default BACKUP_DIR).')
+def backup_list(backup_dir):
+    """List backups, oldest first"""
+    import os
+    from flask import current_app
+    from backup import list_backups
+    for path in list_backups(backup_dir or current_app.config['BACKUP_DIR']):
+        click.echo(f"{os.path.getsize(path) / 1e6:>10.1f} MB  {path}")
+
+@backup_cli.command('snapshot')
+def backup_snapshot():
+    """Refresh the read-only reporting snapshot now"""
+    from flask import current_app
+    from backup import refresh_reporting_snapshot
+    config = current_app.config
+    if not config.get('REPORTING_SNAPSHOT_PATH'):
+        raise click.UsageError('REPORTING_SNAPSHOT_PATH is not set')
+    path = refresh_reporting_snapshot(config['DATABASE_PATH'], config['REPORTING_SNAPSHOT_PATH'],
+                                      pages=config['BACKUP_PAGES_PER_STEP'],
+                                      step_sleep=config['BACKUP_STEP_SLEEP'])
+    click.echo(f"Reporting snapshot refreshed at {path}")
+
+archive_cli = AppGroup('archive', help='Hot/cold archival of delivered and returned shipments.')
+
+@archive_cli.command('run')
+@click.option('--older-than-days', type=int, default=None, help='Default ARCHIVE_AFTER_DAYS.')
+@click.option('--batch-size', type=int, default=None, help='Default ARCHIVE_BATCH_SIZE.')
+def archive_run(older_than_days, batch_size):
+    """Move old terminal-status shipments into the archive database"""
+    from flask import current_app
+    from archive import archive_shipments
+    config = current_app.config
+    try:
+        moved = archive_shipments(
+            config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days,
+            batch_size or config['ARCHIVE_BATCH_SIZE'])
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Archived {moved} shipments")
+
+@archive_cli.command('stats')
+def archive_stats():
+    """Show hot and archived shipment counts"""
+    from archive import get_archive_stats
+    stats = get_archive_stats()
+    click.echo(f"hot: {stats['hot']}  archived: {stats['archived']}")
+
+replica_cli = AppGroup('replica', help='Read replicas of the primary database.')
+
+@replica_cli.command('ship')
+@click.option('--follow', is_flag=True, help='Keep shipping every REPLICATION_INTERVAL seconds.')
+def replica_ship(follow):
+    """Bring every REPLICA_PATHS follower up to date with the primary"""
+    import time
+    from flask import current_app
+    from replication import ReplicaShipper
+    config = current_app.config
+    if not config['REPLICA_PATHS']:
+        raise click.UsageError('REPLICA_PATHS is not set')
+    shipper = ReplicaShipper(config['DATABASE_PATH'], config['REPLICA_PATHS'],
+                             config['REPLICA_HEARTBEAT_INTERVAL'], config['BACKUP_PAGES_PER_STEP'],
+                             config['BACKUP_STEP_SLEEP'])
+    shipper.ship(force=True)
+    click.echo(f"Shipped to {len(config['REPLICA_PATHS'])} followers")
+    try:
+        while follow:
+            time.sleep(config['REPLICATION_INTERVAL'])
+            shipper.ship()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shipper.close()
+
+@replica_cli.command('detach')
+def replica_detach():
+    """Drop the primary's change log and triggers once no follower is shipped any more"""
+    from database import get_db_connection
+    from replication import remove_change_capture
+    remove_change_capture(get_db_connection())
+    click.echo('Replica change capture removed')
+
+@replica_cli.command('status')
+def replica_status_command():
+    """Show each follower's replication lag"""
+    from flask import current_app
+    from replication import replica_status
+    for replica in replica_status(current_app.config['REPLICA_PATHS']):
+        lag = 'never shipped' if replica['lag'] is None else f"{replica['lag']:.1f}s"
+        click.echo(f"{lag:>14}  {replica['path']}")
+
+shards_cli = AppGroup('shards', help='User-sharded shipment storage.')
+
+@shards_cli.command('status')
+@click.option('--recent', type=int, default=0, help='Also list the newest N shipments across shards.')
+def shards_status(recent):
+    """Show users, shipments and file size per shard"""
+    from sharding import recent_shipments, shard_stats
+    try:
+        stats = shard_stats()
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"{'shard':>5} {'users':>7} {'active':>7} {'shipments':>10} {'size KiB':>9}")
+    for row in stats:
+        click.echo(f"{row['shard']:>5} {row['users']:>7} {row['active_users']:>7} "
+                   f"{row['shipments']:>10} {row['bytes'] // 1024:>9}")
+    for shipment in recent_shipments(recent) if recent else []:
+        click.echo(f"{shipment.created_at}  {shipment.tracking_number}  user {shipment.user_id}")
+
+@shards_cli.command('move')
+@click.argument('user_id', type=int)
+@click.argument('shard', type=int)
+def shards_move(user_id, shard):
+    """Move one user's shipments to another shard"""
+    from sharding import move_user
+    try:
+        moved = move_user(user_id, shard)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Moved {moved} shipments of user {user_id} to shard {shard}")
+
+@shards_cli.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Only print the planned moves.')
+def shards_rebalance(dry_run):
+    """Move users between shards to even out shipments per shard"""
+    from sharding import rebalance
+    try:
+        moves = rebalance(dry_run=dry_run)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for user_id, source, target in moves:
+        click.echo(f"user {user_id}: shard {source} -> {target}")
+    click.echo(f"{'Planned' if dry_run else 'Applied'} {len(moves)} moves")
+
+@shards_cli.command('import-legacy')
+def shards_import_legacy():
+    """Move shipments from the unsharded database into the shards"""
+    from sharding import import_legacy
+    try:
+        moved = import_legacy()
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Moved {moved} shipments into shards")
+
+startup_cli = AppGroup('startup', help='Startup latency profiling.')
+
+@startup_cli.command('profile')
+@click.option('--top', type=int, default=15, show_default=True, help='Number of modules to list.')
+@click.option('--project-only', is_flag=True, help='Only list modules from this repository.')
+def startup_profile(top, project_only):
+    """Report per-module import cost and per-phase create_app timing"""
+    from flask import current_app
+    from utils.startup import profile_imports
+    project_root = current_app.root_path
+    modules = profile_imports('import app', cwd=project_root)
+    total_us = next((cumulative for name, _, cumulative, depth in modules
+                     if name == 'app' and depth == 0), 0)
+    if project_only:
+        project_packages = ('app', 'commands', 'config', 'database', 'migrations',
+                            'models', 'routes', 'utils')
+        modules = [module for module in modules if module[0].split('.')[0] in project_packages]
+
+    click.echo(f"Importing app: {total_us / 1000:.1f} ms")
+    click.echo(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us, _ in sorted(modules, key=lambda m: m[2], reverse=True)[:top]:
+        click.echo(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    profile = current_app.extensions['startup_profile']
+    click.echo(f"\ncreate_app: {profile.total_ms:.1f} ms")
+    for name, ms in profile.phases:
+        click.echo(f"{ms:>14.1f}  {name}")
+
+@startup_cli.command('warm-templates')
+def startup_warm_templates():
+    """Compile every template into the bytecode cache (e.g. at image build time)"""
+    import time
+    from flask import current_app
+    from utils.templating import warm_templates
+    start = time.perf_counter()
+    count = warm_templates(current_app)
+    click.echo(f"Compiled {count} templates in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+@click.command('serve')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', type=int, default=8000, show_default=True)
+@click.option('--workers', type=int, default=None, help='Worker processes (default SERVER_WORKERS).')
+@click.option('--threads', type=int, default=None, help='Request threads per worker (default SERVER_THREADS).')
+@click.option('--max-requests', type=int, default=None,
+              help='Recycle a worker after this many requests (default SERVER_MAX_REQUESTS).')
+@click.option('--max-requests-jitter', type=int, default=None,
+              help='Random extra requests per worker, so workers do not recycle together.')
+@click.option('--graceful-timeout', type=int, default=None,
+              help='Seconds to wait for in-flight requests on shutdown or reload.')
+@with_appcontext
+def serve(host, port, workers, threads, max_requests, max_requests_jitter, graceful_timeout):
+    """Run the pre-forking production server (SIGHUP reloads, SIGTERM stops)"""
+    from flask import current_app
+    from server import PreforkServer
+    config = current_app.config
+    PreforkServer(
+        current_app._get_current_object(), host=host, port=port,
+        workers=workers or config['SERVER_WORKERS'],
+        threads=threads or config['SERVER_THREADS'],
+        max_requests=config['SERVER_MAX_REQUESTS'] if max_requests is None else max_requests,
+        max_requests_jitter=(config['SERVER_MAX_REQUESTS_JITTER']
+                             if max_requests_jitter is None else max_requests_jitter),
+        graceful_timeout=(config['SERVER_GRACEFUL_TIMEOUT']
+                          if graceful_timeout is None else graceful_timeout),
+    ).run()
+
+def register_commands(app):
+    """Attach CLI command groups to the Flask app"""
+    app.cli.add_command(db_cli)
+    app.cli.add_command(snapshot_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(backup_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(shards_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(startup_cli)
+    app.cli.add_command(serve)
@@ -4,12 +4,158 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     # Database configuration
     DATABASE_PATH = os.environ.get('DATABASE_PATH', 'shipments.db')
+    # Prebuilt image (`flask db build-image`) cloned into DATABASE_PATH when it is missing
+    DATABASE_IMAGE_PATH = os.environ.get('DATABASE_IMAGE_PATH')
     ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE', '4'))
+    # List totals are counted exactly up to this many rows and estimated beyond
+    PAGINATION_EXACT_COUNT_LIMIT = int(os.environ.get('PAGINATION_EXACT_COUNT_LIMIT', '10000'))
+    
+    # Export settings
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+    
+    # Apply pending schema migrations in create_app (set AUTO_MIGRATE=0 to
+    # inspect them first with `flask db plan`)
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') == '1'
+    
+    # `flask serve` pre-forking server settings
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', '2'))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', '4'))
+    # Recycle a worker after this many requests (0 = never), plus up to the jitter
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', '0'))
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', '0'))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', '30'))
+    
+    # Online backups (`flask backup run`, or every BACKUP_INTERVAL seconds in
+    # `flask serve`); the newest BACKUP_RETENTION files are kept
+    BACKUP_DIR = os.environ.get('BACKUP_DIR', 'backups')
+    BACKUP_INTERVAL = float(os.environ.get('BACKUP_INTERVAL', '0'))
+    BACKUP_RETENTION = int(os.environ.get('BACKUP_RETENTION', '7'))
+    # Pages copied per backup step and the pause between steps
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', '256'))
+    BACKUP_STEP_SLEEP = float(os.environ.get('BACKUP_STEP_SLEEP', '0.005'))
+    
+    # Read-only copy of the database that exports and columnar snapshots read from,
+    # refreshed every REPORTING_SNAPSHOT_INTERVAL seconds, so they can lag by up to
+    # that long (unset = read the primary)
+    REPORTING_SNAPSHOT_PATH = os.environ.get('REPORTING_SNAPSHOT_PATH')
+    REPORTING_SNAPSHOT_INTERVAL = float(os.environ.get('REPORTING_SNAPSHOT_INTERVAL', '300'))
+    
+    # Hot/cold archival: delivered and returned shipments untouched for
+    # ARCHIVE_AFTER_DAYS move to this attached database (unset = no archive),
+    # ARCHIVE_BATCH_SIZE rows per transaction, every ARCHIVE_INTERVAL seconds in `flask serve`
+    ARCHIVE_DATABASE_PATH = os.environ.get('ARCHIVE_DATABASE_PATH')
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '500'))
+    ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', '3600'))
+    
+    # User-sharded storage: each user's shipments and rollups live in one of
+    # SHARD_COUNT files under SHARD_DIR (0 = everything in DATABASE_PATH).
+    # Users, tasks, the shard directory and the shipment index stay global
+    SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '0'))
+    SHARD_DIR = os.environ.get('SHARD_DIR', 'shards')
+    
+    # Read replicas: follower files (comma-separated, may sit on a shared mount)
+    # refreshed every REPLICATION_INTERVAL seconds with the rows changed since the
+    # last ship, and heartbeat-stamped at least every REPLICA_HEARTBEAT_INTERVAL.
+    # Only a shipper start, a schema change or a seed copies the whole primary,
+    # paced by BACKUP_PAGES_PER_STEP / BACKUP_STEP_SLEEP; `flask replica detach`
+    # drops the change log once replicas are retired. Request reads use a follower no older
+    # than REPLICA_MAX_LAG that already has the client's last write
+    REPLICA_PATHS = [path for path in os.environ.get('REPLICA_PATHS', '').split(',') if path]
+    REPLICATION_INTERVAL = float(os.environ.get('REPLICATION_INTERVAL', '5'))
+    REPLICA_HEARTBEAT_INTERVAL = float(os.environ.get('REPLICA_HEARTBEAT_INTERVAL', '15'))
+    REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', '30'))
+    
+    # Idempotency keys: responses replayed to retries for IDEMPOTENCY_TTL seconds,
+    # the most recent IDEMPOTENCY_CACHE_SIZE kept in memory per process
+    IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+    IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '1024'))
+    IDEMPOTENCY_PURGE_INTERVAL = float(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL', '3600'))
+    
+    # JSON logs go through a LOG_QUEUE_SIZE record queue to a writer thread (records
+    # are dropped, not waited on, when it is full). TRACE_SAMPLE_RATE of requests
+    # also log a trace of their model calls, SQL and template renders
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.01'))
+    TRACE_MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', '200'))
+    
+    # Prometheus /metrics: prefork workers write snapshots to METRICS_DIR every
+    # METRICS_FLUSH_INTERVAL seconds (flask serve picks a temp dir when unset)
+    # and a scrape sums them; database totals are recounted every
+    # METRICS_DB_STATS_INTERVAL seconds
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+    METRICS_DB_STATS_INTERVAL = float(os.environ.get('METRICS_DB_STATS_INTERVAL', '60'))
+    # Scrapers must come from METRICS_ALLOWED_IPS or send `Authorization: Bearer
+    # METRICS_TOKEN`; by default only local scrapes are answered
+    METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip]
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Ids of the users allowed on /admin pages and to request profiles (none by
+    # default; ids rather than names, which a new account could take over)
+    ADMIN_USER_IDS = [int(user_id) for user_id in os.environ.get('ADMIN_USER_IDS', '').split(',') if user_id.strip()]
+    
+    # Profiling: PROFILE_SAMPLE_RATE of requests (and any admin request sending
+    # PROFILE_HEADER: 1) are run under cProfile, the newest PROFILE_MAX_FILES kept in
+    # PROFILE_DIR. PROFILE_SAMPLER_INTERVAL > 0 starts a stack sampler whose folded
+    # stacks are written there every PROFILE_SAMPLER_FLUSH_INTERVAL seconds
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'X-Profile')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '200'))
+    PROFILE_SAMPLER_INTERVAL = float(os.environ.get('PROFILE_SAMPLER_INTERVAL', '0'))
+    PROFILE_SAMPLER_FLUSH_INTERVAL = float(os.environ.get('PROFILE_SAMPLER_FLUSH_INTERVAL', '30'))
+    
+    # Memory diagnostics: tracemalloc runs from startup with MEMORY_TRACEMALLOC_FRAMES
+    # > 0 (or when started from /admin/memory); while it runs MEMORY_SAMPLE_RATE of
+    # requests record their allocation peak. Object counts for /metrics are
+    # refreshed every MEMORY_GAUGE_INTERVAL seconds (0 disables)
+    MEMORY_SNAPSHOT_DIR = os.environ.get('MEMORY_SNAPSHOT_DIR', 'memory-snapshots')
+    MEMORY_TRACEMALLOC_FRAMES = int(os.environ.get('MEMORY_TRACEMALLOC_FRAMES', '0'))
+    MEMORY_SAMPLE_RATE = float(os.environ.get('MEMORY_SAMPLE_RATE', '0.1'))
+    MEMORY_GAUGE_INTERVAL = float(os.environ.get('MEMORY_GAUGE_INTERVAL', '60'))
+    
+    # Rendered `{% cache %}` fragments kept per process (0 disables), and the
+    # compiled-template cache (unset directory = a private temp dir)
+    TEMPLATE_FRAGMENT_CACHE_SIZE = int(os.environ.get('TEMPLATE_FRAGMENT_CACHE_SIZE', '2048'))
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', '1') == '1'
+    TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR')
     
     # SQLite specific settings
     SQLITE_TIMEOUT = 20
     SQLITE_CHECK_SAME_THREAD = False
     
+    # Named PRAGMA sets applied to every new connection (SQLITE_PROFILE picks one):
+    #   durable     fsync on every commit, small cache, no mmap
+    #   balanced    fsync at checkpoints only (WAL + NORMAL is still crash-safe), mmap reads
+    #   throughput  no fsync at all (an OS crash can lose or corrupt recent commits),
+    #               large cache and mmap, rare inline checkpoints (the background
+    #               scheduler does the rest off the request path)
+    SQLITE_PROFILES = {
+        'durable': {
+            'journal_mode': 'WAL', 'synchronous': 'FULL', 'cache_size': -8000,
+            'mmap_size': 0, 'temp_store': 'DEFAULT', 'busy_timeout': 20000,
+            'wal_autocheckpoint': 1000,
+        },
+        'balanced': {
+            'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -32000,
+            'mmap_size': 256 * 1024 * 1024, 'temp_store': 'MEMORY', 'busy_timeout': 20000,
+            'wal_autocheckpoint': 1000,
+        },
+        'throughput': {
+            'journal_mode': 'WAL', 'synchronous': 'OFF', 'cache_size': -128000,
+            'mmap_size': 1024 * 1024 * 1024, 'temp_store': 'MEMORY', 'busy_timeout': 5000,
+            'wal_autocheckpoint': 10000,
+        },
+    }
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'balanced')
+    
+    # Background WAL checkpoints in `flask serve` workers (0 disables): a PASSIVE
+    # checkpoint every interval, and a TRUNCATE once the WAL passes the page limit
+    SQLITE_CHECKPOINT_INTERVAL = float(os.environ.get('SQLITE_CHECKPOINT_INTERVAL', '30'))
+    SQLITE_CHECKPOINT_TRUNCATE_PAGES = int(os.environ.get('SQLITE_CHECKPOINT_TRUNCATE_PAGES', '4000'))
+    
 class DevelopmentConfig(Config):
     DEBUG = True
     DATABASE_PATH = 'shipments.db'  # Local file for development
@@ -17,6 +163,7 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     DEBUG = False
     DATABASE_PATH = '/tmp/shipments.db'  # Serverless temp directory
+    DATABASE_IMAGE_PATH = os.environ.get('DATABASE_IMAGE_PATH', 'build/shipments-image.db')
     
 class TestingConfig(Config):
     TESTING = True
@@ -1,14 +1,38 @@
 import sqlite3
-from werkzeug.security import generate_password_hash
-from flask import current_app, g
+from models.enums import decode_status
+from flask import current_app, g, has_request_context, session
+from contextlib import contextmanager
+from utils.metrics import inc, observe
+from utils.tracing import log, sql_span
 import os
+import random
+import tempfile
 import threading
+import time
 
 # Thread-local storage for database connections
 _local = threading.local()
 
-def get_db_connection():
-    """Get database connection with proper configuration"""
+def _connect(kind, *args, **kwargs):
+    """Open a connection, counted by kind for the /metrics connection gauge"""
+    connection = sqlite3.connect(*args, **kwargs)
+    inc('db_connections_opened_total', kind=kind)
+    return connection
+
+def _close(kind, connection):
+    connection.close()
+    inc('db_connections_closed_total', kind=kind)
+
+class ConcurrentModificationError(ValueError):
+    """A compare-and-swap update found the row changed (or deleted) since it was read"""
+
+def get_db_connection(shard_key=None):
+    """Get database connection with proper configuration
+
+    With sharding enabled, a shard_key (user id) selects that user's shard file.
+    """
+    if shard_key is not None and sharding_enabled():
+        return _resolve(shard_key)[1]
     if not hasattr(_local, 'connection') or _local.connection is None:
         db_path = current_app.config.get('DATABASE_PATH', 'shipments.db')
         
@@ -16,8 +40,8 @@ def get_db_connection():
         if db_path != ':memory:':
             os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
         
-        _local.connection = sqlite3.connect(
-            db_path,
+        _local.connection = _connect(
+            'primary', db_path,
             timeout=current_app.config.get('SQLITE_TIMEOUT', 20),
             check_same_thread=current_app.config.get('SQLITE_CHECK_SAME_THREAD', False)
         )
@@ -25,133 +49,539 @@ def get_db_connection():
         
         # Enable foreign key constraints
         _local.connection.execute('PRAGMA foreign_keys = ON')
+        apply_sqlite_profile(_local.connection, get_sqlite_profile())
+        
+        if archive_attached():
+            _attach_archive(_local.connection, current_app.config['ARCHIVE_DATABASE_PATH'])
         
     return _local.connection
 
+# Cold storage for archived shipments: same columns as shipments plus archived_at.
+# Ids are kept (shipments uses AUTOINCREMENT, so they are never reused)
+ARCHIVE_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS archive.shipments
+       (id INTEGER PRIMARY KEY,
+        tracking_number TEXT UNIQUE NOT NULL,
+        sender_name TEXT NOT NULL,
+        sender_address TEXT NOT NULL,
+        recipient_name TEXT NOT NULL,
+        recipient_address TEXT NOT NULL,
+        package_description TEXT,
+        weight REAL DEFAULT 0.0,
+        status INTEGER NOT NULL,
+        priority INTEGER NOT NULL,
+        is_express BOOLEAN NOT NULL DEFAULT 0,
+        shipping_cost REAL DEFAULT 0.0,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP,
+        user_id INTEGER NOT NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 1)''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_archive_user_created ON shipments(user_id, created_at)',
+)
+
+def archive_attached():
+    """Check whether shipments are archived to an attached cold database"""
+    # Archival works on the single-file layout; shard files are not archived
+    return bool(current_app.config.get('ARCHIVE_DATABASE_PATH')) and not sharding_enabled()
+
+def sharding_enabled():
+    """Check whether shipments are spread over SHARD_COUNT per-user shard files"""
+    return current_app.config.get('SHARD_COUNT', 0) > 0
+
+def shard_path(index):
+    """Path of one shard database file"""
+    return os.path.join(current_app.config.get('SHARD_DIR', 'shards'), f'shard-{index:02d}.db')
+
+def get_shard_connection(index):
+    """Get this thread's connection to one shard file, migrating it on first open"""
+    from migrations import migrate
+    
+    shards = getattr(_local, 'shards', None)
+    if shards is None:
+        shards = _local.shards = {}
+    if shards.get(index) is None:
+        path = shard_path(index)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = _connect(
+            'shard', path,
+            timeout=current_app.config.get('SQLITE_TIMEOUT', 20),
+            check_same_thread=current_app.config.get('SQLITE_CHECK_SAME_THREAD', False)
+        )
+        connection.row_factory = sqlite3.Row
+        # users live in the global database, so user_id cannot be enforced here
+        connection.execute('PRAGMA foreign_keys = OFF')
+        apply_sqlite_profile(connection, get_sqlite_profile())
+        migrate(connection, online_pause=0, shard=True)
+        shards[index] = connection
+    return shards[index]
+
+def shard_connections():
+    """This thread's connection to every shard, in shard order"""
+    return [get_shard_connection(index) for index in range(current_app.config['SHARD_COUNT'])]
+
+def shard_for_user(user_id):
+    """Look up the shard holding a user's shipments, placing new users by user_id modulo"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT shard FROM shard_directory WHERE user_id = ?', (user_id,)).fetchone()
+    if row is not None:
+        return row[0]
+    
+    conn.execute('INSERT OR IGNORE INTO shard_directory (user_id, shard) VALUES (?, ?)',
+                 (user_id, user_id % current_app.config['SHARD_COUNT']))
+    if not _in_transaction():
+        conn.commit()
+    # Re-read: a concurrent placement of the same user wins over ours
+    return conn.execute('SELECT shard FROM shard_directory WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+def _resolve(shard_key=None):
+    """Return (transaction key, connection) for the global database or a user's shard"""
+    if shard_key is None or not sharding_enabled():
+        return None, get_db_connection()
+    # Inside transaction(shard_key) stay on the shard that was locked and fenced
+    pinned = getattr(_local, 'pinned', None) or {}
+    index = pinned.get(shard_key)
+    if index is None:
+        index = shard_for_user(shard_key)
+    return index, get_shard_connection(index)
+
+def fan_out(query, params=None):
+    """Run a read on every shard (or just the database when unsharded); returns row lists"""
+    if not sharding_enabled():
+        return [get_db_connection().execute(query, params or ()).fetchall()]
+    return [conn.execute(query, params or ()).fetchall() for conn in shard_connections()]
+
+def _attach_archive(conn, archive_path, read_only=False):
+    """Attach the archive database to a connection as schema `archive`"""
+    if read_only:
+        conn.execute('ATTACH DATABASE ? AS archive', (f'file:{archive_path}?mode=ro',))
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+    conn.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+    # Archives created before row versions existed
+    columns = {row[1] for row in conn.execute('PRAGMA archive.table_info(shipments)')}
+    if 'version' not in columns:
+        conn.execute('ALTER TABLE archive.shipments ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    conn.commit()
+
+def get_sqlite_profile(name=None):
+    """Return the PRAGMA settings of a named profile (default: SQLITE_PROFILE)"""
+    profiles = current_app.config.get('SQLITE_PROFILES', {})
+    name = name or current_app.config.get('SQLITE_PROFILE')
+    if not name:
+        return {}
+    if name not in profiles:
+        raise ValueError(f"Unknown SQLite profile: {name}")
+    return profiles[name]
+
+def apply_sqlite_profile(conn, settings):
+    """Apply a profile's PRAGMAs to an open connection"""
+    for pragma, value in settings.items():
+        # Values come from config, not user input; PRAGMA does not take parameters
+        conn.execute(f'PRAGMA {pragma} = {value}').fetchall()
+
+def get_reporting_connection():
+    """Get a read-only connection to the reporting snapshot, or the primary if there is none"""
+    snapshot_path = current_app.config.get('REPORTING_SNAPSHOT_PATH')
+    if not snapshot_path:
+        return get_db_connection()
+    try:
+        identity = (snapshot_path, os.stat(snapshot_path).st_ino)
+    except FileNotFoundError:
+        return get_db_connection()
+    
+    # Refreshes replace the file, so a new inode means a newer snapshot to reopen
+    cached = getattr(_local, 'reporting', None)
+    if cached is None or cached[0] != identity:
+        if cached is not None:
+            _close('reporting', cached[1])
+        # immutable: the file is never written in place, so skip locking entirely
+        connection = _connect(
+            'reporting', f'file:{snapshot_path}?mode=ro&immutable=1', uri=True,
+            check_same_thread=current_app.config.get('SQLITE_CHECK_SAME_THREAD', False)
+        )
+        connection.row_factory = sqlite3.Row
+        if archive_attached():
+            # The archive is live (not a snapshot); a parcel archived since the last
+            # refresh is in both, and reads let the hot copy win
+            _attach_archive(connection, current_app.config['ARCHIVE_DATABASE_PATH'], read_only=True)
+        _local.reporting = (identity, connection)
+    return _local.reporting[1]
+
+def _open_replica(path):
+    """Return (connection, heartbeat) for a follower file, reopening it after each rebuild"""
+    from replication import read_heartbeat
+    
+    replicas = getattr(_local, 'replicas', None)
+    if replicas is None:
+        replicas = _local.replicas = {}
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+    
+    cached = replicas.get(path)
+    if cached is None or cached[0] != inode:
+        if cached is not None:
+            _close('replica', cached[1])
+        # The shipper applies changes in place and replaces the file by rename on a rebuild
+        connection = _connect(
+            'replica', f'file:{path}?mode=ro', uri=True, timeout=5,
+            check_same_thread=current_app.config.get('SQLITE_CHECK_SAME_THREAD', False)
+        )
+        connection.row_factory = sqlite3.Row
+        if archive_attached():
+            _attach_archive(connection, current_app.config['ARCHIVE_DATABASE_PATH'], read_only=True)
+        replicas[path] = cached = (inode, connection)
+    return cached[1], read_heartbeat(cached[1]) or 0.0
+
+def get_replica_connection():
+    """Pick a follower that is fresh enough for this request's reads, or None for the primary"""
+    paths = current_app.config.get('REPLICA_PATHS')
+    # Replicas cover request reads of the single-file layout
+    if not paths or not has_request_context() or sharding_enabled():
+        return None
+    
+    # Read-your-writes: only followers copied after this client's last commit qualify
+    oldest = max(session.get('last_write_at', 0.0),
+                 time.time() - current_app.config.get('REPLICA_MAX_LAG', 30))
+    candidates = []
+    for path in paths:
+        replica = _open_replica(path)
+        if replica is not None and replica[1] >= oldest:
+            candidates.append(replica[0])
+    return random.choice(candidates) if candidates else None
+
+def _note_write():
+    """Remember when this client last committed, so its next reads can see it"""
+    if has_request_context() and current_app.config.get('REPLICA_PATHS'):
+        session['last_write_at'] = time.time()
+
 def close_db_connection():
     """Close database connection"""
     if hasattr(_local, 'connection') and _local.connection is not None:
-        _local.connection.close()
+        _close('primary', _local.connection)
         _local.connection = None
+    if getattr(_local, 'reporting', None) is not None:
+        _close('reporting', _local.reporting[1])
+        _local.reporting = None
+    for connection in (getattr(_local, 'shards', None) or {}).values():
+        _close('shard', connection)
+    _local.shards = {}
+    for _, connection in (getattr(_local, 'replicas', None) or {}).values():
+        _close('replica', connection)
+    _local.replicas = {}
 
-def init_db():
-    """Initialize database tables and create default data"""
-    conn = get_db_connection()
-    c = conn.cursor()
+def enable_wal():
+    """Switch the database to WAL so several worker processes can read while one writes"""
+    db_path = current_app.config.get('DATABASE_PATH', 'shipments.db')
+    if db_path == ':memory:':
+        return 'memory'
+    # journal_mode=WAL is persistent, so setting it once before forking covers every worker
+    mode = get_db_connection().execute('PRAGMA journal_mode = WAL').fetchone()[0]
+    if sharding_enabled():
+        for conn in shard_connections():
+            conn.execute('PRAGMA journal_mode = WAL').fetchone()
+    close_db_connection()
+    return mode
+
+def _all_connections():
+    """The global connection followed by every shard connection"""
+    return [get_db_connection()] + (shard_connections() if sharding_enabled() else [])
+
+def checkpoint_wal(mode='PASSIVE', conn=None):
+    """Run a WAL checkpoint; returns (busy, wal_pages, checkpointed_pages)"""
+    if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+        raise ValueError(f"Unsupported checkpoint mode: {mode}")
+    conn = conn or get_db_connection()
+    return tuple(conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+
+def start_checkpointer(app):
+    """Start a background thread that keeps the WAL file from growing unbounded"""
+    from utils.scheduler import PeriodicTask
+    
+    interval = app.config.get('SQLITE_CHECKPOINT_INTERVAL', 0)
+    if not interval:
+        return None
+    truncate_pages = app.config.get('SQLITE_CHECKPOINT_TRUNCATE_PAGES', 4000)
+    
+    def run_checkpoint():
+        with app.app_context():
+            for conn in _all_connections():
+                busy, wal_pages, _ = checkpoint_wal('PASSIVE', conn)
+                # PASSIVE never blocks writers but cannot shrink the file; once the WAL
+                # is large, wait for readers to finish and reset it to zero bytes
+                if wal_pages > truncate_pages:
+                    checkpoint_wal('TRUNCATE', conn)
     
+    return PeriodicTask('wal-checkpoint', interval, run_checkpoint).start()
+
+# Connections inherited across fork() are kept referenced but never used or
+# closed: closing one in the child could checkpoint or delete the parent's WAL
+_inherited_connections = []
+
+def _forget_inherited_connection():
+    """Give a forked child a clean thread-local connection state"""
+    connection = getattr(_local, 'connection', None)
+    if connection is not None:
+        _inherited_connections.append(connection)
+        _local.connection = None
+    if getattr(_local, 'reporting', None) is not None:
+        _inherited_connections.append(_local.reporting[1])
+        _local.reporting = None
+    _inherited_connections.extend((getattr(_local, 'shards', None) or {}).values())
+    _local.shards = {}
+    _inherited_connections.extend(cached[1] for cached in (getattr(_local, 'replicas', None) or {}).values())
+    _local.replicas = {}
+    _local.transaction_depth = {}
+    _local.pinned = {}
+
+os.register_at_fork(after_in_child=_forget_inherited_connection)
+
+def _transaction_depths():
+    """Open transaction() depth per connection key (None is the global database)"""
+    depths = getattr(_local, 'transaction_depth', None)
+    if depths is None:
+        depths = _local.transaction_depth = {}
+    return depths
+
+def _in_transaction(key=None):
+    """Check whether the current thread is inside a transaction() block on a connection"""
+    return _transaction_depths().get(key, 0) > 0
+
+def _rollback_hooks():
+    """Callbacks to run if the open transaction() on a connection key rolls back"""
+    hooks = getattr(_local, 'rollback_hooks', None)
+    if hooks is None:
+        hooks = _local.rollback_hooks = {}
+    return hooks
+
+def on_rollback(callback, shard_key=None):
+    """Undo a write made outside the open transaction() if that transaction rolls back
+
+    Does nothing when no transaction() is open on shard_key's connection.
+    """
+    key, _ = _resolve(shard_key)
+    if _in_transaction(key):
+        _rollback_hooks().setdefault(key, []).append(callback)
+
+def _begin_on_user_shard(user_id):
+    """Take the write lock on a user's shard, following the user if a rebalance moved them"""
+    while True:
+        index = shard_for_user(user_id)
+        conn = get_shard_connection(index)
+        conn.execute('BEGIN IMMEDIATE')
+        # move_user holds the source shard's write lock until the user's rows are
+        # gone from it, so a placement re-read under our lock is authoritative
+        if shard_for_user(user_id) == index:
+            return index, conn
+        conn.rollback()
+
+@contextmanager
+def transaction(shard_key=None):
+    """Group several execute_query calls into one atomic commit
+
+    With sharding enabled, pass the user id whose shard the writes go to.
+    """
+    key, conn = _resolve(shard_key)
+    depths = _transaction_depths()
+    pinned = getattr(_local, 'pinned', None)
+    if pinned is None:
+        pinned = _local.pinned = {}
+    if key is not None and not depths.get(key):
+        key, conn = _begin_on_user_shard(shard_key)
+        pinned[shard_key] = key
+    depths[key] = depths.get(key, 0) + 1
     try:
-        # Create users table
-        c.execute('''CREATE TABLE IF NOT EXISTS users
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      username TEXT UNIQUE NOT NULL,
-                      password_hash TEXT NOT NULL,
-                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        # Create shipments table with proper constraints
-        c.execute('''CREATE TABLE IF NOT EXISTS shipments
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      tracking_number TEXT UNIQUE NOT NULL,
-                      sender_name TEXT NOT NULL,
-                      sender_address TEXT NOT NULL,
-                      recipient_name TEXT NOT NULL,
-                      recipient_address TEXT NOT NULL,
-                      package_description TEXT,
-                      weight REAL DEFAULT 0.0,
-                      status TEXT NOT NULL DEFAULT 'pending',
-                      priority TEXT NOT NULL DEFAULT 'standard',
-                      is_express BOOLEAN NOT NULL DEFAULT 0,
-                      shipping_cost REAL DEFAULT 0.0,
-                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                      user_id INTEGER NOT NULL,
-                      FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
-                      CHECK (weight >= 0),
-                      CHECK (shipping_cost >= 0),
-                      CHECK (status IN ('pending', 'picked_up', 'in_transit', 'out_for_delivery', 'delivered', 'returned')),
-                      CHECK (priority IN ('standard', 'priority', 'urgent')))''')
-        
-        # Create indexes for better performance
-        c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_user_id ON shipments(user_id)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_tracking_number ON shipments(tracking_number)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_status ON shipments(status)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_created_at ON shipments(created_at)')
-        
-        # Create default admin user if not exists
-        c.execute("SELECT id FROM users WHERE username = ?", ('admin',))
-        admin_user = c.fetchone()
-        
-        if not admin_user:
-            password_hash = generate_password_hash('admin123')
-            c.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", 
-                     ('admin', password_hash))
-            admin_id = c.lastrowid
-            
-            # Create sample shipments for demo
-            sample_shipments = [
-                ('SHP12345678', 'John Doe', '123 Main St, New York, NY 10001', 
-                 'Jane Smith', '456 Oak Ave, Los Angeles, CA 90210', 
-                 'Electronics - Laptop Computer', 2.5, 'in_transit', 'urgent', 1, 18.0),
-                ('SHP87654321', 'ABC Company', '789 Business Blvd, Chicago, IL 60601',
-                 'XYZ Corp', '321 Corporate Dr, Miami, FL 33101',
-                 'Important Legal Documents', 0.5, 'delivered', 'priority', 0, 7.5),
-                ('SHP11223344', 'Sarah Wilson', '555 Pine St, Seattle, WA 98101',
-                 'Mike Johnson', '777 Elm Dr, Austin, TX 78701',
-                 'Books and Educational Materials', 1.2, 'pending', 'standard', 0, 7.4),
-                ('SHP99887766', 'Tech Solutions Inc', '999 Innovation Way, San Francisco, CA 94105',
-                 'Global Enterprises', '111 Commerce Plaza, Boston, MA 02101',
-                 'Server Hardware Components', 15.0, 'picked_up', 'urgent', 1, 54.0),
-                ('SHP55443322', 'Maria Garcia', '222 Sunset Blvd, Phoenix, AZ 85001',
-                 'Robert Chen', '888 Mountain View, Denver, CO 80201',
-                 'Handmade Crafts and Artwork', 0.8, 'out_for_delivery', 'standard', 0, 6.6)
-            ]
-            
-            for shipment in sample_shipments:
-                c.execute('''INSERT INTO shipments 
-                            (tracking_number, sender_name, sender_address, recipient_name, 
-                             recipient_address, package_description, weight, status, priority, 
-                             is_express, shipping_cost, user_id)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
-                         shipment + (admin_id,))
-        
+        yield conn
+    except Exception:
+        depths[key] -= 1
+        if depths[key] == 0:
+            pinned.pop(shard_key, None)
+            conn.rollback()
+            for callback in _rollback_hooks().pop(key, ()):
+                callback()
+        raise
+    else:
+        depths[key] -= 1
+        if depths[key] == 0:
+            pinned.pop(shard_key, None)
+            _rollback_hooks().pop(key, None)
+            wrote = conn.in_transaction
+            conn.commit()
+            if key is None and wrote:
+                _note_write()
+
+def _clone_file(source_path, target_path):
+    """Copy a file with a copy-on-write reflink where the filesystem supports it"""
+    import fcntl
+    FICLONE = 0x40049409  # Linux ioctl; supported on btrfs, XFS and overlayfs on those
+    with open(source_path, 'rb') as src, open(target_path, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def restore_database_image(image_path, db_path):
+    """Clone a prebuilt database image into place if the target database is missing"""
+    if db_path == ':memory:' or os.path.exists(db_path) or not image_path:
+        return False
+    if not os.path.exists(image_path):
+        print(f"Database image not found: {image_path}")
+        return False
+    
+    directory = os.path.dirname(os.path.abspath(db_path))
+    os.makedirs(directory, exist_ok=True)
+    # A private temp file per process: workers starting together each clone their own copy
+    fd, tmp_path = tempfile.mkstemp(prefix=f'{os.path.basename(db_path)}.', suffix='.restoring', dir=directory)
+    os.close(fd)
+    try:
+        # mkstemp creates the file 0600; give the database the image's permissions
+        os.chmod(tmp_path, os.stat(image_path).st_mode & 0o777)
+        try:
+            _clone_file(image_path, tmp_path)
+        except (ImportError, OSError):
+            # No reflink support: fall back to a page copy through the backup API
+            open(tmp_path, 'wb').close()
+            source = sqlite3.connect(f'file:{image_path}?mode=ro', uri=True)
+            target = sqlite3.connect(tmp_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+        # link() never replaces an existing file, so the first worker's copy wins and
+        # nobody swaps out a database another worker has already opened and migrated
+        try:
+            os.link(tmp_path, db_path)
+        except FileExistsError:
+            return False
+    finally:
+        os.remove(tmp_path)
+    return True
+
+def build_database_image(image_path):
+    """Build a fully migrated, compacted database image for fast cold starts"""
+    from migrations import migrate
+    
+    tmp_path = f'{image_path}.building'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    os.makedirs(os.path.dirname(os.path.abspath(image_path)), exist_ok=True)
+    
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('PRAGMA foreign_keys = ON')
+        applied = migrate(conn, online_pause=0)
+        conn.execute('ANALYZE')
         conn.commit()
-        print("Database initialized successfully!")
-        
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    os.replace(tmp_path, image_path)
+    return applied
+
+def init_db():
+    """Bring the database schema up to date via versioned migrations"""
+    from migrations import migrate
+    
+    try:
+        restore_database_image(current_app.config.get('DATABASE_IMAGE_PATH'),
+                               current_app.config.get('DATABASE_PATH', 'shipments.db'))
+        applied = migrate(get_db_connection())
+        if applied:
+            print("Database initialized successfully!")
     except Exception as e:
-        conn.rollback()
         print(f"Error initializing database: {e}")
         raise
 
-def execute_query(query, params=None, fetch_one=False, fetch_all=False):
-    """Execute database query with proper connection handling and error management"""
-    conn = get_db_connection()
+def execute_query(query, params=None, fetch_one=False, fetch_all=False, shard_key=None,
+                  rowcount=False):
+    """Execute database query with proper connection handling and error management
+
+    Writes return the last inserted rowid, or the number of changed rows with rowcount=True.
+    """
+    key, conn = _resolve(shard_key)
+    if (fetch_one or fetch_all) and key is None and not _in_transaction():
+        # Plain reads may be served by a follower; writes and transactions stay on the primary
+        conn = get_replica_connection() or conn
+    started = time.perf_counter()
     try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        if fetch_one:
-            result = cursor.fetchone()
-            return result
-        elif fetch_all:
-            result = cursor.fetchall()
-            return result
-        else:
-            conn.commit()
-            return cursor.lastrowid
+        with sql_span(query, key):
+            if params:
+                cursor = conn.execute(query, params)
+            else:
+                cursor = conn.execute(query)
+            
+            if fetch_one:
+                result = cursor.fetchone()
+                return result
+            elif fetch_all:
+                result = cursor.fetchall()
+                return result
+            else:
+                # Inside transaction() the outermost block commits
+                if not _in_transaction(key):
+                    conn.commit()
+                    if key is None:
+                        _note_write()
+                return cursor.rowcount if rowcount else cursor.lastrowid
             
     except sqlite3.IntegrityError as e:
-        conn.rollback()
-        print(f"Database integrity error: {e}")
+        if not _in_transaction(key):
+            conn.rollback()
+        log.error("Database integrity error: %s", e)
         raise ValueError(f"Database constraint violation: {e}")
     except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Database error: {e}")
+        if not _in_transaction(key):
+            conn.rollback()
+        log.error("Database error: %s", e)
         raise
     except Exception as e:
-        conn.rollback()
-        print(f"Unexpected error: {e}")
+        if not _in_transaction(key):
+            conn.rollback()
+        log.error("Unexpected error: %s", e)
         raise
+    finally:
+        kind = 'read' if fetch_one or fetch_all else 'write'
+        inc('db_queries_total', kind=kind)
+        observe('db_query_duration_seconds', time.perf_counter() - started, kind=kind)
+
+def iter_query(query, params=None, batch_size=500, raw=False, reporting=False, shard_key=None):
+    """Yield rows from a query in fetchmany batches without loading the full result"""
+    if shard_key is not None and sharding_enabled():
+        # Shards have no reporting snapshot; each one holds only a slice of the load
+        conn = _resolve(shard_key)[1]
+    elif reporting:
+        # Reporting reads go to the snapshot so long scans never contend with writers
+        conn = get_reporting_connection()
+    elif not _in_transaction():
+        conn = get_replica_connection() or get_db_connection()
+    else:
+        conn = get_db_connection()
+    yield from _iter_cursor(conn, query, params, batch_size, raw)
+
+def iter_shards(query, params=None, batch_size=500, raw=False):
+    """One iter_query-style row stream per shard (or just the database when unsharded)"""
+    if not sharding_enabled():
+        return [_iter_cursor(get_db_connection(), query, params, batch_size, raw)]
+    return [_iter_cursor(conn, query, params, batch_size, raw) for conn in shard_connections()]
+
+def _iter_cursor(conn, query, params, batch_size, raw):
+    """Yield a query's rows from one connection in fetchmany batches"""
+    cursor = conn.cursor()
+    if raw:
+        # Plain tuples skip sqlite3.Row construction for positional consumers
+        cursor.row_factory = None
+    cursor.execute(query, params or ())
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        cursor.close()
 
 def get_db_stats():
     """Get database statistics for monitoring"""
@@ -163,23 +593,23 @@ def get_db_stats():
         c.execute("SELECT COUNT(*) FROM users")
         user_count = c.fetchone()[0]
         
-        c.execute("SELECT COUNT(*) FROM shipments")
-        shipment_count = c.fetchone()[0]
+        # Shipments may be spread over shards; sum each shard's counts
+        shipment_count = sum(rows[0][0] for rows in fan_out("SELECT COUNT(*) FROM shipments"))
         
         # Get shipment status distribution
-        c.execute("""SELECT status, COUNT(*) as count 
-                     FROM shipments 
-                     GROUP BY status 
-                     ORDER BY count DESC""")
-        status_distribution = c.fetchall()
+        status_counts = {}
+        for rows in fan_out("SELECT status, COUNT(*) FROM shipments GROUP BY status"):
+            for code, count in rows:
+                status_counts[code] = status_counts.get(code, 0) + count
+        status_distribution = sorted(status_counts.items(), key=lambda item: item[1], reverse=True)
         
         return {
             'users': user_count,
             'shipments': shipment_count,
-            'status_distribution': dict(status_distribution)
+            'status_distribution': {decode_status(code): count for code, count in status_distribution}
         }
     except Exception as e:
-        print(f"Error getting database stats: {e}")
+        log.error("Error getting database stats: %s", e)
         return None
 
 # Flask teardown handler
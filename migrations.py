@@ -0,0 +1,346 @@
+"""
+Versioned schema migrations tracked with PRAGMA user_version.
+
+Each migration runs in its own BEGIN IMMEDIATE transaction together with the
+user_version bump, so a failed migration leaves the schema untouched. An
+up-to-date database costs a single PRAGMA read at startup.
+
+Online migrations (index builds on large tables) run one statement per short
+transaction instead, so request threads can take the write lock between
+steps. Their statements must be idempotent (IF NOT EXISTS) because an
+interrupted run is simply repeated.
+"""
+
+from models.enums import (ShipmentStatus, ShipmentPriority, PRIORITY_COST_MULTIPLIERS,
+                          encode_status, encode_priority)
+from models.rollup import ShipmentRollup
+import time
+
+class Migration:
+    def __init__(self, version, description, apply=None, statements=(), online=False,
+                 primary_only=False):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.statements = tuple(statements)
+        self.online = online
+        # Global data (users, seed rows, shard directory) that shard files skip
+        self.primary_only = primary_only
+
+    def __repr__(self):
+        kind = 'online' if self.online else 'transactional'
+        return f"<Migration {self.version} ({kind}): {self.description}>"
+
+SHIPMENTS_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS {table}
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          tracking_number TEXT UNIQUE NOT NULL,
+                          sender_name TEXT NOT NULL,
+                          sender_address TEXT NOT NULL,
+                          recipient_name TEXT NOT NULL,
+                          recipient_address TEXT NOT NULL,
+                          package_description TEXT,
+                          weight REAL DEFAULT 0.0,
+                          status INTEGER NOT NULL DEFAULT 0 REFERENCES shipment_statuses (code),
+                          priority INTEGER NOT NULL DEFAULT 0 REFERENCES shipment_priorities (code),
+                          is_express BOOLEAN NOT NULL DEFAULT 0,
+                          shipping_cost REAL DEFAULT 0.0,
+                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                          updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                          user_id INTEGER NOT NULL,
+                          FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                          CHECK (weight >= 0),
+                          CHECK (shipping_cost >= 0))'''
+
+ROLLUP_TABLE_NAMES = ('shipment_rollups_hourly', 'shipment_rollups_daily')
+
+ROLLUP_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS {table}
+                      (user_id INTEGER NOT NULL,
+                       bucket TEXT NOT NULL,
+                       status INTEGER NOT NULL,
+                       priority INTEGER NOT NULL,
+                       is_express BOOLEAN NOT NULL,
+                       shipment_count INTEGER NOT NULL DEFAULT 0,
+                       total_weight REAL NOT NULL DEFAULT 0.0,
+                       total_cost REAL NOT NULL DEFAULT 0.0,
+                       PRIMARY KEY (user_id, bucket, status, priority, is_express),
+                       FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE)
+                      WITHOUT ROWID'''
+
+def _create_baseline(c):
+    """Users and shipments as originally created by init_db"""
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  username TEXT UNIQUE NOT NULL,
+                  password_hash TEXT NOT NULL,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS shipments
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  tracking_number TEXT UNIQUE NOT NULL,
+                  sender_name TEXT NOT NULL,
+                  sender_address TEXT NOT NULL,
+                  recipient_name TEXT NOT NULL,
+                  recipient_address TEXT NOT NULL,
+                  package_description TEXT,
+                  weight REAL DEFAULT 0.0,
+                  status TEXT NOT NULL DEFAULT 'pending',
+                  priority TEXT NOT NULL DEFAULT 'standard',
+                  is_express BOOLEAN NOT NULL DEFAULT 0,
+                  shipping_cost REAL DEFAULT 0.0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  user_id INTEGER NOT NULL,
+                  FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                  CHECK (weight >= 0),
+                  CHECK (shipping_cost >= 0),
+                  CHECK (status IN ('pending', 'picked_up', 'in_transit', 'out_for_delivery', 'delivered', 'returned')),
+                  CHECK (priority IN ('standard', 'priority', 'urgent')))''')
+
+    _create_shipment_indexes(c)
+
+def _create_shipment_indexes(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_user_id ON shipments(user_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_tracking_number ON shipments(tracking_number)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_status ON shipments(status)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shipments_created_at ON shipments(created_at)')
+
+def _convert_enum_codes(c):
+    """Add status/priority lookup tables and store shipments with integer codes"""
+    c.execute('''CREATE TABLE IF NOT EXISTS shipment_statuses
+                 (code INTEGER PRIMARY KEY,
+                  name TEXT UNIQUE NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS shipment_priorities
+                 (code INTEGER PRIMARY KEY,
+                  name TEXT UNIQUE NOT NULL,
+                  cost_multiplier REAL NOT NULL)''')
+    c.executemany('INSERT OR REPLACE INTO shipment_statuses (code, name) VALUES (?, ?)',
+                  [(status.value, status.label) for status in ShipmentStatus])
+    c.executemany('INSERT OR REPLACE INTO shipment_priorities (code, name, cost_multiplier) VALUES (?, ?, ?)',
+                  [(priority.value, priority.label, PRIORITY_COST_MULTIPLIERS[priority])
+                   for priority in ShipmentPriority])
+
+    c.execute("SELECT type FROM pragma_table_info('shipments') WHERE name = 'status'")
+    if c.fetchone()[0].upper() != 'TEXT':
+        return
+
+    # Standard SQLite table rebuild: copy into the new shape, then swap names
+    c.execute(SHIPMENTS_TABLE_SQL.format(table='shipments_migrated'))
+    c.execute('''INSERT INTO shipments_migrated
+                 (id, tracking_number, sender_name, sender_address, recipient_name,
+                  recipient_address, package_description, weight, status, priority,
+                  is_express, shipping_cost, created_at, updated_at, user_id)
+                 SELECT s.id, s.tracking_number, s.sender_name, s.sender_address, s.recipient_name,
+                        s.recipient_address, s.package_description, s.weight, st.code, pr.code,
+                        s.is_express, s.shipping_cost, s.created_at, s.updated_at, s.user_id
+                 FROM shipments s
+                 JOIN shipment_statuses st ON st.name = s.status
+                 JOIN shipment_priorities pr ON pr.name = s.priority''')
+    c.execute('DROP TABLE shipments')
+    c.execute('ALTER TABLE shipments_migrated RENAME TO shipments')
+    _create_shipment_indexes(c)
+
+    # Rollups built before this migration are keyed by text labels
+    for rollup_table in ROLLUP_TABLE_NAMES:
+        c.execute(f'DROP TABLE IF EXISTS {rollup_table}')
+
+def _create_rollups(c):
+    """Time-bucketed rollup tables, backfilled from existing shipments"""
+    for rollup_table in ROLLUP_TABLE_NAMES:
+        c.execute(ROLLUP_TABLE_SQL.format(table=rollup_table))
+    for query, params in ShipmentRollup.backfill_statements():
+        c.execute(query, params)
+
+def _create_tasks(c):
+    """Tasks table used by models/task.py"""
+    c.execute('''CREATE TABLE IF NOT EXISTS tasks
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  title TEXT NOT NULL,
+                  description TEXT,
+                  status TEXT NOT NULL DEFAULT 'pending',
+                  priority TEXT NOT NULL DEFAULT 'medium',
+                  is_urgent BOOLEAN NOT NULL DEFAULT 0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  user_id INTEGER NOT NULL,
+                  FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks(user_id, created_at)')
+
+DEMO_SHIPMENTS = [
+    ('SHP12345678', 'John Doe', '123 Main St, New York, NY 10001',
+     'Jane Smith', '456 Oak Ave, Los Angeles, CA 90210',
+     'Electronics - Laptop Computer', 2.5, 'in_transit', 'urgent', 1, 18.0),
+    ('SHP87654321', 'ABC Company', '789 Business Blvd, Chicago, IL 60601',
+     'XYZ Corp', '321 Corporate Dr, Miami, FL 33101',
+     'Important Legal Documents', 0.5, 'delivered', 'priority', 0, 7.5),
+    ('SHP11223344', 'Sarah Wilson', '555 Pine St, Seattle, WA 98101',
+     'Mike Johnson', '777 Elm Dr, Austin, TX 78701',
+     'Books and Educational Materials', 1.2, 'pending', 'standard', 0, 7.4),
+    ('SHP99887766', 'Tech Solutions Inc', '999 Innovation Way, San Francisco, CA 94105',
+     'Global Enterprises', '111 Commerce Plaza, Boston, MA 02101',
+     'Server Hardware Components', 15.0, 'picked_up', 'urgent', 1, 54.0),
+    ('SHP55443322', 'Maria Garcia', '222 Sunset Blvd, Phoenix, AZ 85001',
+     'Robert Chen', '888 Mountain View, Denver, CO 80201',
+     'Handmade Crafts and Artwork', 0.8, 'out_for_delivery', 'standard', 0, 6.6)
+]
+
+def _seed_demo_data(c):
+    """Default admin user and demo shipments, skipped if an admin already exists"""
+    c.execute("SELECT id FROM users WHERE username = ?", ('admin',))
+    if c.fetchone():
+        return
+
+    # Imported here so an up-to-date startup never loads the hashing code
+    from werkzeug.security import generate_password_hash
+    c.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+              ('admin', generate_password_hash('admin123')))
+    admin_id = c.lastrowid
+
+    c.executemany('''INSERT INTO shipments
+                     (tracking_number, sender_name, sender_address, recipient_name,
+                      recipient_address, package_description, weight, status, priority,
+                      is_express, shipping_cost, user_id)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                  [shipment[:7] + (encode_status(shipment[7]), encode_priority(shipment[8]))
+                   + shipment[9:] + (admin_id,) for shipment in DEMO_SHIPMENTS])
+
+    for query, params in ShipmentRollup.backfill_statements(admin_id):
+        c.execute(query, params)
+
+def _create_shard_directory(c):
+    """Global tables for user-sharded storage: user placement and the shipment index"""
+    c.execute('''CREATE TABLE IF NOT EXISTS shard_directory
+                 (user_id INTEGER PRIMARY KEY,
+                  shard INTEGER NOT NULL)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shard_directory_shard ON shard_directory(shard)')
+    # Allocates globally unique shipment ids and maps tracking numbers to users
+    c.execute('''CREATE TABLE IF NOT EXISTS shipment_index
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  tracking_number TEXT UNIQUE NOT NULL,
+                  user_id INTEGER NOT NULL)''')
+    # Start above every id the unsharded shipments table has handed out
+    c.execute('''INSERT INTO sqlite_sequence (name, seq)
+                 SELECT 'shipment_index', COALESCE(MAX(seq), 0) FROM sqlite_sequence
+                 WHERE name = 'shipments'
+                   AND NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'shipment_index')''')
+
+def _create_replication_heartbeat(c):
+    """Single-row table stamped by the replica shipper; followers read their copy to measure lag"""
+    c.execute('''CREATE TABLE IF NOT EXISTS replication_heartbeat
+                 (id INTEGER PRIMARY KEY CHECK (id = 1),
+                  written_at REAL NOT NULL)''')
+
+def _add_row_versions(c):
+    """Version counters bumped by every update, for compare-and-swap saves"""
+    for table in ('shipments', 'tasks'):
+        c.execute(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+
+def _create_idempotency_keys(c):
+    """Stored responses of POSTs that carried an Idempotency-Key, per user and endpoint"""
+    c.execute('''CREATE TABLE IF NOT EXISTS idempotency_keys
+                 (user_id INTEGER NOT NULL,
+                  endpoint TEXT NOT NULL,
+                  idempotency_key TEXT NOT NULL,
+                  request_hash TEXT NOT NULL,
+                  status_code INTEGER,
+                  headers TEXT,
+                  body BLOB,
+                  resource_id INTEGER,
+                  created_at REAL NOT NULL,
+                  PRIMARY KEY (user_id, endpoint, idempotency_key)) WITHOUT ROWID''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at)')
+
+MIGRATIONS = [
+    Migration(1, 'Create users and shipments tables', _create_baseline),
+    Migration(2, 'Store shipment status/priority as integer enum codes', _convert_enum_codes),
+    Migration(3, 'Create hourly and daily shipment rollups', _create_rollups),
+    Migration(4, 'Create tasks table', _create_tasks),
+    Migration(5, 'Seed default admin user and demo shipments', _seed_demo_data, primary_only=True),
+    Migration(6, 'Index shipments by (user_id, created_at) for list pages', statements=[
+        'CREATE INDEX IF NOT EXISTS idx_shipments_user_created ON shipments(user_id, created_at)',
+    ], online=True),
+    Migration(7, 'Create shard directory and global shipment index', _create_shard_directory,
+              primary_only=True),
+    Migration(8, 'Create replication heartbeat', _create_replication_heartbeat, primary_only=True),
+    Migration(9, 'Add row versions for optimistic concurrency', _add_row_versions),
+    Migration(10, 'Create idempotency keys', _create_idempotency_keys, primary_only=True),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+def get_schema_version(conn):
+    """Read the schema version stored in the database header"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def plan(conn, target=None):
+    """List the migrations that would run to reach the target version"""
+    current = get_schema_version(conn)
+    target = LATEST_VERSION if target is None else target
+    return [migration for migration in MIGRATIONS if current < migration.version <= target]
+
+def _apply_transactional(conn, migration, shard=False):
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        # Another process may have applied it while we waited for the lock
+        if get_schema_version(conn) >= migration.version:
+            c.execute('ROLLBACK')
+            return False
+        if not (shard and migration.primary_only):
+            migration.apply(c)
+        violations = c.execute('PRAGMA foreign_key_check').fetchall()
+        if violations:
+            raise ValueError(f"Migration {migration.version} left foreign key violations: {violations[:5]}")
+        c.execute(f'PRAGMA user_version = {migration.version}')
+        c.execute('COMMIT')
+        return True
+    except Exception:
+        c.execute('ROLLBACK')
+        raise
+
+def _apply_online(conn, migration, pause):
+    c = conn.cursor()
+    for statement in migration.statements:
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            c.execute(statement)
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+        # Give queued writers a chance at the lock between steps
+        time.sleep(pause)
+
+    c.execute('BEGIN IMMEDIATE')
+    if get_schema_version(conn) < migration.version:
+        c.execute(f'PRAGMA user_version = {migration.version}')
+    c.execute('COMMIT')
+    return True
+
+def migrate(conn, target=None, dry_run=False, online_pause=0.05, shard=False):
+    """Apply pending migrations in order; returns the migrations that were (or would be) run
+
+    Shard files (shard=True) get the same versions, with primary_only steps recorded but skipped.
+    """
+    pending = plan(conn, target)
+    if not pending or dry_run:
+        return pending
+
+    conn.commit()
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    previous_isolation = conn.isolation_level
+    # Manual transaction control so DDL runs inside our BEGIN/COMMIT
+    conn.isolation_level = None
+    try:
+        # Table rebuilds need foreign keys off; this PRAGMA is a no-op inside a transaction
+        conn.execute('PRAGMA foreign_keys = OFF')
+        for migration in pending:
+            if migration.online:
+                applied = _apply_online(conn, migration, online_pause)
+            else:
+                applied = _apply_transactional(conn, migration, shard)
+            if applied and not shard:
+                print(f"Applied migration {migration.version}: {migration.description}")
+    finally:
+        conn.execute(f'PRAGMA foreign_keys = {foreign_keys}')
+        conn.isolation_level = previous_isolation
+    return pending
@@ -0,0 +1,56 @@
+from enum import IntEnum
+
+class ShipmentStatus(IntEnum):
+    """Shipment lifecycle states, stored as small integer codes"""
+    PENDING = 0
+    PICKED_UP = 1
+    IN_TRANSIT = 2
+    OUT_FOR_DELIVERY = 3
+    DELIVERED = 4
+    RETURNED = 5
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+class ShipmentPriority(IntEnum):
+    """Shipment service levels, stored as small integer codes"""
+    STANDARD = 0
+    PRIORITY = 1
+    URGENT = 2
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+# Final states; only these shipments are ever moved to the archive
+TERMINAL_STATUSES = (ShipmentStatus.DELIVERED, ShipmentStatus.RETURNED)
+
+# Cost multiplier applied by the pricing code for each priority
+PRIORITY_COST_MULTIPLIERS = {
+    ShipmentPriority.STANDARD: 1.0,
+    ShipmentPriority.PRIORITY: 1.5,
+    ShipmentPriority.URGENT: 2.0,
+}
+
+# Code-indexed label tuples and label -> code maps for hot-path lookups
+STATUS_NAMES = tuple(status.label for status in ShipmentStatus)
+PRIORITY_NAMES = tuple(priority.label for priority in ShipmentPriority)
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITY_NAMES)}
+
+def encode_status(name):
+    """Return the integer code for a status label, or None if unknown"""
+    return STATUS_CODES.get(name)
+
+def encode_priority(name):
+    """Return the integer code for a priority label, or None if unknown"""
+    return PRIORITY_CODES.get(name)
+
+def decode_status(code):
+    """Return the label for a status code"""
+    return STATUS_NAMES[code]
+
+def decode_priority(code):
+    """Return the label for a priority code"""
+    return PRIORITY_NAMES[code]
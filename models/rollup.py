@@ -0,0 +1,163 @@
+from database import archive_attached, execute_query, shard_connections, sharding_enabled, transaction
+from datetime import datetime, timedelta
+from models.enums import STATUS_NAMES, encode_priority, encode_status
+
+# Granularity -> (rollup table, strftime format for the bucket)
+ROLLUP_TABLES = {
+    'hour': ('shipment_rollups_hourly', '%Y-%m-%d %H:00'),
+    'day': ('shipment_rollups_daily', '%Y-%m-%d'),
+}
+
+ROLLUP_KEY = 'user_id, bucket, status, priority, is_express'
+
+# Columns a rollup is built from; hot rows plus archived ones, where a row caught
+# mid-archival exists in both and the hot copy wins (as in SHIPMENTS_WITH_ARCHIVE)
+_SOURCE_COLUMNS = 'id, user_id, created_at, status, priority, is_express, weight, shipping_cost'
+_SOURCE_WITH_ARCHIVE = f'''(SELECT {_SOURCE_COLUMNS} FROM main.shipments
+    UNION ALL
+    SELECT {_SOURCE_COLUMNS} FROM archive.shipments AS archived
+    WHERE NOT EXISTS (SELECT 1 FROM main.shipments AS hot WHERE hot.id = archived.id))'''
+
+class ShipmentRollup:
+    """Incrementally maintained time-bucketed shipment counts, weight and revenue"""
+
+    @staticmethod
+    def _apply(where, params, sign, user_id):
+        """Add (sign=1) or remove (sign=-1) the current state of a user's matching shipments"""
+        for table, bucket_format in ROLLUP_TABLES.values():
+            execute_query(
+                f'''INSERT INTO {table} ({ROLLUP_KEY}, shipment_count, total_weight, total_cost)
+                    SELECT user_id, strftime('{bucket_format}', created_at), status, priority,
+                           is_express, ?, ? * COALESCE(weight, 0), ? * COALESCE(shipping_cost, 0)
+                    FROM shipments WHERE {where}
+                    ON CONFLICT ({ROLLUP_KEY}) DO UPDATE SET
+                        shipment_count = shipment_count + excluded.shipment_count,
+                        total_weight = total_weight + excluded.total_weight,
+                        total_cost = total_cost + excluded.total_cost''',
+                [sign, sign, sign] + list(params),
+                shard_key=user_id
+            )
+
+    @staticmethod
+    def add_shipment(shipment_id, user_id):
+        """Count a shipment's current row into the rollups"""
+        ShipmentRollup._apply('id = ? AND user_id = ?', (shipment_id, user_id), 1, user_id)
+
+    @staticmethod
+    def remove_shipment(shipment_id, user_id):
+        """Subtract a shipment's current row from the rollups"""
+        ShipmentRollup._apply('id = ? AND user_id = ?', (shipment_id, user_id), -1, user_id)
+
+    @staticmethod
+    def backfill_statements(user_id=None, user_range=None, include_archive=False):
+        """Return the (sql, params) pairs that rebuild rollups from shipments
+
+        Limited to one user, or to an inclusive (first, last) range of user ids.
+        include_archive counts archived shipments too, so a rebuild keeps their history.
+        """
+        source = _SOURCE_WITH_ARCHIVE if include_archive else 'shipments'
+        if user_id is not None:
+            where, params = 'WHERE user_id = ?', (user_id,)
+        elif user_range is not None:
+            where, params = 'WHERE user_id BETWEEN ? AND ?', tuple(user_range)
+        else:
+            where, params = '', ()
+        statements = []
+        for table, bucket_format in ROLLUP_TABLES.values():
+            statements.append((f'DELETE FROM {table} {where}', params))
+            statements.append((
+                f'''INSERT INTO {table} ({ROLLUP_KEY}, shipment_count, total_weight, total_cost)
+                    SELECT user_id, strftime('{bucket_format}', created_at) AS rollup_bucket,
+                           status, priority, is_express, COUNT(*),
+                           SUM(COALESCE(weight, 0)), SUM(COALESCE(shipping_cost, 0))
+                    FROM {source} {where}
+                    GROUP BY user_id, rollup_bucket, status, priority, is_express''',
+                params
+            ))
+        return statements
+
+    @staticmethod
+    def backfill(user_id=None):
+        """Rebuild rollups from hot and archived shipments, for one user or everyone"""
+        if user_id is None and sharding_enabled():
+            # Each shard rebuilds the rollups of the users it holds
+            for conn in shard_connections():
+                with conn:
+                    for query, params in ShipmentRollup.backfill_statements():
+                        conn.execute(query, params)
+            return
+        with transaction(user_id):
+            for query, params in ShipmentRollup.backfill_statements(
+                    user_id, include_archive=archive_attached()):
+                execute_query(query, params, shard_key=user_id)
+
+    @staticmethod
+    def get_time_series(user_id, granularity='day', days=90, status_filter=None):
+        """Get per-bucket, per-status volume and revenue for the last N days"""
+        if granularity not in ROLLUP_TABLES:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+
+        table, bucket_format = ROLLUP_TABLES[granularity]
+        since = (datetime.utcnow() - timedelta(days=days)).strftime(bucket_format)
+        query = f'''SELECT bucket, status, SUM(shipment_count) AS count,
+                           SUM(total_weight) AS total_weight, SUM(total_cost) AS total_cost
+                    FROM {table}
+                    WHERE user_id = ? AND bucket >= ?'''
+        params = [user_id, since]
+
+        if status_filter:
+            query += ' AND status = ?'
+            status_code = encode_status(status_filter)
+            params.append(-1 if status_code is None else status_code)
+
+        query += ' GROUP BY bucket, status HAVING SUM(shipment_count) > 0 ORDER BY bucket, status'
+        rows = execute_query(query, params, fetch_all=True, shard_key=user_id)
+        return [{
+            'bucket': row['bucket'],
+            'status': STATUS_NAMES[row['status']],
+            'count': row['count'],
+            'total_weight': round(row['total_weight'], 2),
+            'total_cost': round(row['total_cost'], 2),
+        } for row in rows]
+
+    @staticmethod
+    def get_status_totals(user_id):
+        """Get all-time per-status totals from the daily rollups"""
+        rows = execute_query(
+            '''SELECT status, SUM(shipment_count) AS count, SUM(total_cost) AS total_cost
+               FROM shipment_rollups_daily
+               WHERE user_id = ?
+               GROUP BY status
+               HAVING SUM(shipment_count) > 0
+               ORDER BY count DESC''',
+            (user_id,),
+            fetch_all=True,
+            shard_key=user_id
+        )
+        return [{
+            'status': STATUS_NAMES[row['status']],
+            'count': row['count'],
+            'avg_cost': row['total_cost'] / row['count'],
+            'total_cost': row['total_cost'],
+        } for row in rows]
+
+    @staticmethod
+    def count_matching(user_id, status_filter=None, priority_filter=None, express_filter=None):
+        """Count a user's shipments matching list filters from the daily rollups
+
+        Rollups keep archived parcels, so this is an estimate for hot-only listings.
+        """
+        query = 'SELECT COALESCE(SUM(shipment_count), 0) FROM shipment_rollups_daily WHERE user_id = ?'
+        params = [user_id]
+        if status_filter:
+            query += ' AND status = ?'
+            status_code = encode_status(status_filter)
+            params.append(-1 if status_code is None else status_code)
+        if priority_filter:
+            query += ' AND priority = ?'
+            priority_code = encode_priority(priority_filter)
+            params.append(-1 if priority_code is None else priority_code)
+        if express_filter:
+            query += ' AND is_express = ?'
+            params.append(1 if express_filter == 'true' else 0)
+        return execute_query(query, params, fetch_one=True, shard_key=user_id)[0]
@@ -1,15 +1,50 @@
-from database import execute_query
+from database import (ConcurrentModificationError, archive_attached, execute_query, iter_query,
+                      on_rollback, sharding_enabled, transaction)
+from models.enums import (ShipmentPriority, PRIORITY_COST_MULTIPLIERS, STATUS_NAMES, PRIORITY_NAMES,
+                          TERMINAL_STATUSES, encode_status, encode_priority)
+from models.rollup import ShipmentRollup
+from utils.helpers import Pagination, count_results, estimate_from_sample
+from utils.tracing import log, traced
 from datetime import datetime
-import math
+from functools import partial
 import random
 import string
 import sqlite3
+from operator import attrgetter
+
+# Column order shared by SELECT lists, the positional constructor and serialization
+SHIPMENT_FIELDS = (
+    'id', 'tracking_number', 'sender_name', 'sender_address', 'recipient_name',
+    'recipient_address', 'package_description', 'weight', 'status', 'priority',
+    'is_express', 'shipping_cost', 'created_at', 'updated_at', 'user_id', 'version'
+)
+SHIPMENT_COLUMNS = ', '.join(SHIPMENT_FIELDS)
+
+# Columns an update may write, with their position in a SHIPMENT_COLUMNS row
+UPDATABLE_FIELDS = {name: SHIPMENT_FIELDS.index(name) for name in (
+    'tracking_number', 'sender_name', 'sender_address', 'recipient_name', 'recipient_address',
+    'package_description', 'weight', 'status', 'priority', 'is_express', 'shipping_cost'
+)}
+# Changing any of these moves the shipment between rollup buckets
+ROLLUP_FIELDS = frozenset(('weight', 'status', 'priority', 'is_express', 'shipping_cost'))
+
+# Hot rows plus archived ones; a row caught mid-archival exists in both and the hot copy wins
+SHIPMENTS_WITH_ARCHIVE = f'''(SELECT {SHIPMENT_COLUMNS} FROM main.shipments
+    UNION ALL
+    SELECT {SHIPMENT_COLUMNS} FROM archive.shipments AS archived
+    WHERE NOT EXISTS (SELECT 1 FROM main.shipments AS hot WHERE hot.id = archived.id))'''
+
+# Newest rows whose match rate estimates the size of a large search result
+SEARCH_SAMPLE_SIZE = 2000
 
 class Shipment:
+    # _loaded is the stored row the object was read from, for change detection
+    __slots__ = SHIPMENT_FIELDS + ('_loaded',)
+    
     def __init__(self, id=None, tracking_number=None, sender_name=None, sender_address=None,
                  recipient_name=None, recipient_address=None, package_description=None,
                  weight=None, status='pending', priority='standard', is_express=False,
-                 shipping_cost=0.0, created_at=None, updated_at=None, user_id=None):
+                 shipping_cost=0.0, created_at=None, updated_at=None, user_id=None, version=None):
         self.id = id
         self.tracking_number = tracking_number
         self.sender_name = sender_name
@@ -25,6 +60,8 @@ class Shipment:
         self.created_at = created_at
         self.updated_at = updated_at
         self.user_id = user_id
+        self.version = version
+        self._loaded = None
     
     @staticmethod
     def generate_tracking_number():
@@ -34,12 +71,20 @@ class Shipment:
             random_part = ''.join(random.choices(string.digits, k=8))
             tracking_number = f"{prefix}{random_part}"
             
-            # Check if tracking number already exists
+            # Check if tracking number already exists, archived parcels included;
+            # sharded shipments are all listed in the global index
+            table = 'shipment_index' if sharding_enabled() else 'shipments'
             existing = execute_query(
-                'SELECT id FROM shipments WHERE tracking_number = ?',
+                f'SELECT id FROM {table} WHERE tracking_number = ?',
                 (tracking_number,),
                 fetch_one=True
             )
+            if not existing and archive_attached():
+                existing = execute_query(
+                    'SELECT id FROM archive.shipments WHERE tracking_number = ?',
+                    (tracking_number,),
+                    fetch_one=True
+                )
             if not existing:
                 return tracking_number
     
@@ -51,14 +96,10 @@ class Shipment:
             weight_float = float(weight or 0)
             weight_cost = weight_float * 2.0  # $2 per kg
             
-            priority_multiplier = {
-                'standard': 1.0,
-                'priority': 1.5,
-                'urgent': 2.0
-            }
-            
+            priority_code = encode_priority(priority)
             cost = base_cost + weight_cost
-            cost *= priority_multiplier.get(priority, 1.0)
+            if priority_code is not None:
+                cost *= PRIORITY_COST_MULTIPLIERS[ShipmentPriority(priority_code)]
             
             if is_express:
                 cost *= 1.8  # 80% surcharge for express
@@ -68,122 +109,226 @@ class Shipment:
             return 5.0  # Return base cost if calculation fails
     
     @staticmethod
-    def find_by_id(shipment_id, user_id):
-        """Find shipment by ID and user ID"""
+    @traced
+    def find_by_id(shipment_id, user_id, raw=False):
+        """Find shipment by ID and user ID (raw=True returns the unhydrated row)"""
         try:
             shipment_data = execute_query(
-                'SELECT * FROM shipments WHERE id = ? AND user_id = ?',
+                f'SELECT {SHIPMENT_COLUMNS} FROM shipments WHERE id = ? AND user_id = ?',
                 (shipment_id, user_id),
-                fetch_one=True
+                fetch_one=True,
+                shard_key=user_id
             )
+            if shipment_data and raw:
+                return shipment_data
             if shipment_data:
                 return Shipment._from_db_row(shipment_data)
             return None
         except Exception as e:
-            print(f"Error finding shipment by ID: {e}")
+            log.error("Error finding shipment by ID: %s", e)
             return None
     
     @staticmethod
+    @traced
     def find_by_tracking_number(tracking_number, user_id=None):
-        """Find shipment by tracking number"""
+        """Find shipment by tracking number, falling back to the archive"""
         try:
-            if user_id:
-                shipment_data = execute_query(
-                    'SELECT * FROM shipments WHERE tracking_number = ? AND user_id = ?',
-                    (tracking_number.upper(), user_id),
-                    fetch_one=True
-                )
-            else:
-                shipment_data = execute_query(
-                    'SELECT * FROM shipments WHERE tracking_number = ?',
+            if not user_id and sharding_enabled():
+                # The global index knows which user, and so which shard, holds it
+                owner = execute_query(
+                    'SELECT user_id FROM shipment_index WHERE tracking_number = ?',
                     (tracking_number.upper(),),
                     fetch_one=True
                 )
+                if owner is None:
+                    return None
+                user_id = owner[0]
+            
+            tables = ['shipments', 'archive.shipments'] if archive_attached() else ['shipments']
+            shipment_data = None
+            for table in tables:
+                if user_id:
+                    shipment_data = execute_query(
+                        f'SELECT {SHIPMENT_COLUMNS} FROM {table} WHERE tracking_number = ? AND user_id = ?',
+                        (tracking_number.upper(), user_id),
+                        fetch_one=True,
+                        shard_key=user_id
+                    )
+                else:
+                    shipment_data = execute_query(
+                        f'SELECT {SHIPMENT_COLUMNS} FROM {table} WHERE tracking_number = ?',
+                        (tracking_number.upper(),),
+                        fetch_one=True
+                    )
+                if shipment_data:
+                    break
             
             if shipment_data:
                 return Shipment._from_db_row(shipment_data)
             return None
         except Exception as e:
-            print(f"Error finding shipment by tracking number: {e}")
+            log.error("Error finding shipment by tracking number: %s", e)
             return None
     
+    @staticmethod
+    def _build_user_filters(user_id, status_filter=None, priority_filter=None,
+                            express_filter=None, date_from=None, date_to=None):
+        """Build WHERE clause and parameters for user-scoped shipment filters"""
+        where = 'user_id = ?'
+        params = [user_id]
+        
+        if status_filter:
+            where += ' AND status = ?'
+            params.append(_filter_code(encode_status(status_filter)))
+        
+        if priority_filter:
+            where += ' AND priority = ?'
+            params.append(_filter_code(encode_priority(priority_filter)))
+        
+        if express_filter:
+            where += ' AND is_express = ?'
+            params.append(1 if express_filter == 'true' else 0)
+        
+        if date_from:
+            where += ' AND created_at >= ?'
+            params.append(date_from)
+        
+        if date_to:
+            # Inclusive end date: everything before the start of the next day
+            where += " AND created_at < date(?, '+1 day')"
+            params.append(date_to)
+        
+        return where, params
+    
+    @staticmethod
+    def _source(include_archived=False, status_filter=None):
+        """Return the table to read: hot shipments only, unless archived rows are asked for"""
+        if not archive_attached():
+            return 'shipments'
+        # Filtering on a terminal status asks for archived rows implicitly
+        if include_archived or encode_status(status_filter) in TERMINAL_STATUSES:
+            return SHIPMENTS_WITH_ARCHIVE
+        return 'shipments'
+    
     @staticmethod
     def find_by_user(user_id, status_filter=None, priority_filter=None, 
-                     express_filter=None, page=1, per_page=5):
+                     express_filter=None, page=1, per_page=5, include_archived=False):
         """Find shipments by user with filtering and pagination"""
+        shipments, pagination = Shipment.paginate_by_user(
+            user_id, status_filter, priority_filter, express_filter, page, per_page, include_archived
+        )
+        return shipments, pagination.pages, pagination.total
+    
+    @staticmethod
+    @traced
+    def paginate_by_user(user_id, status_filter=None, priority_filter=None, express_filter=None,
+                         page=1, per_page=5, include_archived=False, count_limit=None):
+        """Find one page of a user's filtered shipments; returns (shipments, Pagination)"""
         try:
             # Build query with filters
-            query = 'SELECT * FROM shipments WHERE user_id = ?'
-            params = [user_id]
-            
-            if status_filter:
-                query += ' AND status = ?'
-                params.append(status_filter)
-            
-            if priority_filter:
-                query += ' AND priority = ?'
-                params.append(priority_filter)
-            
-            if express_filter:
-                query += ' AND is_express = ?'
-                params.append(1 if express_filter == 'true' else 0)
-            
-            # Count total records for pagination
-            count_query = query.replace('SELECT *', 'SELECT COUNT(*)')
-            total_count = execute_query(count_query, params, fetch_one=True)[0]
-            
-            # Get paginated results
-            offset = (page - 1) * per_page
-            query += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
-            params.extend([per_page, offset])
-            
-            shipments_data = execute_query(query, params, fetch_all=True)
-            shipments = [Shipment._from_db_row(shipment_data) for shipment_data in shipments_data]
+            where, params = Shipment._build_user_filters(
+                user_id, status_filter, priority_filter, express_filter
+            )
+            source = Shipment._source(include_archived, status_filter)
             
-            total_pages = math.ceil(total_count / per_page) if total_count > 0 else 1
+            # Exact below count_limit, otherwise estimated from the rollups
+            total_count, count_kind = count_results(
+                lambda cap: _capped_count(source, where, params, cap, user_id),
+                lambda: ShipmentRollup.count_matching(user_id, status_filter, priority_filter, express_filter),
+                count_limit
+            )
             
-            return shipments, total_pages, total_count
+            shipments = Shipment._fetch_page(source, where, params, page, per_page, user_id)
+            has_next = len(shipments) > per_page
+            return shipments[:per_page], Pagination(page, per_page, total_count, count_kind, has_next)
         except Exception as e:
-            print(f"Error finding shipments by user: {e}")
-            return [], 1, 0
+            log.error("Error finding shipments by user: %s", e)
+            return [], Pagination(page, per_page, 0)
+    
+    @staticmethod
+    def _fetch_page(source, where, params, page, per_page, user_id):
+        """Fetch a page plus one look-ahead row, which tells whether a next page exists"""
+        offset = (page - 1) * per_page
+        shipments_data = execute_query(
+            f'SELECT {SHIPMENT_COLUMNS} FROM {source} WHERE {where} ORDER BY created_at DESC LIMIT ? OFFSET ?',
+            [*params, per_page + 1, offset],
+            fetch_all=True,
+            shard_key=user_id
+        )
+        return [Shipment._from_db_row(shipment_data) for shipment_data in shipments_data]
     
+    @staticmethod
+    @traced
+    def page_by_user(user_id, after=None, limit=20, status_filter=None, priority_filter=None,
+                     express_filter=None, include_archived=False):
+        """Return up to `limit` raw rows, newest first, after an optional (created_at, id) cursor"""
+        where, params = Shipment._build_user_filters(
+            user_id, status_filter, priority_filter, express_filter
+        )
+        if after:
+            # Keyset pagination: the (user_id, created_at) index seeks straight to the page
+            where += ' AND (created_at < ? OR (created_at = ? AND id < ?))'
+            params.extend([after[0], after[0], after[1]])
+        source = Shipment._source(include_archived, status_filter)
+        query = f'SELECT {SHIPMENT_COLUMNS} FROM {source} WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit)
+        return execute_query(query, params, fetch_all=True, shard_key=user_id)
+    
+    @staticmethod
+    def iter_by_user(user_id, status_filter=None, priority_filter=None,
+                     express_filter=None, date_from=None, date_to=None, batch_size=500,
+                     reporting=False, include_archived=False):
+        """Stream all matching shipments for a user without materializing the result set"""
+        where, params = Shipment._build_user_filters(
+            user_id, status_filter, priority_filter, express_filter, date_from, date_to
+        )
+        source = Shipment._source(include_archived, status_filter)
+        query = f'SELECT {SHIPMENT_COLUMNS} FROM {source} WHERE {where} ORDER BY created_at DESC, id DESC'
+        from_row = Shipment._from_db_row
+        for row in iter_query(query, params, batch_size=batch_size, raw=True, reporting=reporting,
+                              shard_key=user_id):
+            yield from_row(row)
+    
+    @traced
     def save(self):
         """Save shipment to database"""
         try:
             if not self.tracking_number:
                 self.tracking_number = self.generate_tracking_number()
             
+            status_code = encode_status(self.status)
+            priority_code = encode_priority(self.priority)
+            if status_code is None:
+                raise ValueError(f"Invalid status: {self.status}")
+            if priority_code is None:
+                raise ValueError(f"Invalid priority: {self.priority}")
+            
             # Calculate shipping cost
             self.shipping_cost = self.calculate_shipping_cost(
                 self.weight, self.priority, self.is_express
             )
             
             if self.id:
-                # Update existing shipment
-                execute_query(
-                    '''UPDATE shipments 
-                       SET tracking_number = ?, sender_name = ?, sender_address = ?,
-                           recipient_name = ?, recipient_address = ?, package_description = ?,
-                           weight = ?, status = ?, priority = ?, is_express = ?,
-                           shipping_cost = ?, updated_at = CURRENT_TIMESTAMP
-                       WHERE id = ? AND user_id = ?''',
-                    (self.tracking_number, self.sender_name, self.sender_address,
-                     self.recipient_name, self.recipient_address, self.package_description,
-                     self.weight, self.status, self.priority, self.is_express,
-                     self.shipping_cost, self.id, self.user_id)
-                )
-            else:
-                # Create new shipment
-                self.id = execute_query(
-                    '''INSERT INTO shipments (tracking_number, sender_name, sender_address,
-                                            recipient_name, recipient_address, package_description,
-                                            weight, status, priority, is_express, shipping_cost, user_id)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                    (self.tracking_number, self.sender_name, self.sender_address,
-                     self.recipient_name, self.recipient_address, self.package_description,
-                     self.weight, self.status, self.priority, self.is_express,
-                     self.shipping_cost, self.user_id)
-                )
+                return self._update(status_code, priority_code)
+            
+            with transaction(self.user_id):
+                if sharding_enabled():
+                    self._insert_sharded(status_code, priority_code)
+                else:
+                    # Create new shipment
+                    self.id = execute_query(
+                        '''INSERT INTO shipments (tracking_number, sender_name, sender_address,
+                                                recipient_name, recipient_address, package_description,
+                                                weight, status, priority, is_express, shipping_cost, user_id)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                        (self.tracking_number, self.sender_name, self.sender_address,
+                         self.recipient_name, self.recipient_address, self.package_description,
+                         self.weight, status_code, priority_code, self.is_express,
+                         self.shipping_cost, self.user_id)
+                    )
+                ShipmentRollup.add_shipment(self.id, self.user_id)
+            self.version = 1
+            self._loaded = self._stored_values(status_code, priority_code)
             return self
         except sqlite3.IntegrityError as e:
             if 'tracking_number' in str(e):
@@ -193,123 +338,211 @@ class Shipment:
             else:
                 raise ValueError(f"Database constraint violation: {e}")
         except Exception as e:
-            print(f"Error saving shipment: {e}")
+            log.error("Error saving shipment: %s", e)
+            raise
+    
+    def _stored_values(self, status_code, priority_code):
+        """This object's fields as a stored row (enum codes) in SHIPMENT_FIELDS order"""
+        values = list(_shipment_values(self))
+        values[UPDATABLE_FIELDS['status']] = status_code
+        values[UPDATABLE_FIELDS['priority']] = priority_code
+        return values
+    
+    def _update(self, status_code, priority_code):
+        """Write only the changed columns, if the stored row is still at self.version"""
+        stored = self._stored_values(status_code, priority_code)
+        changes = {name: stored[index] for name, index in UPDATABLE_FIELDS.items()
+                   if self._loaded is None or self._loaded[index] != stored[index]}
+        if not changes:
+            return self
+        
+        assignments = ''.join(f'{name} = ?, ' for name in changes)
+        where = 'id = ? AND user_id = ?'
+        params = list(changes.values()) + [self.id, self.user_id]
+        # Objects built by hand without a version cannot be checked and overwrite as before
+        if self.version is not None:
+            where += ' AND version = ?'
+            params.append(self.version)
+        
+        with transaction(self.user_id):
+            moves_rollups = not ROLLUP_FIELDS.isdisjoint(changes)
+            if moves_rollups:
+                # Runs against the stored row; a conflict below rolls it back
+                ShipmentRollup.remove_shipment(self.id, self.user_id)
+            updated = execute_query(
+                f'''UPDATE shipments
+                    SET {assignments}version = version + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE {where}''',
+                params,
+                shard_key=self.user_id,
+                rowcount=True
+            )
+            if not updated:
+                raise ConcurrentModificationError(
+                    f"Shipment {self.tracking_number} was changed by someone else; reload and try again")
+            if moves_rollups:
+                ShipmentRollup.add_shipment(self.id, self.user_id)
+        
+        if self.version is not None:
+            self.version += 1
+            stored[SHIPMENT_FIELDS.index('version')] = self.version
+        self._loaded = stored
+        return self
+    
+    def _insert_sharded(self, status_code, priority_code):
+        """Insert into the user's shard under an id allocated by the global shipment index"""
+        # The index row commits on its own, so it is removed again if the shard insert
+        # fails or the enclosing shard transaction (e.g. an API batch) rolls back
+        self.id = execute_query(
+            'INSERT INTO shipment_index (tracking_number, user_id) VALUES (?, ?)',
+            (self.tracking_number, self.user_id)
+        )
+        on_rollback(partial(execute_query, 'DELETE FROM shipment_index WHERE id = ?', (self.id,)),
+                    self.user_id)
+        try:
+            execute_query(
+                '''INSERT INTO shipments (id, tracking_number, sender_name, sender_address,
+                                        recipient_name, recipient_address, package_description,
+                                        weight, status, priority, is_express, shipping_cost, user_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (self.id, self.tracking_number, self.sender_name, self.sender_address,
+                 self.recipient_name, self.recipient_address, self.package_description,
+                 self.weight, status_code, priority_code, self.is_express,
+                 self.shipping_cost, self.user_id),
+                shard_key=self.user_id
+            )
+        except Exception:
+            execute_query('DELETE FROM shipment_index WHERE id = ?', (self.id,))
+            self.id = None
             raise
     
+    @traced
     def delete(self):
         """Delete shipment from database"""
         try:
             if self.id:
-                execute_query(
-                    'DELETE FROM shipments WHERE id = ? AND user_id = ?',
-                    (self.id, self.user_id)
-                )
+                with transaction(self.user_id):
+                    ShipmentRollup.remove_shipment(self.id, self.user_id)
+                    execute_query(
+                        'DELETE FROM shipments WHERE id = ? AND user_id = ?',
+                        (self.id, self.user_id),
+                        shard_key=self.user_id
+                    )
+                if sharding_enabled():
+                    execute_query('DELETE FROM shipment_index WHERE id = ? AND user_id = ?',
+                                  (self.id, self.user_id))
                 return True
             return False
         except Exception as e:
-            print(f"Error deleting shipment: {e}")
+            log.error("Error deleting shipment: %s", e)
             raise
     
     @staticmethod
     def _from_db_row(row):
-        """Create Shipment instance from database row"""
-        return Shipment(
-            id=row['id'],
-            tracking_number=row['tracking_number'],
-            sender_name=row['sender_name'],
-            sender_address=row['sender_address'],
-            recipient_name=row['recipient_name'],
-            recipient_address=row['recipient_address'],
-            package_description=row['package_description'],
-            weight=row['weight'],
-            status=row['status'],
-            priority=row['priority'],
-            is_express=bool(row['is_express']),
-            shipping_cost=row['shipping_cost'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at'] if 'updated_at' in row.keys() else None,
-            user_id=row['user_id']
-        )
+        """Create Shipment instance from a row selected with SHIPMENT_COLUMNS"""
+        # Positional fast path: works for plain cursor tuples and sqlite3.Row alike
+        shipment = _new_shipment(Shipment)
+        (shipment.id, shipment.tracking_number, shipment.sender_name, shipment.sender_address,
+         shipment.recipient_name, shipment.recipient_address, shipment.package_description,
+         weight, status, priority, is_express, shipment.shipping_cost,
+         shipment.created_at, shipment.updated_at, shipment.user_id, shipment.version) = row
+        shipment._loaded = row
+        shipment.weight = weight or 0.0
+        shipment.status = STATUS_NAMES[status]
+        shipment.priority = PRIORITY_NAMES[priority]
+        shipment.is_express = bool(is_express)
+        return shipment
+    
+    def as_tuple(self):
+        """Return field values in SHIPMENT_FIELDS order without building a dict"""
+        return _shipment_values(self)
     
     def to_dict(self):
         """Convert shipment to dictionary"""
-        return {
-            'id': self.id,
-            'tracking_number': self.tracking_number,
-            'sender_name': self.sender_name,
-            'sender_address': self.sender_address,
-            'recipient_name': self.recipient_name,
-            'recipient_address': self.recipient_address,
-            'package_description': self.package_description,
-            'weight': self.weight,
-            'status': self.status,
-            'priority': self.priority,
-            'is_express': self.is_express,
-            'shipping_cost': self.shipping_cost,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at,
-            'user_id': self.user_id
-        }
+        return dict(zip(SHIPMENT_FIELDS, _shipment_values(self)))
     
     @staticmethod
     def get_status_choices():
         """Get available status choices"""
-        return ['pending', 'picked_up', 'in_transit', 'out_for_delivery', 'delivered', 'returned']
+        return list(STATUS_NAMES)
     
     @staticmethod
     def get_priority_choices():
         """Get available priority choices"""
-        return ['standard', 'priority', 'urgent']
+        return list(PRIORITY_NAMES)
     
     @staticmethod
+    @traced
     def get_status_stats(user_id):
         """Get shipment status statistics for a user"""
         try:
-            stats = execute_query(
-                '''SELECT status, COUNT(*) as count, 
-                          AVG(shipping_cost) as avg_cost,
-                          SUM(shipping_cost) as total_cost
-                   FROM shipments 
-                   WHERE user_id = ? 
-                   GROUP BY status 
-                   ORDER BY count DESC''',
-                (user_id,),
-                fetch_all=True
-            )
-            return [dict(stat) for stat in stats]
+            # Served from the daily rollups instead of scanning shipments
+            return ShipmentRollup.get_status_totals(user_id)
         except Exception as e:
-            print(f"Error getting status stats: {e}")
+            log.error("Error getting status stats: %s", e)
             return []
     
     @staticmethod
-    def search_shipments(user_id, search_term, page=1, per_page=5):
+    def search_shipments(user_id, search_term, page=1, per_page=5, include_archived=False):
         """Search shipments by various fields"""
+        shipments, pagination = Shipment.paginate_search(
+            user_id, search_term, page, per_page, include_archived
+        )
+        return shipments, pagination.pages, pagination.total
+    
+    @staticmethod
+    @traced
+    def paginate_search(user_id, search_term, page=1, per_page=5, include_archived=False,
+                        count_limit=None):
+        """Search one page of a user's shipments; returns (shipments, Pagination)"""
         try:
+            source = Shipment._source(include_archived)
             search_pattern = f"%{search_term}%"
-            query = '''SELECT * FROM shipments 
-                       WHERE user_id = ? AND (
+            match = '''(
                            tracking_number LIKE ? OR
                            sender_name LIKE ? OR
                            recipient_name LIKE ? OR
                            package_description LIKE ?
                        )'''
-            params = [user_id, search_pattern, search_pattern, search_pattern, search_pattern]
-            
-            # Count total results
-            count_query = query.replace('SELECT *', 'SELECT COUNT(*)')
-            total_count = execute_query(count_query, params, fetch_one=True)[0]
+            match_params = [search_pattern] * 4
+            where = f'user_id = ? AND {match}'
+            params = [user_id, *match_params]
             
-            # Get paginated results
-            offset = (page - 1) * per_page
-            query += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
-            params.extend([per_page, offset])
-            
-            shipments_data = execute_query(query, params, fetch_all=True)
-            shipments = [Shipment._from_db_row(shipment_data) for shipment_data in shipments_data]
+            def estimate():
+                # Match rate of the newest rows, scaled to the user's shipment count
+                sampled, matched = execute_query(
+                    f'''SELECT COUNT(*), COALESCE(SUM(hit), 0) FROM (
+                            SELECT {match} AS hit FROM {source} WHERE user_id = ?
+                            ORDER BY created_at DESC LIMIT ?)''',
+                    [*match_params, user_id, SEARCH_SAMPLE_SIZE],
+                    fetch_one=True,
+                    shard_key=user_id
+                )
+                return estimate_from_sample(ShipmentRollup.count_matching(user_id), sampled, matched)
             
-            total_pages = math.ceil(total_count / per_page) if total_count > 0 else 1
+            total_count, count_kind = count_results(
+                lambda cap: _capped_count(source, where, params, cap, user_id), estimate, count_limit
+            )
             
-            return shipments, total_pages, total_count
+            shipments = Shipment._fetch_page(source, where, params, page, per_page, user_id)
+            has_next = len(shipments) > per_page
+            return shipments[:per_page], Pagination(page, per_page, total_count, count_kind, has_next)
         except Exception as e:
-            print(f"Error searching shipments: {e}")
-            return [], 1, 0
+            log.error("Error searching shipments: %s", e)
+            return [], Pagination(page, per_page, 0)
+
+def _capped_count(source, where, params, cap, user_id):
+    """COUNT(*) that stops after `cap` matching rows"""
+    return execute_query(
+        f'SELECT COUNT(*) FROM (SELECT 1 FROM {source} WHERE {where} LIMIT ?)',
+        [*params, cap],
+        fetch_one=True,
+        shard_key=user_id
+    )[0]
+
+def _filter_code(code):
+    """Map an unknown filter label to a code that matches nothing"""
+    return -1 if code is None else code
+
+_new_shipment = object.__new__
+_shipment_values = attrgetter(*SHIPMENT_FIELDS)
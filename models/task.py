@@ -1,11 +1,28 @@
-from database import execute_query
+from database import ConcurrentModificationError, execute_query
 from datetime import datetime
-import math
+from operator import attrgetter
+from utils.helpers import Pagination, count_results
+from utils.tracing import traced
+
+# Column order shared by SELECT lists, the positional constructor and serialization
+TASK_FIELDS = (
+    'id', 'title', 'description', 'status', 'priority', 'is_urgent',
+    'created_at', 'updated_at', 'user_id', 'version'
+)
+TASK_COLUMNS = ', '.join(TASK_FIELDS)
+
+# Columns an update may write, with their position in a TASK_COLUMNS row
+UPDATABLE_FIELDS = {name: TASK_FIELDS.index(name) for name in (
+    'title', 'description', 'status', 'priority', 'is_urgent'
+)}
 
 class Task:
+    # _loaded is the stored row the object was read from, for change detection
+    __slots__ = TASK_FIELDS + ('_loaded',)
+    
     def __init__(self, id=None, title=None, description=None, status='pending', 
                  priority='medium', is_urgent=False, created_at=None, 
-                 updated_at=None, user_id=None):
+                 updated_at=None, user_id=None, version=None):
         self.id = id
         self.title = title
         self.description = description
@@ -15,77 +32,149 @@ class Task:
         self.created_at = created_at
         self.updated_at = updated_at
         self.user_id = user_id
+        self.version = version
+        self._loaded = None
     
     @staticmethod
-    def find_by_id(task_id, user_id):
-        """Find task by ID and user ID"""
+    @traced
+    def find_by_id(task_id, user_id, raw=False):
+        """Find task by ID and user ID (raw=True returns the unhydrated row)"""
         task_data = execute_query(
-            'SELECT * FROM tasks WHERE id = ? AND user_id = ?',
+            f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = ? AND user_id = ?',
             (task_id, user_id),
             fetch_one=True
         )
+        if task_data and raw:
+            return task_data
         if task_data:
             return Task._from_db_row(task_data)
         return None
     
+    @staticmethod
+    @traced
+    def page_by_user(user_id, after=None, limit=20, status_filter=None, priority_filter=None,
+                     urgent_filter=None):
+        """Return up to `limit` raw rows, newest first, after an optional (created_at, id) cursor"""
+        where = 'user_id = ?'
+        params = [user_id]
+        if status_filter:
+            where += ' AND status = ?'
+            params.append(status_filter)
+        if priority_filter:
+            where += ' AND priority = ?'
+            params.append(priority_filter)
+        if urgent_filter:
+            where += ' AND is_urgent = ?'
+            params.append(1 if urgent_filter == 'true' else 0)
+        if after:
+            where += ' AND (created_at < ? OR (created_at = ? AND id < ?))'
+            params.extend([after[0], after[0], after[1]])
+        params.append(limit)
+        return execute_query(
+            f'SELECT {TASK_COLUMNS} FROM tasks WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?',
+            params,
+            fetch_all=True
+        )
+    
     @staticmethod
     def find_by_user(user_id, status_filter=None, priority_filter=None, 
                      urgent_filter=None, page=1, per_page=5):
         """Find tasks by user with filtering and pagination"""
+        tasks, pagination = Task.paginate_by_user(
+            user_id, status_filter, priority_filter, urgent_filter, page, per_page
+        )
+        return tasks, pagination.pages, pagination.total
+    
+    @staticmethod
+    @traced
+    def paginate_by_user(user_id, status_filter=None, priority_filter=None, urgent_filter=None,
+                         page=1, per_page=5, count_limit=None):
+        """Find one page of a user's filtered tasks; returns (tasks, Pagination)"""
         # Build query with filters
-        query = 'SELECT * FROM tasks WHERE user_id = ?'
+        where = 'user_id = ?'
         params = [user_id]
         
         if status_filter:
-            query += ' AND status = ?'
+            where += ' AND status = ?'
             params.append(status_filter)
         
         if priority_filter:
-            query += ' AND priority = ?'
+            where += ' AND priority = ?'
             params.append(priority_filter)
         
         if urgent_filter:
-            query += ' AND is_urgent = ?'
+            where += ' AND is_urgent = ?'
             params.append(1 if urgent_filter == 'true' else 0)
         
-        # Count total records for pagination
-        count_query = query.replace('SELECT *', 'SELECT COUNT(*)')
-        total_count = execute_query(count_query, params, fetch_one=True)[0]
+        # Tasks have no rollups: past count_limit the total is only a lower bound
+        total_count, count_kind = count_results(
+            lambda cap: execute_query(
+                f'SELECT COUNT(*) FROM (SELECT 1 FROM tasks WHERE {where} LIMIT ?)',
+                [*params, cap],
+                fetch_one=True
+            )[0],
+            limit=count_limit
+        )
         
-        # Get paginated results
+        # Get paginated results, plus one row to tell whether a next page exists
         offset = (page - 1) * per_page
-        query += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
-        params.extend([per_page, offset])
-        
-        tasks_data = execute_query(query, params, fetch_all=True)
-        tasks = [Task._from_db_row(task_data) for task_data in tasks_data]
-        
-        total_pages = math.ceil(total_count / per_page)
+        tasks_data = execute_query(
+            f'SELECT {TASK_COLUMNS} FROM tasks WHERE {where} ORDER BY created_at DESC LIMIT ? OFFSET ?',
+            [*params, per_page + 1, offset],
+            fetch_all=True
+        )
+        tasks = [Task._from_db_row(task_data) for task_data in tasks_data[:per_page]]
         
-        return tasks, total_pages, total_count
+        return tasks, Pagination(page, per_page, total_count, count_kind, len(tasks_data) > per_page)
     
+    @traced
     def save(self):
         """Save task to database"""
         if self.id:
-            # Update existing task
-            execute_query(
-                '''UPDATE tasks 
-                   SET title = ?, description = ?, status = ?, priority = ?, 
-                       is_urgent = ?, updated_at = CURRENT_TIMESTAMP
-                   WHERE id = ? AND user_id = ?''',
-                (self.title, self.description, self.status, self.priority, 
-                 self.is_urgent, self.id, self.user_id)
-            )
-        else:
-            # Create new task
-            self.id = execute_query(
-                '''INSERT INTO tasks (title, description, status, priority, is_urgent, user_id)
-                   VALUES (?, ?, ?, ?, ?, ?)''',
-                (self.title, self.description, self.status, self.priority, 
-                 self.is_urgent, self.user_id)
-            )
+            return self._update()
+        # Create new task
+        self.id = execute_query(
+            '''INSERT INTO tasks (title, description, status, priority, is_urgent, user_id)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            (self.title, self.description, self.status, self.priority, 
+             self.is_urgent, self.user_id)
+        )
+        self.version = 1
+        self._loaded = _task_values(self)
         return self
     
+    def _update(self):
+        """Write only the changed columns, if the stored row is still at self.version"""
+        stored = _task_values(self)
+        changes = {name: stored[index] for name, index in UPDATABLE_FIELDS.items()
+                   if self._loaded is None or self._loaded[index] != stored[index]}
+        if not changes:
+            return self
+        
+        assignments = ''.join(f'{name} = ?, ' for name in changes)
+        where = 'id = ? AND user_id = ?'
+        params = list(changes.values()) + [self.id, self.user_id]
+        # Objects built by hand without a version cannot be checked and overwrite as before
+        if self.version is not None:
+            where += ' AND version = ?'
+            params.append(self.version)
+        
+        updated = execute_query(
+            f'''UPDATE tasks
+                SET {assignments}version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE {where}''',
+            params,
+            rowcount=True
+        )
+        if not updated:
+            raise ConcurrentModificationError(
+                f"Task '{self.title}' was changed by someone else; reload and try again")
+        if self.version is not None:
+            self.version += 1
+        self._loaded = _task_values(self)
+        return self
+    
+    @traced
     def delete(self):
         """Delete task from database"""
         if self.id:
@@ -98,32 +187,21 @@ class Task:
     
     @staticmethod
     def _from_db_row(row):
-        """Create Task instance from database row"""
-        return Task(
-            id=row['id'],
-            title=row['title'],
-            description=row['description'],
-            status=row['status'],
-            priority=row['priority'],
-            is_urgent=bool(row['is_urgent']),
-            created_at=row['created_at'],
-            updated_at=row.get('updated_at'),
-            user_id=row['user_id']
-        )
+        """Create Task instance from a row selected with TASK_COLUMNS"""
+        task = _new_task(Task)
+        (task.id, task.title, task.description, task.status, task.priority, is_urgent,
+         task.created_at, task.updated_at, task.user_id, task.version) = row
+        task._loaded = row
+        task.is_urgent = bool(is_urgent)
+        return task
+    
+    def as_tuple(self):
+        """Return field values in TASK_FIELDS order without building a dict"""
+        return _task_values(self)
     
     def to_dict(self):
         """Convert task to dictionary"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'status': self.status,
-            'priority': self.priority,
-            'is_urgent': self.is_urgent,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at,
-            'user_id': self.user_id
-        }
+        return dict(zip(TASK_FIELDS, _task_values(self)))
     
     @staticmethod
     def get_status_choices():
@@ -134,3 +212,6 @@ class Task:
     def get_priority_choices():
         """Get available priority choices"""
         return ['low', 'medium', 'high']
+
+_new_task = object.__new__
+_task_values = attrgetter(*TASK_FIELDS)
@@ -1,8 +1,14 @@
-from werkzeug.security import check_password_hash, generate_password_hash
-from database import execute_query
+from database import execute_query, sharding_enabled
+from utils.tracing import log, traced
 import sqlite3
 
+# Column order shared by SELECT lists and the positional constructor
+USER_FIELDS = ('id', 'username', 'password_hash', 'created_at')
+USER_COLUMNS = ', '.join(USER_FIELDS)
+
 class User:
+    __slots__ = USER_FIELDS
+    
     def __init__(self, id=None, username=None, password_hash=None, created_at=None):
         self.id = id
         self.username = username
@@ -10,55 +16,58 @@ class User:
         self.created_at = created_at
     
     @staticmethod
+    @traced
     def find_by_username(username):
         """Find user by username"""
         try:
             user_data = execute_query(
-                'SELECT * FROM users WHERE username = ?', 
+                f'SELECT {USER_COLUMNS} FROM users WHERE username = ?', 
                 (username,), 
                 fetch_one=True
             )
             if user_data:
-                return User(
-                    id=user_data['id'],
-                    username=user_data['username'],
-                    password_hash=user_data['password_hash'],
-                    created_at=user_data['created_at']
-                )
+                return User._from_db_row(user_data)
             return None
         except Exception as e:
-            print(f"Error finding user by username: {e}")
+            log.error("Error finding user by username: %s", e)
             return None
     
     @staticmethod
+    @traced
     def find_by_id(user_id):
         """Find user by ID"""
         try:
             user_data = execute_query(
-                'SELECT * FROM users WHERE id = ?', 
+                f'SELECT {USER_COLUMNS} FROM users WHERE id = ?', 
                 (user_id,), 
                 fetch_one=True
             )
             if user_data:
-                return User(
-                    id=user_data['id'],
-                    username=user_data['username'],
-                    password_hash=user_data['password_hash'],
-                    created_at=user_data['created_at']
-                )
+                return User._from_db_row(user_data)
             return None
         except Exception as e:
-            print(f"Error finding user by ID: {e}")
+            log.error("Error finding user by ID: %s", e)
             return None
     
+    @staticmethod
+    def _from_db_row(row):
+        """Create User instance from a row selected with USER_COLUMNS"""
+        user = object.__new__(User)
+        user.id, user.username, user.password_hash, user.created_at = row
+        return user
+    
+    @traced
     def check_password(self, password):
         """Check if provided password matches user's password"""
+        # Imported lazily: password hashing is only needed on login and register
+        from werkzeug.security import check_password_hash
         try:
             return check_password_hash(self.password_hash, password)
         except Exception as e:
-            print(f"Error checking password: {e}")
+            log.error("Error checking password: %s", e)
             return False
     
+    @traced
     def save(self):
         """Save user to database"""
         try:
@@ -78,10 +87,11 @@ class User:
         except sqlite3.IntegrityError:
             raise ValueError("Username already exists")
         except Exception as e:
-            print(f"Error saving user: {e}")
+            log.error("Error saving user: %s", e)
             raise
     
     @staticmethod
+    @traced
     def create_user(username, password):
         """Create a new user with hashed password"""
         try:
@@ -90,11 +100,12 @@ class User:
             if existing_user:
                 raise ValueError("Username already exists")
             
+            from werkzeug.security import generate_password_hash
             password_hash = generate_password_hash(password)
             user = User(username=username, password_hash=password_hash)
             return user.save()
         except Exception as e:
-            print(f"Error creating user: {e}")
+            log.error("Error creating user: %s", e)
             raise
     
     @staticmethod
@@ -108,7 +119,7 @@ class User:
             return [User(id=user['id'], username=user['username'], 
                         created_at=user['created_at']) for user in users_data]
         except Exception as e:
-            print(f"Error getting all users: {e}")
+            log.error("Error getting all users: %s", e)
             return []
     
     def delete(self):
@@ -116,13 +127,15 @@ class User:
         try:
             if self.id:
                 # Delete user's shipments first (due to foreign key constraint)
-                execute_query('DELETE FROM shipments WHERE user_id = ?', (self.id,))
+                execute_query('DELETE FROM shipments WHERE user_id = ?', (self.id,), shard_key=self.id)
+                if sharding_enabled():
+                    execute_query('DELETE FROM shipment_index WHERE user_id = ?', (self.id,))
                 # Delete user
                 execute_query('DELETE FROM users WHERE id = ?', (self.id,))
                 return True
             return False
         except Exception as e:
-            print(f"Error deleting user: {e}")
+            log.error("Error deleting user: %s", e)
             raise
     
     def get_shipment_count(self):
@@ -132,12 +145,13 @@ class User:
                 result = execute_query(
                     'SELECT COUNT(*) FROM shipments WHERE user_id = ?',
                     (self.id,),
-                    fetch_one=True
+                    fetch_one=True,
+                    shard_key=self.id
                 )
                 return result[0] if result else 0
             return 0
         except Exception as e:
-            print(f"Error getting shipment count: {e}")
+            log.error("Error getting shipment count: %s", e)
             return 0
     
     def to_dict(self):
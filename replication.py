@@ -0,0 +1,274 @@
+"""
+Read replicas of the primary database
+
+A shipper keeps one or more follower files (possibly on another node through
+a shared directory) in step with the primary row by row. Triggers installed
+on the primary log the key of every inserted, updated or deleted row to
+`replication_changes`; each ship copies just the rows named by changes a
+follower has not applied yet, in one follower transaction that also stamps
+its `replication_heartbeat`. An idle primary costs a one-row heartbeat
+update every REPLICA_HEARTBEAT_INTERVAL seconds.
+
+A follower is rebuilt with a full copy through the backup API, paced by
+BACKUP_PAGES_PER_STEP and BACKUP_STEP_SLEEP, only when the shipper does not
+know its position (a new follower or a restarted shipper), when the schema
+changed, or after a bulk load that bypassed the triggers (request_resync).
+
+The heartbeat is the time just before the shipped snapshot was read, so a
+follower knows how current it is without talking to the primary.
+"""
+
+import os
+import sqlite3
+import time
+from backup import copy_database
+
+CHANGES_TABLE = 'replication_changes'
+# The change log and the heartbeat are per database, never shipped row by row
+LOCAL_TABLES = (CHANGES_TABLE, 'replication_heartbeat')
+# A change row with this table name makes the shipper rebuild every follower
+RESYNC = '*'
+
+def write_heartbeat(conn, stamp=None):
+    """Stamp a database's heartbeat (now by default) without committing; returns the stamp"""
+    now = time.time() if stamp is None else stamp
+    conn.execute('INSERT OR REPLACE INTO replication_heartbeat (id, written_at) VALUES (1, ?)',
+                 (now,))
+    return now
+
+def read_heartbeat(conn):
+    """Return the heartbeat a database was shipped with, or None"""
+    try:
+        row = conn.execute('SELECT written_at FROM replication_heartbeat WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+def replicated_tables(conn):
+    """Map each shipped table to (key columns, all columns)"""
+    tables = {}
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                "AND name NOT LIKE 'sqlite_%' ORDER BY name"):
+        if name in LOCAL_TABLES:
+            continue
+        info = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+        columns = [row[1] for row in info]
+        key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+        if not key:
+            key = ['rowid']
+            columns = ['rowid'] + columns
+        tables[name] = (key, columns)
+    return tables
+
+def install_change_capture(conn):
+    """Create the change log and the triggers feeding it on the primary (idempotent)"""
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+                         seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                         tbl TEXT NOT NULL,
+                         key TEXT NOT NULL)''')
+    for table, (key, _) in replicated_tables(conn).items():
+        for event, rows in (('insert', ('NEW',)), ('update', ('OLD', 'NEW')), ('delete', ('OLD',))):
+            # An update may change the key, so both the old and the new row are logged
+            values = ', '.join(f"('{table}', json_array({', '.join(f'{row}.{column}' for column in key)}))"
+                               for row in rows)
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS "replicate_{table}_{event}"
+                             AFTER {event.upper()} ON "{table}"
+                             BEGIN INSERT INTO {CHANGES_TABLE} (tbl, key) VALUES {values}; END''')
+    conn.commit()
+
+def remove_change_capture(conn):
+    """Drop the change triggers and log, once the primary has no followers any more"""
+    triggers = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'replicate\\_%' ESCAPE '\\'")]
+    for name in triggers:
+        conn.execute(f'DROP TRIGGER "{name}"')
+    conn.execute(f'DROP TABLE IF EXISTS {CHANGES_TABLE}')
+    conn.commit()
+
+def request_resync(conn):
+    """Make the shipper rebuild every follower, after writes that bypassed the change triggers"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (CHANGES_TABLE,)).fetchone()
+    if exists:
+        conn.execute(f'INSERT INTO {CHANGES_TABLE} (tbl, key) VALUES (?, ?)', (RESYNC, ''))
+        conn.commit()
+
+class ReplicaShipper:
+    """Apply the primary's row changes to follower files, rebuilding them only when needed"""
+
+    def __init__(self, primary_path, replica_paths, heartbeat_interval=10.0, pages=256,
+                 step_sleep=0.0):
+        self.primary_path = primary_path
+        self.replica_paths = list(replica_paths)
+        self.heartbeat_interval = heartbeat_interval
+        self.pages = pages
+        self.step_sleep = step_sleep
+        self.applied = 0
+        self.resynced = 0
+        self._conn = None
+        self._schema = None
+        self._tables = {}
+        self._followers = {}
+        # Per follower: last change seq it holds and when its heartbeat was last stamped
+        self._positions = {}
+        self._heartbeats = {}
+        self._pruned = 0
+
+    def _primary(self):
+        """The primary connection, with change capture matching its current schema"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.primary_path, timeout=20, check_same_thread=False)
+        schema = self._conn.execute('PRAGMA schema_version').fetchone()[0]
+        if schema != self._schema:
+            install_change_capture(self._conn)
+            self._tables = replicated_tables(self._conn)
+            self._schema = self._conn.execute('PRAGMA schema_version').fetchone()[0]
+            # Followers copied before the change have the old schema
+            self._positions.clear()
+        return self._conn
+
+    def _follower(self, path):
+        follower = self._followers.get(path)
+        if follower is None:
+            follower = sqlite3.connect(f'file:{path}', uri=True, timeout=20, isolation_level=None,
+                                       check_same_thread=False)
+            follower.execute('ATTACH DATABASE ? AS primary_db',
+                             (f'file:{self.primary_path}?mode=ro',))
+            self._followers[path] = follower
+        return follower
+
+    def _close_follower(self, path):
+        follower = self._followers.pop(path, None)
+        if follower is not None:
+            follower.close()
+
+    def _resync(self, path):
+        """Replace a follower with a full copy of the primary"""
+        self._close_follower(path)
+        # Every commit that finished before this stamp is in the copy
+        stamp = time.time()
+        reached = {}
+
+        def finish(tmp_path):
+            copy = sqlite3.connect(tmp_path)
+            try:
+                row = copy.execute('SELECT seq FROM sqlite_sequence WHERE name = ?',
+                                   (CHANGES_TABLE,)).fetchone()
+                reached['seq'] = row[0] if row else 0
+                # Followers only take rows from the shipper, so the capture triggers
+                # must not fire there and the copied log is of no use
+                for (name,) in copy.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+                    copy.execute(f'DROP TRIGGER "{name}"')
+                copy.execute(f'DELETE FROM {CHANGES_TABLE}')
+                write_heartbeat(copy, stamp)
+                copy.commit()
+            finally:
+                copy.close()
+
+        copy_database(self.primary_path, path, self.pages, self.step_sleep, finish=finish)
+        self._positions[path] = reached['seq']
+        self._heartbeats[path] = stamp
+        self.resynced += 1
+        return True
+
+    def _apply(self, path, force):
+        """Apply pending changes to one follower; returns True when it was written"""
+        position = self._positions[path]
+        follower = self._follower(path)
+        stamp = time.time()
+        follower.execute('BEGIN')
+        try:
+            # The first read of primary_db pins the snapshot the rows below come from
+            high = follower.execute(f'SELECT MAX(seq) FROM primary_db.{CHANGES_TABLE}').fetchone()[0]
+            high = max(high or 0, position)
+            tables = [row[0] for row in follower.execute(
+                f'SELECT DISTINCT tbl FROM primary_db.{CHANGES_TABLE} WHERE seq > ? AND seq <= ?',
+                (position, high))]
+            if RESYNC in tables or any(table not in self._tables for table in tables):
+                follower.execute('ROLLBACK')
+                return self._resync(path)
+            due = time.time() - self._heartbeats.get(path, 0.0) >= self.heartbeat_interval
+            if not (tables or due or force):
+                follower.execute('ROLLBACK')
+                return False
+
+            for table in tables:
+                key, columns = self._tables[table]
+                keys = ', '.join(f"json_extract(key, '$[{i}]')" for i in range(len(key)))
+                match = (f"({', '.join(key)}) IN (SELECT {keys} FROM primary_db.{CHANGES_TABLE} "
+                         f"WHERE tbl = ? AND seq > ? AND seq <= ?)")
+                params = (table, position, high)
+                column_list = ', '.join(columns)
+                follower.execute(f'DELETE FROM main."{table}" WHERE {match}', params)
+                follower.execute(f'INSERT INTO main."{table}" ({column_list}) '
+                                 f'SELECT {column_list} FROM primary_db."{table}" WHERE {match}', params)
+            write_heartbeat(follower, stamp)
+            follower.execute('COMMIT')
+        except BaseException:
+            if follower.in_transaction:
+                follower.execute('ROLLBACK')
+            raise
+        self._positions[path] = high
+        self._heartbeats[path] = stamp
+        if tables:
+            self.applied += 1
+        return True
+
+    def ship(self, force=False):
+        """Bring every follower up to date; returns True when any follower was written"""
+        conn = self._primary()
+        wrote = False
+        for path in self.replica_paths:
+            if self._positions.get(path) is None or not os.path.exists(path):
+                wrote = self._resync(path) or wrote
+            else:
+                wrote = self._apply(path, force) or wrote
+
+        # Changes every follower has applied are no longer needed
+        applied = min(self._positions[path] for path in self.replica_paths)
+        if applied > self._pruned:
+            conn.execute(f'DELETE FROM {CHANGES_TABLE} WHERE seq <= ?', (applied,))
+            conn.commit()
+            self._pruned = applied
+        return wrote
+
+    def close(self):
+        for path in list(self._followers):
+            self._close_follower(path)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def replica_status(replica_paths):
+    """Heartbeat and lag in seconds of each follower file (None if not yet shipped)"""
+    status = []
+    for path in replica_paths:
+        heartbeat = None
+        try:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            try:
+                heartbeat = read_heartbeat(conn)
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            pass
+        status.append({
+            'path': path,
+            'heartbeat': heartbeat,
+            'lag': None if heartbeat is None else max(time.time() - heartbeat, 0.0),
+        })
+    return status
+
+def start_replication(app):
+    """Start shipping the primary to REPLICA_PATHS for this process"""
+    from utils.scheduler import PeriodicTask
+
+    config = app.config
+    if not config.get('REPLICA_PATHS') or not config.get('REPLICATION_INTERVAL'):
+        return None
+    shipper = ReplicaShipper(config['DATABASE_PATH'], config['REPLICA_PATHS'],
+                             config.get('REPLICA_HEARTBEAT_INTERVAL', 10.0),
+                             config.get('BACKUP_PAGES_PER_STEP', 256),
+                             config.get('BACKUP_STEP_SLEEP', 0.0))
+    return PeriodicTask('replication', config['REPLICATION_INTERVAL'], shipper.ship,
+                        run_immediately=True).start()
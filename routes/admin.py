@@ -0,0 +1,91 @@
+import io
+import os
+import pstats
+from flask import Blueprint, Response, abort, current_app, jsonify, request, send_from_directory
+from utils.decorators import admin_required
+from utils.memory import (count_objects, diff_snapshots, endpoint_peaks, list_snapshots, peak_resident_memory,
+                          resident_memory, start_tracing, stop_tracing, take_snapshot, tracing_status)
+from utils.profiling import list_profiles, sampler_running, write_stacks
+
+admin_bp = Blueprint('admin', __name__)
+
+PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+@admin_bp.route('/profiles')
+@admin_required
+def profiles():
+    """List saved request profiles and folded stack files"""
+    directory = current_app.config['PROFILE_DIR']
+    if sampler_running():
+        # Include this worker's latest samples, not just its last periodic write
+        write_stacks(directory)
+    return jsonify({'profiles': list_profiles(directory)})
+
+@admin_bp.route('/profiles/<name>')
+@admin_required
+def profile(name):
+    """Download a profile, or read it as text with ?format=text"""
+    directory = os.path.abspath(current_app.config['PROFILE_DIR'])
+    if not name.endswith(('.prof', '.folded')) or not os.path.isfile(os.path.join(directory, name)):
+        abort(404)
+    if request.args.get('format') == 'text' and name.endswith('.prof'):
+        output = io.StringIO()
+        stats = pstats.Stats(os.path.join(directory, name), stream=output)
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in PROFILE_SORT_KEYS:
+            abort(400)
+        stats.sort_stats(sort).print_stats(40)
+        return Response(output.getvalue(), content_type='text/plain; charset=utf-8')
+    return send_from_directory(directory, name, as_attachment=request.args.get('format') != 'text')
+
+@admin_bp.route('/memory')
+@admin_required
+def memory():
+    """RSS, object counts, tracemalloc state and sampled endpoint peaks of this worker"""
+    return jsonify({
+        'rss_bytes': resident_memory(),
+        'peak_rss_bytes': peak_resident_memory(),
+        'objects': count_objects(),
+        'tracemalloc': tracing_status(),
+        'endpoints': endpoint_peaks(),
+    })
+
+@admin_bp.route('/memory/tracemalloc/start', methods=['POST'])
+@admin_required
+def start_tracemalloc():
+    """Start tracemalloc in this worker"""
+    frames = request.args.get('frames', 1, type=int)
+    if not 1 <= frames <= 100:
+        return jsonify({'error': 'frames must be between 1 and 100'}), 400
+    return jsonify(start_tracing(frames))
+
+@admin_bp.route('/memory/tracemalloc/stop', methods=['POST'])
+@admin_required
+def stop_tracemalloc():
+    """Stop tracemalloc in this worker"""
+    return jsonify(stop_tracing())
+
+@admin_bp.route('/memory/snapshots', methods=['GET', 'POST'])
+@admin_required
+def memory_snapshots():
+    """List tracemalloc snapshots, or take one of this worker with POST"""
+    directory = current_app.config['MEMORY_SNAPSHOT_DIR']
+    if request.method == 'POST':
+        try:
+            name = take_snapshot(directory)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify({'name': name, 'pid': os.getpid()}), 201
+    return jsonify({'snapshots': list_snapshots(directory)})
+
+@admin_bp.route('/memory/snapshots/<first>/diff/<second>')
+@admin_required
+def memory_diff(first, second):
+    """Allocation growth from one snapshot to a later one"""
+    try:
+        stats = diff_snapshots(current_app.config['MEMORY_SNAPSHOT_DIR'], first, second,
+                               group_by=request.args.get('group_by', 'lineno'),
+                               limit=request.args.get('limit', 25, type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'first': first, 'second': second, 'stats': stats})
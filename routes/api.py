@@ -0,0 +1,318 @@
+"""
+Versioned JSON API over shipments and tasks (mounted at /api/v1)
+
+Lists are cursor-paginated newest first, and `?fields=a,b` trims every object
+to the named fields. Each object's strong ETag comes from its row version and
+the requested fields, so a GET with a matching If-None-Match is answered 304
+straight from the fetched rows, before any model object is built, and
+PATCH/DELETE honour If-Match against any representation of the current version.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from flask import Blueprint, g, jsonify, request, session, url_for
+from database import ConcurrentModificationError, transaction
+from models.shipment import SHIPMENT_FIELDS, Shipment
+from utils.decorators import api_login_required
+from utils.idempotency import idempotent
+from utils.startup import add_lazy_rules
+from utils.validators import validate_shipment_data
+
+api_bp = Blueprint('api', __name__)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_BATCH = 100
+
+# Fields a client may write, with the JSON types they accept
+SHIPMENT_INPUT = {
+    'sender_name': str, 'sender_address': str, 'recipient_name': str,
+    'recipient_address': str, 'package_description': str, 'weight': (int, float),
+    'status': str, 'priority': str, 'is_express': bool,
+}
+SHIPMENT_DEFAULTS = {
+    'sender_name': '', 'sender_address': '', 'recipient_name': '', 'recipient_address': '',
+    'package_description': '', 'weight': 0, 'status': 'pending', 'priority': 'standard',
+    'is_express': False,
+}
+TASK_INPUT = {'title': str, 'description': str, 'status': str, 'priority': str, 'is_urgent': bool}
+TASK_DEFAULTS = {'title': '', 'description': '', 'status': 'pending', 'priority': 'medium',
+                 'is_urgent': False}
+
+_SHIPMENT_ID = SHIPMENT_FIELDS.index('id')
+_SHIPMENT_VERSION = SHIPMENT_FIELDS.index('version')
+_SHIPMENT_CREATED = SHIPMENT_FIELDS.index('created_at')
+
+def _error(message, status, **extra):
+    """JSON error response"""
+    return jsonify({'error': message, **extra}), status
+
+def _parse_fields(allowed):
+    """Read ?fields= into a tuple of field names (None = every field)"""
+    requested = request.args.get('fields')
+    if not requested:
+        return None
+    fields = tuple(name.strip() for name in requested.split(',') if name.strip())
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def _parse_limit():
+    """Read ?limit=, clamped to MAX_LIMIT"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_LIMIT)
+
+def _encode_cursor(created_at, row_id):
+    """Opaque cursor pointing just past a row"""
+    raw = json.dumps([created_at, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    """Turn a cursor back into (created_at, id)"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(row_id, int):
+        raise ValueError('Invalid cursor')
+    return created_at, row_id
+
+def _fields_tag(fields):
+    # Order-insensitive: projected objects are serialized with sorted keys either way
+    return ','.join(sorted(set(fields))) if fields else ''
+
+def _row_etag(row_id, version, fields=None):
+    """Strong ETag of one object; each ?fields= projection is a distinct representation"""
+    tag = f'{row_id}-v{version}'
+    return f'{tag};{_fields_tag(fields)}' if fields else tag
+
+def _list_etag(rows, id_index, version_index, fields=None):
+    """ETag over the (id, version) pairs of a page, including the look-ahead row"""
+    digest = hashlib.sha1(f'{_fields_tag(fields)}|'.encode('ascii'))
+    for row in rows:
+        digest.update(f'{row[id_index]}:{row[version_index]};'.encode('ascii'))
+    return digest.hexdigest()
+
+def _not_modified(etag):
+    response = jsonify()
+    response.status_code = 304
+    response.set_data(b'')
+    response.set_etag(etag)
+    return response
+
+def _project(item, fields):
+    """Keep only the requested fields of a serialized object"""
+    if fields is None:
+        return item
+    return {name: item[name] for name in fields}
+
+def _with_etag(response, etag, status=200, location=None):
+    response.status_code = status
+    response.set_etag(etag)
+    if location:
+        response.headers['Location'] = location
+    return response
+
+def _precondition_failed(row_id, version):
+    """True when If-Match is sent and names no representation of the current version"""
+    if not request.if_match or request.if_match.star_tag:
+        return False
+    current = _row_etag(row_id, version)
+    return not any(tag == current or tag.startswith(f'{current};') for tag in request.if_match)
+
+def _json_body():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    return data
+
+def _merge_input(data, schema, current):
+    """Overlay writable fields from a JSON object on the current values"""
+    if not isinstance(data, dict):
+        raise ValueError('Each item must be a JSON object')
+    unknown = sorted(set(data) - set(schema))
+    if unknown:
+        raise ValueError(f"Unknown or read-only fields: {', '.join(unknown)}")
+    merged = dict(current)
+    for name, value in data.items():
+        # bool is an int subclass; keep true/false out of numeric fields
+        if not isinstance(value, schema[name]) or (schema[name] is not bool and isinstance(value, bool)):
+            raise ValueError(f"Field '{name}' has the wrong type")
+        merged[name] = value
+    return merged
+
+def _apply_input(obj, values, schema):
+    """Copy validated values onto a model object"""
+    for name, kind in schema.items():
+        value = values[name]
+        if kind is str:
+            value = value.strip()
+        elif name == 'weight':
+            value = float(value)
+        setattr(obj, name, value)
+
+@api_bp.route('/shipments', methods=['GET'])
+@api_login_required
+def list_shipments():
+    """List the user's shipments, newest first, one cursor page at a time"""
+    try:
+        fields = _parse_fields(SHIPMENT_FIELDS)
+        limit = _parse_limit()
+        after = _decode_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    rows = Shipment.page_by_user(
+        session['user_id'], after, limit + 1,
+        status_filter=request.args.get('status'),
+        priority_filter=request.args.get('priority'),
+        express_filter=request.args.get('express'),
+        include_archived=request.args.get('archived') == 'include'
+    )
+    etag = _list_etag(rows, _SHIPMENT_ID, _SHIPMENT_VERSION, fields)
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+
+    page = rows[:limit]
+    return _with_etag(jsonify({
+        'data': [_project(Shipment._from_db_row(row).to_dict(), fields) for row in page],
+        'next_cursor': (_encode_cursor(page[-1][_SHIPMENT_CREATED], page[-1][_SHIPMENT_ID])
+                        if len(rows) > limit else None),
+    }), etag)
+
+@api_bp.route('/shipments/<int:shipment_id>', methods=['GET'])
+@api_login_required
+def get_shipment(shipment_id):
+    """Return one shipment, or 304 if the client's copy is current"""
+    try:
+        fields = _parse_fields(SHIPMENT_FIELDS)
+    except ValueError as e:
+        return _error(str(e), 400)
+    row = Shipment.find_by_id(shipment_id, session['user_id'], raw=True)
+    if row is None:
+        return _error('Shipment not found', 404)
+    etag = _row_etag(row[_SHIPMENT_ID], row[_SHIPMENT_VERSION], fields)
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    return _with_etag(jsonify(_project(Shipment._from_db_row(row).to_dict(), fields)), etag)
+
+@api_bp.route('/shipments', methods=['POST'])
+@api_login_required
+@idempotent
+def create_shipment():
+    """Create a shipment from a JSON object"""
+    try:
+        values = _merge_input(_json_body(), SHIPMENT_INPUT, SHIPMENT_DEFAULTS)
+    except ValueError as e:
+        return _error(str(e), 400)
+    errors = validate_shipment_data(values)
+    if errors:
+        return _error('Validation failed', 422, errors=errors)
+
+    shipment = Shipment(user_id=session['user_id'])
+    _apply_input(shipment, values, SHIPMENT_INPUT)
+    try:
+        shipment.save()
+    except ValueError as e:
+        return _error(str(e), 422)
+    g.idempotent_resource_id = shipment.id
+    return _with_etag(jsonify(shipment.to_dict()), _row_etag(shipment.id, shipment.version), 201,
+                      url_for('api.get_shipment', shipment_id=shipment.id))
+
+@api_bp.route('/shipments/batch', methods=['POST'])
+@api_login_required
+@idempotent
+def create_shipments_batch():
+    """Create up to MAX_BATCH shipments in one transaction; nothing is written if any item fails"""
+    try:
+        items = _json_body().get('shipments')
+        if not isinstance(items, list) or not items:
+            raise ValueError("'shipments' must be a non-empty list")
+        if len(items) > MAX_BATCH:
+            raise ValueError(f'At most {MAX_BATCH} shipments per batch')
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    user_id = session['user_id']
+    shipments, errors = [], {}
+    for index, item in enumerate(items):
+        try:
+            values = _merge_input(item, SHIPMENT_INPUT, SHIPMENT_DEFAULTS)
+        except ValueError as e:
+            errors[index] = [str(e)]
+            continue
+        item_errors = validate_shipment_data(values)
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        shipment = Shipment(user_id=user_id)
+        _apply_input(shipment, values, SHIPMENT_INPUT)
+        shipments.append(shipment)
+    if errors:
+        return _error('Validation failed', 422, errors=errors)
+
+    with transaction(user_id):
+        for shipment in shipments:
+            shipment.save()
+    return jsonify({'data': [shipment.to_dict() for shipment in shipments]}), 201
+
+@api_bp.route('/shipments/<int:shipment_id>', methods=['PATCH'])
+@api_login_required
+def update_shipment(shipment_id):
+    """Change some fields of a shipment; If-Match guards against overwriting newer edits"""
+    shipment = Shipment.find_by_id(shipment_id, session['user_id'])
+    if shipment is None:
+        return _error('Shipment not found', 404)
+    if _precondition_failed(shipment.id, shipment.version):
+        return _error('Shipment was modified since it was fetched', 412)
+    current = {name: getattr(shipment, name) for name in SHIPMENT_INPUT}
+    current['package_description'] = current['package_description'] or ''
+    try:
+        values = _merge_input(_json_body(), SHIPMENT_INPUT, current)
+    except ValueError as e:
+        return _error(str(e), 400)
+    errors = validate_shipment_data(values)
+    if errors:
+        return _error('Validation failed', 422, errors=errors)
+
+    _apply_input(shipment, values, SHIPMENT_INPUT)
+    try:
+        shipment.save()
+    except ConcurrentModificationError:
+        return _error('Shipment was modified since it was fetched', 412)
+    except ValueError as e:
+        return _error(str(e), 422)
+    return _with_etag(jsonify(shipment.to_dict()), _row_etag(shipment.id, shipment.version))
+
+@api_bp.route('/shipments/<int:shipment_id>', methods=['DELETE'])
+@api_login_required
+def delete_shipment(shipment_id):
+    """Delete a shipment"""
+    shipment = Shipment.find_by_id(shipment_id, session['user_id'])
+    if shipment is None:
+        return _error('Shipment not found', 404)
+    if _precondition_failed(shipment.id, shipment.version):
+        return _error('Shipment was modified since it was fetched', 412)
+    shipment.delete()
+    return '', 204
+
+# Task endpoints live in routes/task_api.py so models.task is imported on the
+# first task request, not at startup
+add_lazy_rules(api_bp, 'routes.task_api', [
+    ('/tasks', 'list_tasks', ['GET']),
+    ('/tasks/<int:task_id>', 'get_task', ['GET']),
+    ('/tasks', 'create_task', ['POST']),
+    ('/tasks/<int:task_id>', 'update_task', ['PATCH']),
+    ('/tasks/<int:task_id>', 'delete_task', ['DELETE']),
+])
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models.user import User
+from utils.tracing import log
 from utils.validators import validate_user_data
 
 auth_bp = Blueprint('auth', __name__)
@@ -27,7 +28,7 @@ def login():
                 flash('Invalid username or password!', 'error')
         except Exception as e:
             flash('Login failed. Please try again.', 'error')
-            print(f"Login error: {e}")
+            log.error("Login error: %s", e)
     
     return render_template('login.html')
 
@@ -66,6 +67,6 @@ def register():
             flash(str(e), 'error')
         except Exception as e:
             flash('Registration failed. Please try again.', 'error')
-            print(f"Registration error: {e}")
+            log.error("Registration error: %s", e)
     
     return render_template('register.html')
@@ -1,4 +1,6 @@
-from flask import Blueprint, redirect, url_for, session
+from flask import Blueprint, Response, current_app, redirect, url_for, session
+from utils.decorators import metrics_access_required
+from utils.metrics import metrics_text
 
 main_bp = Blueprint('main', __name__)
 
@@ -8,3 +10,10 @@ def index():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     return redirect(url_for('shipments.list_shipments'))
+
+@main_bp.route('/metrics')
+@metrics_access_required
+def metrics():
+    """Prometheus scrape endpoint covering every worker process"""
+    return Response(metrics_text(current_app.config),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify, Response, stream_with_context, g
+from database import ConcurrentModificationError
 from models.shipment import Shipment
+from models.rollup import ShipmentRollup
 from utils.decorators import login_required
-from utils.validators import validate_shipment_data
+from utils.helpers import Pagination
+from utils.idempotency import idempotent
+from utils.tracing import annotate, log
+from utils.validators import validate_shipment_data, validate_date_range
+import uuid
 
 shipments_bp = Blueprint('shipments', __name__)
 
@@ -14,56 +20,67 @@ def list_shipments():
         status_filter = request.args.get('status', '')
         priority_filter = request.args.get('priority', '')
         express_filter = request.args.get('express', '')
+        archived_filter = request.args.get('archived', '')
         search_term = request.args.get('search', '').strip()
         
         # Pagination parameters
         page = int(request.args.get('page', 1))
         per_page = current_app.config['ITEMS_PER_PAGE']
         
-        # Debug information
-        print(f"DEBUG: User ID in session: {session.get('user_id')}")
-        print(f"DEBUG: Username in session: {session.get('username')}")
-        
         # Search or filter shipments
+        count_limit = current_app.config['PAGINATION_EXACT_COUNT_LIMIT']
         if search_term:
-            shipments, total_pages, total_count = Shipment.search_shipments(
+            shipments, pagination = Shipment.paginate_search(
                 user_id=session['user_id'],
                 search_term=search_term,
                 page=page,
-                per_page=per_page
+                per_page=per_page,
+                include_archived=archived_filter == 'true',
+                count_limit=count_limit
             )
         else:
-            shipments, total_pages, total_count = Shipment.find_by_user(
+            shipments, pagination = Shipment.paginate_by_user(
                 user_id=session['user_id'],
                 status_filter=status_filter,
                 priority_filter=priority_filter,
                 express_filter=express_filter,
                 page=page,
-                per_page=per_page
+                per_page=per_page,
+                include_archived=archived_filter == 'true',
+                count_limit=count_limit
             )
         
-        print(f"DEBUG: Found {len(shipments)} shipments for user {session['user_id']}")
-        print(f"DEBUG: Total count: {total_count}, Total pages: {total_pages}")
+        # Recorded on the request span of sampled requests only
+        annotate(user_id=session['user_id'], shipments=len(shipments),
+                 total=pagination.total, total_kind=pagination.total_kind)
         
         return render_template('shipments.html', 
                              shipments=shipments, 
-                             current_page=page,
-                             total_pages=total_pages,
-                             total_count=total_count,
+                             pagination=pagination,
                              status_filter=status_filter,
                              priority_filter=priority_filter,
                              express_filter=express_filter,
+                             archived_filter=archived_filter,
                              search_term=search_term,
                              status_choices=Shipment.get_status_choices(),
                              priority_choices=Shipment.get_priority_choices())
     except Exception as e:
         flash('Error loading shipments. Please try again.', 'error')
-        print(f"List shipments error: {e}")
-        return render_template('shipments.html', shipments=[], current_page=1, 
-                             total_pages=1, total_count=0, status_choices=[], priority_choices=[])
+        log.error("List shipments error: %s", e)
+        return render_template('shipments.html', shipments=[], pagination=Pagination(1, 1, 0),
+                             status_choices=Shipment.get_status_choices(),
+                             priority_choices=Shipment.get_priority_choices())
+
+def _render_create_form(status=200):
+    """Render the create form with a fresh idempotency key, so double submits create one shipment"""
+    return render_template('create_shipment.html',
+                         idempotency_key=uuid.uuid4().hex,
+                         status_choices=Shipment.get_status_choices(),
+                         priority_choices=Shipment.get_priority_choices()), status
 
 @shipments_bp.route('/create', methods=['GET', 'POST'])
 @login_required
+@idempotent
 def create_shipment():
     """Create a new shipment"""
     if request.method == 'POST':
@@ -73,13 +90,7 @@ def create_shipment():
             if validation_errors:
                 for error in validation_errors:
                     flash(error, 'error')
-                return render_template('create_shipment.html',
-                                     status_choices=Shipment.get_status_choices(),
-                                     priority_choices=Shipment.get_priority_choices())
-            
-            # Debug information
-            print(f"DEBUG: Creating shipment for user_id: {session['user_id']}")
-            print(f"DEBUG: Session data: {dict(session)}")
+                return _render_create_form(400)
             
             # Create new shipment
             shipment = Shipment(
@@ -96,19 +107,21 @@ def create_shipment():
             )
             
             shipment.save()
-            print(f"DEBUG: Shipment saved with ID: {shipment.id}, user_id: {shipment.user_id}")
+            g.idempotent_resource_id = shipment.id
+            annotate(user_id=shipment.user_id, shipment_id=shipment.id)
             flash(f'Shipment created successfully! Tracking Number: {shipment.tracking_number}', 'success')
             return redirect(url_for('shipments.list_shipments'))
             
         except ValueError as e:
             flash(str(e), 'error')
+            return _render_create_form(400)
         except Exception as e:
+            # A 5xx releases the idempotency key, so a retry of a transient failure runs again
             flash('Failed to create shipment. Please try again.', 'error')
-            print(f"Create shipment error: {e}")
+            log.error("Create shipment error: %s", e)
+            return _render_create_form(500)
     
-    return render_template('create_shipment.html',
-                         status_choices=Shipment.get_status_choices(),
-                         priority_choices=Shipment.get_priority_choices())
+    return _render_create_form()
 
 @shipments_bp.route('/<int:shipment_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -142,6 +155,10 @@ def edit_shipment(shipment_id):
             shipment.status = request.form['status']
             shipment.priority = request.form['priority']
             shipment.is_express = 'is_express' in request.form
+            # Check against the version the form was rendered from, so edits
+            # saved by others in the meantime are not overwritten
+            if request.form.get('version', '').isdigit():
+                shipment.version = int(request.form['version'])
             
             shipment.save()
             flash('Shipment updated successfully!', 'success')
@@ -151,9 +168,12 @@ def edit_shipment(shipment_id):
                              shipment=shipment,
                              status_choices=Shipment.get_status_choices(),
                              priority_choices=Shipment.get_priority_choices())
+    except ConcurrentModificationError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('shipments.edit_shipment', shipment_id=shipment_id))
     except Exception as e:
         flash('Error processing shipment. Please try again.', 'error')
-        print(f"Edit shipment error: {e}")
+        log.error("Edit shipment error: %s", e)
         return redirect(url_for('shipments.list_shipments'))
 
 @shipments_bp.route('/<int:shipment_id>/delete', methods=['POST'])
@@ -171,7 +191,7 @@ def delete_shipment(shipment_id):
         flash('Shipment deleted successfully!', 'success')
     except Exception as e:
         flash('Failed to delete shipment. Please try again.', 'error')
-        print(f"Delete shipment error: {e}")
+        log.error("Delete shipment error: %s", e)
     
     return redirect(url_for('shipments.list_shipments'))
 
@@ -190,9 +210,11 @@ def toggle_express(shipment_id):
         shipment.save()
         status = 'marked as express' if shipment.is_express else 'unmarked as express'
         flash(f'Shipment {status} successfully!', 'success')
+    except ConcurrentModificationError as e:
+        flash(str(e), 'error')
     except Exception as e:
         flash('Failed to update shipment. Please try again.', 'error')
-        print(f"Toggle express error: {e}")
+        log.error("Toggle express error: %s", e)
     
     return redirect(url_for('shipments.list_shipments'))
 
@@ -212,24 +234,117 @@ def track_shipment():
                     flash('Shipment not found with this tracking number!', 'error')
             except Exception as e:
                 flash('Error tracking shipment. Please try again.', 'error')
-                print(f"Track shipment error: {e}")
+                log.error("Track shipment error: %s", e)
         else:
             flash('Please enter a tracking number!', 'error')
     
     return render_template('track_shipment.html', shipment=shipment)
 
+@shipments_bp.route('/export')
+@login_required
+def export_shipments():
+    """Stream the user's filtered shipments as CSV or NDJSON"""
+    from utils.export import EXPORT_FORMATS, generate_export
+    
+    export_format = request.args.get('format', 'csv').lower()
+    status_filter = request.args.get('status', '')
+    priority_filter = request.args.get('priority', '')
+    express_filter = request.args.get('express', '')
+    archived_filter = request.args.get('archived', '')
+    date_from = request.args.get('date_from', '').strip()
+    date_to = request.args.get('date_to', '').strip()
+    compress = request.args.get('gzip', '') in ('1', 'true')
+    
+    if export_format not in EXPORT_FORMATS:
+        flash('Unsupported export format!', 'error')
+        return redirect(url_for('shipments.list_shipments'))
+    
+    validation_errors = validate_date_range(date_from, date_to)
+    if validation_errors:
+        for error in validation_errors:
+            flash(error, 'error')
+        return redirect(url_for('shipments.list_shipments'))
+    
+    shipments = Shipment.iter_by_user(
+        user_id=session['user_id'],
+        status_filter=status_filter,
+        priority_filter=priority_filter,
+        express_filter=express_filter,
+        date_from=date_from,
+        date_to=date_to,
+        batch_size=current_app.config['EXPORT_BATCH_SIZE'],
+        reporting=True,
+        include_archived=archived_filter == 'true'
+    )
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f'shipments.{extension}'
+    if compress:
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    
+    return Response(
+        stream_with_context(generate_export(shipments, export_format, compress)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def _get_stats_params():
+    """Read and clamp time-series parameters from the query string"""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('day', 'hour'):
+        granularity = 'day'
+    
+    try:
+        days = int(request.args.get('days', 90 if granularity == 'day' else 2))
+    except ValueError:
+        days = 90
+    days = max(1, min(days, 366))
+    
+    status_filter = request.args.get('status', '')
+    return granularity, days, status_filter
+
 @shipments_bp.route('/stats')
 @login_required
 def shipment_stats():
     """Display shipment statistics"""
     try:
+        granularity, days, status_filter = _get_stats_params()
         stats = Shipment.get_status_stats(session['user_id'])
-        return render_template('shipment_stats.html', stats=stats)
+        series = ShipmentRollup.get_time_series(
+            session['user_id'], granularity=granularity, days=days, status_filter=status_filter
+        )
+        return render_template('shipment_stats.html', 
+                             stats=stats,
+                             series=series,
+                             granularity=granularity,
+                             days=days,
+                             status_filter=status_filter,
+                             status_choices=Shipment.get_status_choices())
     except Exception as e:
         flash('Error loading statistics. Please try again.', 'error')
-        print(f"Shipment stats error: {e}")
+        log.error("Shipment stats error: %s", e)
         return redirect(url_for('shipments.list_shipments'))
 
+@shipments_bp.route('/api/stats')
+@login_required
+def shipment_stats_api():
+    """API endpoint returning time-bucketed volume and revenue"""
+    try:
+        granularity, days, status_filter = _get_stats_params()
+        series = ShipmentRollup.get_time_series(
+            session['user_id'], granularity=granularity, days=days, status_filter=status_filter
+        )
+        return jsonify({
+            'granularity': granularity,
+            'days': days,
+            'status': status_filter or None,
+            'series': series
+        })
+    except Exception as e:
+        log.error("Shipment stats API error: %s", e)
+        return jsonify({'error': 'Failed to load statistics'}), 500
+
 @shipments_bp.route('/api/cost-calculator', methods=['POST'])
 @login_required
 def calculate_cost():
@@ -243,5 +358,5 @@ def calculate_cost():
         cost = Shipment.calculate_shipping_cost(weight, priority, is_express)
         return jsonify({'cost': cost})
     except Exception as e:
-        print(f"Cost calculation error: {e}")
+        log.error("Cost calculation error: %s", e)
         return jsonify({'error': 'Failed to calculate cost'}), 500
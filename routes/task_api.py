@@ -0,0 +1,118 @@
+"""
+Task endpoints of the JSON API, imported on the first task request
+
+Registered on api_bp by routes/api.py; see there for cursors, field
+projection and ETags.
+"""
+
+from flask import g, jsonify, request, session, url_for
+from database import ConcurrentModificationError
+from models.task import TASK_FIELDS, Task
+from routes.api import (TASK_DEFAULTS, TASK_INPUT, _apply_input, _decode_cursor, _encode_cursor,
+                        _error, _json_body, _list_etag, _merge_input, _not_modified,
+                        _parse_fields, _parse_limit, _precondition_failed, _project, _row_etag,
+                        _with_etag)
+from utils.decorators import api_login_required
+from utils.idempotency import idempotent
+from utils.validators import validate_task_data
+
+_TASK_ID = TASK_FIELDS.index('id')
+_TASK_VERSION = TASK_FIELDS.index('version')
+_TASK_CREATED = TASK_FIELDS.index('created_at')
+
+@api_login_required
+def list_tasks():
+    """List the user's tasks, newest first, one cursor page at a time"""
+    try:
+        fields = _parse_fields(TASK_FIELDS)
+        limit = _parse_limit()
+        after = _decode_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    rows = Task.page_by_user(
+        session['user_id'], after, limit + 1,
+        status_filter=request.args.get('status'),
+        priority_filter=request.args.get('priority'),
+        urgent_filter=request.args.get('urgent')
+    )
+    etag = _list_etag(rows, _TASK_ID, _TASK_VERSION, fields)
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+
+    page = rows[:limit]
+    return _with_etag(jsonify({
+        'data': [_project(Task._from_db_row(row).to_dict(), fields) for row in page],
+        'next_cursor': (_encode_cursor(page[-1][_TASK_CREATED], page[-1][_TASK_ID])
+                        if len(rows) > limit else None),
+    }), etag)
+
+@api_login_required
+def get_task(task_id):
+    """Return one task, or 304 if the client's copy is current"""
+    try:
+        fields = _parse_fields(TASK_FIELDS)
+    except ValueError as e:
+        return _error(str(e), 400)
+    row = Task.find_by_id(task_id, session['user_id'], raw=True)
+    if row is None:
+        return _error('Task not found', 404)
+    etag = _row_etag(row[_TASK_ID], row[_TASK_VERSION], fields)
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    return _with_etag(jsonify(_project(Task._from_db_row(row).to_dict(), fields)), etag)
+
+@api_login_required
+@idempotent
+def create_task():
+    """Create a task from a JSON object"""
+    try:
+        values = _merge_input(_json_body(), TASK_INPUT, TASK_DEFAULTS)
+    except ValueError as e:
+        return _error(str(e), 400)
+    errors = validate_task_data(values)
+    if errors:
+        return _error('Validation failed', 422, errors=errors)
+
+    task = Task(user_id=session['user_id'])
+    _apply_input(task, values, TASK_INPUT)
+    task.save()
+    g.idempotent_resource_id = task.id
+    return _with_etag(jsonify(task.to_dict()), _row_etag(task.id, task.version), 201,
+                      url_for('api.get_task', task_id=task.id))
+
+@api_login_required
+def update_task(task_id):
+    """Change some fields of a task; If-Match guards against overwriting newer edits"""
+    task = Task.find_by_id(task_id, session['user_id'])
+    if task is None:
+        return _error('Task not found', 404)
+    if _precondition_failed(task.id, task.version):
+        return _error('Task was modified since it was fetched', 412)
+    current = {name: getattr(task, name) for name in TASK_INPUT}
+    current['description'] = current['description'] or ''
+    try:
+        values = _merge_input(_json_body(), TASK_INPUT, current)
+    except ValueError as e:
+        return _error(str(e), 400)
+    errors = validate_task_data(values)
+    if errors:
+        return _error('Validation failed', 422, errors=errors)
+
+    _apply_input(task, values, TASK_INPUT)
+    try:
+        task.save()
+    except ConcurrentModificationError:
+        return _error('Task was modified since it was fetched', 412)
+    return _with_etag(jsonify(task.to_dict()), _row_etag(task.id, task.version))
+
+@api_login_required
+def delete_task(task_id):
+    """Delete a task"""
+    task = Task.find_by_id(task_id, session['user_id'])
+    if task is None:
+        return _error('Task not found', 404)
+    if _precondition_failed(task.id, task.version):
+        return _error('Task was modified since it was fetched', 412)
+    task.delete()
+    return '', 204
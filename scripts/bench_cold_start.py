@@ -0,0 +1,61 @@
+"""
+Cold start benchmark for the Shipment Manager application
+Measures time-to-first-request for a missing database, with and without a
+prebuilt image from `flask db build-image`
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so import and schema work are both counted
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from app import create_app
+app = create_app()
+client = app.test_client()
+response = client.post('/auth/login', data={{'username': 'admin', 'password': 'admin123'}})
+assert response.status_code == 302, response.status_code
+print(json.dumps({{'seconds': time.perf_counter() - start}}))
+'''
+
+def cold_start(db_path, image_path=None):
+    env = dict(os.environ, DATABASE_PATH=db_path)
+    env.pop('DATABASE_IMAGE_PATH', None)
+    if image_path:
+        env['DATABASE_IMAGE_PATH'] = image_path
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=PROJECT_ROOT)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])['seconds']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    from database import build_database_image
+
+    with tempfile.TemporaryDirectory() as workdir:
+        image_path = os.path.join(workdir, 'image.db')
+        build_database_image(image_path)
+        db_path = os.path.join(workdir, 'shipments.db')
+
+        for label, image in (('schema + seed', None), ('prebuilt image', image_path)):
+            samples = [cold_start(db_path, image) for _ in range(args.runs)]
+            print(f"{label:<16} median {statistics.median(samples) * 1000:8.1f} ms "
+                  f"(min {min(samples) * 1000:.1f} ms)")
+
+if __name__ == '__main__':
+    main()
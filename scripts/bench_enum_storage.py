@@ -0,0 +1,90 @@
+"""
+Enum storage benchmark for the Shipment Manager application
+Compares TEXT status/priority columns against integer enum codes:
+database file size, status index size and status index scan speed
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from models.enums import STATUS_NAMES, PRIORITY_NAMES
+
+def build(path, rows, use_codes, batch=100000):
+    """Create a shipments-shaped table with N rows and a status index"""
+    column_type = 'INTEGER' if use_codes else 'TEXT'
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute(f'''CREATE TABLE shipments
+                     (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,
+                      weight REAL, status {column_type} NOT NULL,
+                      priority {column_type} NOT NULL, shipping_cost REAL)''')
+    rng = random.Random(42)
+    status_count = len(STATUS_NAMES)
+    priority_count = len(PRIORITY_NAMES)
+    for start in range(0, rows, batch):
+        chunk = []
+        for i in range(start, min(start + batch, rows)):
+            status = rng.randrange(status_count)
+            priority = rng.randrange(priority_count)
+            chunk.append((i + 1, i % 1000,
+                          status if use_codes else STATUS_NAMES[status],
+                          priority if use_codes else PRIORITY_NAMES[priority]))
+        conn.executemany('INSERT INTO shipments (id, user_id, status, priority, weight, shipping_cost) '
+                         'VALUES (?, ?, ?, ?, 1.0, 7.0)', chunk)
+        conn.commit()
+    conn.execute('CREATE INDEX idx_shipments_status ON shipments(status)')
+    conn.execute('CREATE INDEX idx_shipments_user_status ON shipments(user_id, status)')
+    conn.commit()
+    return conn
+
+def index_bytes(conn, name):
+    """Return the on-disk size of an index using the dbstat virtual table if available"""
+    try:
+        row = conn.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (name,)).fetchone()
+        return row[0]
+    except sqlite3.OperationalError:
+        return None
+
+def time_scan(conn, value, repeat):
+    """Best-of-N time for a covering COUNT over the status index"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute('SELECT COUNT(*) FROM shipments INDEXED BY idx_shipments_status WHERE status = ?',
+                     (value,)).fetchone()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='Rows per database (use 10000000 for the full-size comparison)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'storage':<10} {'file MB':>10} {'status idx MB':>14} {'scan ms':>10}")
+    for use_codes in (False, True):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            conn = build(path, args.rows, use_codes)
+            value = 4 if use_codes else 'delivered'
+            scan = time_scan(conn, value, args.repeat)
+            idx = index_bytes(conn, 'idx_shipments_status')
+            conn.close()
+            size = os.path.getsize(path)
+            label = 'codes' if use_codes else 'text'
+            idx_mb = f'{idx / 1e6:>14.1f}' if idx is not None else f"{'n/a':>14}"
+            print(f"{label:<10} {size / 1e6:>10.1f} {idx_mb} {scan * 1000:>10.1f}")
+        finally:
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Model hydration benchmark for the Shipment Manager application
+Compares the slot-based Shipment against the previous dict-backed class
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import gc
+import sqlite3
+import time
+import tracemalloc
+from models.enums import ShipmentPriority, ShipmentStatus
+from models.shipment import Shipment, SHIPMENT_COLUMNS, SHIPMENT_FIELDS
+
+class LegacyShipment:
+    """Dict-backed Shipment as it was before __slots__ (kept for comparison)"""
+
+    def __init__(self, id=None, tracking_number=None, sender_name=None, sender_address=None,
+                 recipient_name=None, recipient_address=None, package_description=None,
+                 weight=None, status='pending', priority='standard', is_express=False,
+                 shipping_cost=0.0, created_at=None, updated_at=None, user_id=None):
+        self.id = id
+        self.tracking_number = tracking_number
+        self.sender_name = sender_name
+        self.sender_address = sender_address
+        self.recipient_name = recipient_name
+        self.recipient_address = recipient_address
+        self.package_description = package_description
+        self.weight = weight or 0.0
+        self.status = status
+        self.priority = priority
+        self.is_express = is_express
+        self.shipping_cost = shipping_cost
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.user_id = user_id
+
+    @staticmethod
+    def _from_db_row(row):
+        return LegacyShipment(
+            id=row['id'],
+            tracking_number=row['tracking_number'],
+            sender_name=row['sender_name'],
+            sender_address=row['sender_address'],
+            recipient_name=row['recipient_name'],
+            recipient_address=row['recipient_address'],
+            package_description=row['package_description'],
+            weight=row['weight'],
+            status=row['status'],
+            priority=row['priority'],
+            is_express=bool(row['is_express']),
+            shipping_cost=row['shipping_cost'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at'] if 'updated_at' in row.keys() else None,
+            user_id=row['user_id']
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tracking_number': self.tracking_number,
+            'sender_name': self.sender_name,
+            'sender_address': self.sender_address,
+            'recipient_name': self.recipient_name,
+            'recipient_address': self.recipient_address,
+            'package_description': self.package_description,
+            'weight': self.weight,
+            'status': self.status,
+            'priority': self.priority,
+            'is_express': self.is_express,
+            'shipping_cost': self.shipping_cost,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'user_id': self.user_id
+        }
+
+def build_database(rows):
+    """Create an in-memory shipments table with synthetic rows"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''CREATE TABLE shipments
+                    (id INTEGER PRIMARY KEY, tracking_number TEXT, sender_name TEXT,
+                     sender_address TEXT, recipient_name TEXT, recipient_address TEXT,
+                     package_description TEXT, weight REAL, status INTEGER, priority INTEGER,
+                     is_express BOOLEAN, shipping_cost REAL, created_at TIMESTAMP,
+                     updated_at TIMESTAMP, user_id INTEGER, version INTEGER)''')
+    conn.executemany(
+        f'INSERT INTO shipments ({SHIPMENT_COLUMNS}) VALUES ({", ".join("?" * len(SHIPMENT_FIELDS))})',
+        ((i, f'SHP{i:08d}', f'Sender {i}', f'{i} Main St, Springfield',
+          f'Recipient {i}', f'{i} Oak Ave, Shelbyville', 'Books', 1.5 + i % 20,
+          ShipmentStatus.IN_TRANSIT, ShipmentPriority.STANDARD, i % 2, 8.0, '2024-01-01 12:00:00',
+          '2024-01-02 12:00:00', 1, 1) for i in range(1, rows + 1))
+    )
+    return conn
+
+def fetch(conn, raw):
+    conn.row_factory = None if raw else sqlite3.Row
+    return conn.execute(f'SELECT {SHIPMENT_COLUMNS} FROM shipments').fetchall()
+
+def measure(label, rows, factory, serialize, repeat):
+    """Report hydration throughput and retained memory for a model factory"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        objects = [factory(row) for row in rows]
+        if serialize:
+            for obj in objects:
+                obj.to_dict()
+        best = min(best, time.perf_counter() - start)
+        del objects
+
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory(row) for row in rows]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+
+    print(f"{label:<34} {len(rows) / best:>12,.0f} rows/s {retained / len(rows):>8.0f} B/object")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    conn = build_database(args.rows)
+    row_objects = fetch(conn, raw=False)
+    tuples = fetch(conn, raw=True)
+
+    print(f"Hydrating {args.rows:,} shipments (best of {args.repeat})")
+    measure('legacy (sqlite3.Row, dict)', row_objects, LegacyShipment._from_db_row, False, args.repeat)
+    measure('slots (sqlite3.Row)', row_objects, Shipment._from_db_row, False, args.repeat)
+    measure('slots (raw tuples)', tuples, Shipment._from_db_row, False, args.repeat)
+    measure('legacy + to_dict()', row_objects, LegacyShipment._from_db_row, True, args.repeat)
+    measure('slots + to_dict()', tuples, Shipment._from_db_row, True, args.repeat)
+
+if __name__ == '__main__':
+    main()
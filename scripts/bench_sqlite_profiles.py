@@ -0,0 +1,87 @@
+"""
+SQLite profile benchmark for the Shipment Manager application
+Compares the durable / balanced / throughput PRAGMA profiles from config.py:
+committed single-row writes, bulk inserts, point lookups and an aggregate scan
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import io
+import random
+import sqlite3
+import tempfile
+import time
+from config import Config
+from database import apply_sqlite_profile
+from migrations import migrate
+
+INSERT = '''INSERT INTO shipments (tracking_number, sender_name, sender_address, recipient_name,
+                                   recipient_address, weight, status, priority, is_express,
+                                   shipping_cost, user_id)
+            VALUES (?, 'Sender', '1 Bench St', 'Recipient', '2 Bench Ave', ?, ?, ?, 0, ?, 1)'''
+
+def run_profile(name, settings, commits, bulk_rows, lookups):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute('PRAGMA foreign_keys = ON')
+        apply_sqlite_profile(conn, settings)
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(conn, online_pause=0)
+        rng = random.Random(42)
+
+        start = time.perf_counter()
+        for i in range(commits):
+            conn.execute(INSERT, (f'C{i:09d}', rng.random() * 20, rng.randrange(6), rng.randrange(3), 7.0))
+            conn.commit()
+        commit_rate = commits / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        conn.executemany(INSERT, ((f'B{i:09d}', rng.random() * 20, rng.randrange(6), rng.randrange(3), 7.0)
+                                  for i in range(bulk_rows)))
+        conn.commit()
+        bulk_rate = bulk_rows / (time.perf_counter() - start)
+
+        max_id = conn.execute('SELECT MAX(id) FROM shipments').fetchone()[0]
+        start = time.perf_counter()
+        for _ in range(lookups):
+            conn.execute('SELECT * FROM shipments WHERE id = ?', (rng.randint(1, max_id),)).fetchone()
+        lookup_rate = lookups / (time.perf_counter() - start)
+
+        scan = float('inf')
+        for _ in range(5):
+            start = time.perf_counter()
+            conn.execute('SELECT status, COUNT(*), SUM(shipping_cost) FROM shipments GROUP BY status').fetchall()
+            scan = min(scan, time.perf_counter() - start)
+
+        wal_path = f'{path}-wal'
+        wal_mb = os.path.getsize(wal_path) / 1e6 if os.path.exists(wal_path) else 0.0
+        conn.close()
+        return commit_rate, bulk_rate, lookup_rate, scan * 1000, wal_mb
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commits', type=int, default=2000, help='Single-row committed transactions')
+    parser.add_argument('--bulk-rows', type=int, default=200000, help='Rows inserted in one transaction')
+    parser.add_argument('--lookups', type=int, default=50000, help='Random primary key lookups')
+    args = parser.parse_args()
+
+    print(f"{'profile':<12} {'commits/s':>10} {'bulk rows/s':>12} {'lookups/s':>10} "
+          f"{'scan ms':>8} {'WAL MB':>7}")
+    for name, settings in Config.SQLITE_PROFILES.items():
+        commit_rate, bulk_rate, lookup_rate, scan_ms, wal_mb = run_profile(
+            name, settings, args.commits, args.bulk_rows, args.lookups)
+        print(f"{name:<12} {commit_rate:>10.0f} {bulk_rate:>12.0f} {lookup_rate:>10.0f} "
+              f"{scan_ms:>8.1f} {wal_mb:>7.1f}")
+
+if __name__ == '__main__':
+    main()
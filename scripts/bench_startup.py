@@ -0,0 +1,63 @@
+"""
+Startup benchmark for the Shipment Manager application
+Measures import time and create_app() time in fresh interpreters against an
+already-migrated database, i.e. what every newly spawned worker pays
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+print(json.dumps({{'import': imported - start, 'create_app': time.perf_counter() - imported,
+                  'phases': app.extensions['startup_profile'].to_dict()['phases']}}))
+'''
+
+def start_worker(env):
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=PROJECT_ROOT)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='Print the medians as JSON.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DATABASE_PATH=os.path.join(workdir, 'shipments.db'))
+        env.pop('DATABASE_IMAGE_PATH', None)
+        start_worker(env)  # migrate and seed once, outside the measurement
+        samples = [start_worker(env) for _ in range(args.runs)]
+
+    result = {
+        'import_ms': statistics.median(s['import'] for s in samples) * 1000,
+        'create_app_ms': statistics.median(s['create_app'] for s in samples) * 1000,
+    }
+    result['startup_ms'] = result['import_ms'] + result['create_app_ms']
+    for phase in samples[0]['phases']:
+        result[f"phase_{phase['name']}_ms"] = statistics.median(
+            next(p['ms'] for p in s['phases'] if p['name'] == phase['name']) for s in samples)
+
+    if args.json:
+        print(json.dumps({key: round(value, 2) for key, value in result.items()}))
+        return
+    for key, value in result.items():
+        print(f"{key:<24} {value:8.1f}")
+
+if __name__ == '__main__':
+    main()
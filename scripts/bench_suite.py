@@ -0,0 +1,282 @@
+"""
+Benchmark suite for the Shipment Manager application
+Times model, database and full-route hot paths against a synthetic database
+and compares the medians with a stored baseline
+
+    python scripts/bench_suite.py --size 10k                  # run, compare, write JSON
+    python scripts/bench_suite.py --size 10k --save-baseline  # record a new baseline
+    python scripts/bench_suite.py --size 1m --only find_by_user
+
+Synthetic databases are built once per size under --db-dir and reused. The
+exit status is 1 when any benchmark's median is slower than its baseline by
+more than the threshold (and by more than --min-delta-ms, which keeps
+sub-millisecond noise from failing a run). Thresholds live in the baseline
+file: a "default" plus optional per-benchmark entries.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Databases are migrated explicitly; create_app must not touch ./shipments.db
+os.environ['AUTO_MIGRATE'] = '0'
+
+import argparse
+import itertools
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from app import create_app
+from database import close_db_connection, get_db_connection, init_db
+from models.shipment import Shipment
+from seed import seed_database
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, 'scripts', 'bench_baseline.json')
+DEFAULT_DB_DIR = os.path.join(PROJECT_ROOT, 'build', 'bench')
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+# One user per this many shipments on average; ownership is skewed, so the
+# benchmarked user is the middle-ranked one rather than the heaviest
+SHIPMENTS_PER_USER = 1000
+BENCH_SEED = 42
+BENCH_PASSWORD = 'benchpass'
+DEFAULT_THRESHOLD = 0.5
+
+def build_database(path, shipments, seed=BENCH_SEED):
+    """Create a migrated database holding `shipments` synthetic shipments"""
+    app = create_app()
+    app.config['DATABASE_PATH'] = path
+    with app.app_context():
+        close_db_connection()
+        init_db()
+        seed_database(get_db_connection(), users=max(shipments // SHIPMENTS_PER_USER, 1),
+                      shipments=shipments, tasks=shipments // 10, seed=seed, password=BENCH_PASSWORD)
+        close_db_connection()
+
+def database_for(size, shipments, db_dir, rebuild):
+    path = os.path.join(db_dir, f'bench-{size}.db')
+    if rebuild or not os.path.exists(path):
+        os.makedirs(db_dir, exist_ok=True)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f"Building {shipments:,} shipments into {path}")
+        start = time.perf_counter()
+        build_database(path, shipments)
+        print(f"  built in {time.perf_counter() - start:.1f}s")
+    return path
+
+def timed(func, repeat, warmup=1):
+    """Run func warmup + repeat times; milliseconds of the timed runs"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(samples[0], 4),
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[int(0.95 * (len(samples) - 1))], 4),
+    }
+
+def model_benchmarks(user_id, tracking_number, search_term, inserted):
+    """(name, callable, repeat scale) for model-level hot paths; run inside an app context"""
+    benchmarks = []
+    filters = {'status': 'in_transit', 'priority': 'urgent', 'express': 'true'}
+    for size in range(len(filters) + 1):
+        for combination in itertools.combinations(filters, size):
+            chosen = {name: filters[name] for name in combination}
+            label = '+'.join(combination) or 'none'
+            benchmarks.append((f'find_by_user[{label}]', lambda chosen=chosen: Shipment.find_by_user(
+                user_id, chosen.get('status'), chosen.get('priority'), chosen.get('express')), 1))
+
+    benchmarks.append(('search_shipments', lambda: Shipment.search_shipments(user_id, search_term), 1))
+    benchmarks.append(('find_by_tracking_number',
+                       lambda: Shipment.find_by_tracking_number(tracking_number, user_id), 1))
+    benchmarks.append(('get_status_stats', lambda: Shipment.get_status_stats(user_id), 1))
+
+    def insert():
+        shipment = Shipment(sender_name='Bench Sender', sender_address='1 Bench St', recipient_name='R',
+                            recipient_address='2 Bench Ave', weight=2.5, user_id=user_id).save()
+        inserted.append(shipment)
+
+    updated = Shipment.find_by_tracking_number(tracking_number, user_id)
+
+    def update():
+        updated.weight = 3.5 if updated.weight != 3.5 else 4.5
+        updated.save()
+
+    benchmarks.append(('save[insert]', insert, 1))
+    benchmarks.append(('save[update]', update, 1))
+    return benchmarks
+
+def route_benchmarks(client, search_term):
+    """(name, callable, repeat scale) for full requests through the test client"""
+    pages = [
+        ('route:shipments', '/shipments/'),
+        ('route:shipments[filtered]', '/shipments/?status=in_transit&priority=urgent&page=2'),
+        ('route:shipments[search]', f'/shipments/?search={search_term}'),
+        ('route:shipment_stats', '/shipments/stats'),
+        ('route:tasks', '/tasks/'),
+        ('route:api_shipments', '/api/v1/shipments?limit=20'),
+    ]
+    benchmarks = []
+    for name, url in pages:
+        def get(url=url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}")
+        benchmarks.append((name, get, 1))
+    return benchmarks
+
+def run_suite(path, repeat, only=None):
+    """Run every benchmark against the database at path; returns {name: timings}"""
+    app = create_app()
+    app.config.update(DATABASE_PATH=path, TRACE_SAMPLE_RATE=0.0,
+                      PROFILE_SAMPLE_RATE=0.0, MEMORY_SAMPLE_RATE=0.0)
+    client = app.test_client()
+    results = {}
+    inserted = []
+
+    with app.app_context():
+        close_db_connection()
+        conn = get_db_connection()
+        pattern = f'seed{BENCH_SEED}-%'
+        users = conn.execute('SELECT COUNT(*) FROM users WHERE username LIKE ?', (pattern,)).fetchone()[0]
+        username, user_id = conn.execute(
+            'SELECT username, id FROM users WHERE username LIKE ? ORDER BY id LIMIT 1 OFFSET ?',
+            (pattern, users // 2)).fetchone()
+        tracking_number, sender = conn.execute(
+            'SELECT tracking_number, sender_name FROM shipments WHERE user_id = ? ORDER BY id DESC LIMIT 1',
+            (user_id,)).fetchone()
+        search_term = sender.split()[-1]
+
+        def login():
+            response = client.post('/auth/login', data={'username': username, 'password': BENCH_PASSWORD})
+            if response.status_code != 302:
+                raise RuntimeError(f"Login returned {response.status_code}")
+
+        benchmarks = model_benchmarks(user_id, tracking_number, search_term, inserted)
+        login()
+        benchmarks += route_benchmarks(client, search_term)
+        # Password hashing dominates and is deliberately slow; fewer runs suffice
+        benchmarks.append(('route:login', login, 0.25))
+
+        try:
+            for name, func, scale in benchmarks:
+                if only and only not in name:
+                    continue
+                results[name] = timed(func, max(int(repeat * scale), 3))
+                print(f"{name:<40} median {results[name]['median_ms']:>9.3f} ms   "
+                      f"p95 {results[name]['p95_ms']:>9.3f} ms")
+        finally:
+            # Leave the shared database as it was built
+            for shipment in inserted:
+                shipment.delete()
+            close_db_connection()
+    return results
+
+def metadata(size, shipments, repeat):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'size': size,
+        'shipments': shipments,
+        'repeat': repeat,
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def compare(results, baseline, thresholds, min_delta_ms):
+    """Benchmarks whose median regressed past their threshold, as (name, base, now, threshold)"""
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        threshold = thresholds.get(name, thresholds.get('default', DEFAULT_THRESHOLD))
+        delta = result['median_ms'] - base['median_ms']
+        if delta > min_delta_ms and result['median_ms'] > base['median_ms'] * (1 + threshold):
+            regressions.append((name, base['median_ms'], result['median_ms'], threshold))
+    return regressions
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'thresholds': {'default': DEFAULT_THRESHOLD}, 'sizes': {}}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='10k', help='10k, 1m, 10m or a shipment count')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', help='Run only benchmarks whose name contains this')
+    parser.add_argument('--db-dir', default=DEFAULT_DB_DIR)
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the synthetic database')
+    parser.add_argument('--output', help='Write JSON results here ("-" for stdout)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--threshold', type=float, help='Override every regression threshold (0.5 = 50%% slower)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.25)
+    args = parser.parse_args()
+
+    size = args.size.lower()
+    shipments = SIZES[size] if size in SIZES else int(size)
+    path = database_for(size, shipments, args.db_dir, args.rebuild)
+    results = run_suite(path, args.repeat, args.only)
+    report = {'meta': metadata(size, shipments, args.repeat), 'results': results}
+
+    output = args.output or os.path.join(args.db_dir, f'results-{size}.json')
+    if output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        stored = baseline['sizes'].get(size, {'results': {}})
+        # A partial (--only) run updates just the benchmarks it ran
+        stored['results'].update(results)
+        stored['meta'] = report['meta']
+        baseline['sizes'][size] = stored
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline for {size} saved to {args.baseline}")
+        return
+
+    stored = baseline['sizes'].get(size)
+    if stored is None:
+        print(f"No baseline for {size}; run with --save-baseline to record one")
+        return
+    thresholds = dict(baseline.get('thresholds', {}))
+    if args.threshold is not None:
+        thresholds = {'default': args.threshold}
+    regressions = compare(results, stored['results'], thresholds, args.min_delta_ms)
+    for name, before, after, threshold in regressions:
+        print(f"REGRESSION {name}: {before:.3f} ms -> {after:.3f} ms (threshold {threshold:.0%})")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against the {stored['meta']['commit'] or 'stored'} baseline")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Template rendering benchmark for the Shipment Manager application
+Times a 100-row shipments page with the fragment cache off, cold and warm,
+and template compilation with and without the bytecode cache
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import statistics
+import tempfile
+import time
+from flask import render_template, session
+from jinja2 import FileSystemBytecodeCache
+from app import create_app
+from models.shipment import Shipment
+from models.enums import STATUS_NAMES, PRIORITY_NAMES
+
+def make_shipments(rows):
+    """Build N in-memory shipments shaped like a list page"""
+    return [
+        Shipment(id=i, tracking_number=f'SH{i:08d}', sender_name=f'Sender {i}',
+                 sender_address=f'{i} Long Sender Street, Springfield, Some County, 12345',
+                 recipient_name=f'Recipient {i}', recipient_address=f'{i} Recipient Road, Shelbyville',
+                 package_description='Books and assorted stationery', weight=1.5 + i % 7,
+                 status=STATUS_NAMES[i % len(STATUS_NAMES)], priority=PRIORITY_NAMES[i % len(PRIORITY_NAMES)],
+                 is_express=i % 3 == 0, shipping_cost=12.5, created_at='2024-01-01 12:00:00',
+                 user_id=1, version=1)
+        for i in range(1, rows + 1)
+    ]
+
+def render_page(shipments):
+    return render_template('shipments.html', shipments=shipments, current_page=1, total_pages=10,
+                           total_count=len(shipments) * 10, status_filter='', priority_filter='',
+                           express_filter='', archived_filter='', search_term='',
+                           status_choices=Shipment.get_status_choices(),
+                           priority_choices=Shipment.get_priority_choices())
+
+def time_renders(app, shipments, repeat, clear_cache):
+    """Median render time in ms"""
+    cache = app.jinja_env.fragment_cache
+    samples = []
+    for _ in range(repeat):
+        if clear_cache:
+            cache.clear()
+        start = time.perf_counter()
+        render_page(shipments)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def time_compile(directory, names, use_cache):
+    """Time loading every template into a fresh app, as a newly started worker would"""
+    app = create_app()
+    if not use_cache:
+        app.jinja_env.bytecode_cache = None
+    else:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    start = time.perf_counter()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    shipments = make_shipments(args.rows)
+    with app.test_request_context('/shipments/'):
+        session['user_id'] = 1
+        session['username'] = 'bench'
+        render_page(shipments)
+
+        app.config['TEMPLATE_FRAGMENT_CACHE_SIZE'] = 0
+        uncached = time_renders(app, shipments, args.repeat, clear_cache=False)
+        app.config['TEMPLATE_FRAGMENT_CACHE_SIZE'] = 2048
+        cold = time_renders(app, shipments, args.repeat, clear_cache=True)
+        warm = time_renders(app, shipments, args.repeat, clear_cache=False)
+
+    print(f"Rendering a {args.rows}-row shipments page (median of {args.repeat}):")
+    print(f"{'no fragment cache':<24} {uncached:>8.2f} ms")
+    print(f"{'fragment cache, cold':<24} {cold:>8.2f} ms")
+    print(f"{'fragment cache, warm':<24} {warm:>8.2f} ms  ({uncached / warm:.1f}x)")
+
+    names = [name for name in app.jinja_env.list_templates(extensions=('html',))
+             if name != 'macros.html']
+    with tempfile.TemporaryDirectory() as directory:
+        time_compile(directory, names, use_cache=True)  # fill the bytecode cache
+        compiled = time_compile(directory, names, use_cache=False)
+        cached = time_compile(directory, names, use_cache=True)
+    print(f"\nLoading {len(names)} templates in a fresh worker:")
+    print(f"{'compile from source':<24} {compiled:>8.2f} ms")
+    print(f"{'from bytecode cache':<24} {cached:>8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Analytics testing script for the Shipment Manager application
+Covers columnar snapshots and reporting aggregates
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from models.shipment import Shipment
+from models.rollup import ShipmentRollup
+from utils.columnar import ColumnarSnapshot, export_snapshot
+
+class AnalyticsTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up an isolated file database with a few shipments"""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app.config['DATABASE_PATH'] = self.db_path
+
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('analyst', 'analystpass')
+            for weight, status, priority in [(1.0, 'pending', 'standard'),
+                                             (2.0, 'pending', 'urgent'),
+                                             (4.0, 'delivered', 'standard')]:
+                Shipment(
+                    sender_name='Sender', sender_address='1 Data St',
+                    recipient_name='Recipient', recipient_address='2 Report Rd',
+                    weight=weight, status=status, priority=priority,
+                    user_id=self.user.id
+                ).save()
+
+    def tearDown(self):
+        close_db_connection()
+        os.close(self.db_fd)
+        os.remove(self.db_path)
+
+class TestColumnarSnapshot(AnalyticsTestCase):
+    def test_snapshot_round_trip(self):
+        """Test a snapshot maps back with the same values"""
+        snapshot_path = self.db_path + '.col'
+        try:
+            with self.app.app_context():
+                rows = export_snapshot(snapshot_path, user_id=self.user.id)
+            self.assertEqual(rows, 3)
+
+            with ColumnarSnapshot(snapshot_path) as snapshot:
+                self.assertEqual(len(snapshot), 3)
+                self.assertEqual(list(snapshot.column('weight')), [1.0, 2.0, 4.0])
+                self.assertEqual(snapshot.decode('status', snapshot.column('status')[2]), 'delivered')
+        finally:
+            os.remove(snapshot_path)
+
+    def test_group_by_status(self):
+        """Test grouped aggregates over a snapshot"""
+        snapshot_path = self.db_path + '.col'
+        try:
+            with self.app.app_context():
+                export_snapshot(snapshot_path, user_id=self.user.id)
+
+            with ColumnarSnapshot(snapshot_path) as snapshot:
+                groups = snapshot.group_by('status', metrics=('weight',))
+            self.assertEqual(groups[('pending',)]['count'], 2)
+            self.assertEqual(groups[('pending',)]['sum_weight'], 3.0)
+            self.assertEqual(groups[('delivered',)]['avg_weight'], 4.0)
+        finally:
+            os.remove(snapshot_path)
+
+class TestShipmentRollups(AnalyticsTestCase):
+    def _totals(self):
+        return {stat['status']: stat['count'] for stat in Shipment.get_status_stats(self.user.id)}
+
+    def test_rollups_follow_writes(self):
+        """Test rollups track inserts, status changes and deletes"""
+        with self.app.app_context():
+            self.assertEqual(self._totals(), {'pending': 2, 'delivered': 1})
+
+            shipment = Shipment.find_by_user(self.user.id, status_filter='pending')[0][0]
+            shipment.status = 'delivered'
+            shipment.save()
+            self.assertEqual(self._totals(), {'pending': 1, 'delivered': 2})
+
+            shipment.delete()
+            self.assertEqual(self._totals(), {'pending': 1, 'delivered': 1})
+
+            series = ShipmentRollup.get_time_series(self.user.id, granularity='hour', days=1)
+            self.assertEqual(sum(point['count'] for point in series), 2)
+
+    def test_backfill_matches_incremental(self):
+        """Test a backfill rebuilds the same totals"""
+        with self.app.app_context():
+            before = ShipmentRollup.get_time_series(self.user.id)
+            ShipmentRollup.backfill()
+            self.assertEqual(ShipmentRollup.get_time_series(self.user.id), before)
+
+    def test_stats_api(self):
+        """Test the JSON time-series endpoint"""
+        client = self.app.test_client()
+        client.post('/auth/login', data={'username': 'analyst', 'password': 'analystpass'})
+
+        response = client.get('/shipments/api/stats?granularity=day&status=pending')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['granularity'], 'day')
+        self.assertEqual(sum(point['count'] for point in data['series']), 2)
+
+        response = client.get('/shipments/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Volume and Revenue', response.data)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
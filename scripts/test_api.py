@@ -0,0 +1,161 @@
+"""
+API testing script for the Shipment Manager application
+Covers the /api/v1 JSON endpoints: cursor pages, sparse fields, ETags and
+conditional requests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from unittest import mock
+from app import create_app
+from database import init_db, close_db_connection, execute_query
+from models.user import User
+from models.shipment import Shipment
+from utils.idempotency import recent_keys
+
+PARCEL = {
+    'sender_name': 'Api Sender', 'sender_address': '1 Json St',
+    'recipient_name': 'Api Recipient', 'recipient_address': '2 Rest Ave',
+    'weight': 1.5, 'priority': 'urgent',
+}
+
+class TestJsonApi(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('apiuser', 'apipass')
+        self.client.post('/auth/login', data={'username': 'apiuser', 'password': 'apipass'})
+        recent_keys.clear()
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _create(self, **overrides):
+        response = self.client.post('/api/v1/shipments', json=dict(PARCEL, **overrides))
+        self.assertEqual(response.status_code, 201, response.get_json())
+        return response
+
+    def test_requires_login(self):
+        """Test anonymous API calls get a JSON 401, not a login redirect"""
+        self.client.get('/auth/logout')
+        response = self.client.get('/api/v1/shipments')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error', response.get_json())
+
+    def test_cursor_pages_and_sparse_fields(self):
+        """Test keyset pages cover every shipment once and fields trims objects"""
+        for index in range(5):
+            self._create(sender_name=f'Sender {index}')
+
+        seen, cursor = [], None
+        while True:
+            query = {'limit': 2, 'fields': 'id,sender_name'}
+            if cursor:
+                query['cursor'] = cursor
+            body = self.client.get('/api/v1/shipments', query_string=query).get_json()
+            self.assertTrue(all(set(item) == {'id', 'sender_name'} for item in body['data']))
+            seen.extend(item['id'] for item in body['data'])
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+        self.assertEqual(self.client.get('/api/v1/shipments?fields=id,secret').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/shipments?cursor=!!').status_code, 400)
+
+    def test_conditional_get_skips_hydration(self):
+        """Test a matching If-None-Match returns 304 without building model objects"""
+        location = self._create().headers['Location']
+        first = self.client.get(location)
+        etag = first.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        list_etag = self.client.get('/api/v1/shipments').headers['ETag']
+
+        with mock.patch.object(Shipment, '_from_db_row', side_effect=AssertionError('hydrated')):
+            cached = self.client.get(location, headers={'If-None-Match': etag})
+            cached_list = self.client.get('/api/v1/shipments', headers={'If-None-Match': list_etag})
+        self.assertEqual((cached.status_code, cached_list.status_code), (304, 304))
+        self.assertEqual(cached.get_data(), b'')
+
+        # A ?fields= projection is a different body, so it never matches the full object's ETag
+        trimmed = self.client.get(f'{location}?fields=sender_name,id', headers={'If-None-Match': etag})
+        self.assertEqual(trimmed.status_code, 200)
+        trimmed_etag = trimmed.headers['ETag']
+        self.assertNotEqual(trimmed_etag, etag)
+        reordered = self.client.get(f'{location}?fields=id,sender_name', headers={'If-None-Match': trimmed_etag})
+        self.assertEqual(reordered.status_code, 304)
+        trimmed_list = self.client.get('/api/v1/shipments?fields=id', headers={'If-None-Match': list_etag})
+        self.assertEqual(trimmed_list.status_code, 200)
+
+        # Any change to the shipment changes both validators; a projection's ETag still guards writes
+        renamed = self.client.patch(location, json={'sender_name': 'Renamed'}, headers={'If-Match': trimmed_etag})
+        self.assertEqual(renamed.status_code, 200)
+        self.assertEqual(self.client.get(location, headers={'If-None-Match': etag}).status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/shipments', headers={'If-None-Match': list_etag}).status_code, 200)
+
+    def test_patch_if_match_and_delete(self):
+        """Test partial updates, stale If-Match rejection and deletion"""
+        created = self._create()
+        location, etag = created.headers['Location'], created.headers['ETag']
+
+        updated = self.client.patch(location, json={'status': 'in_transit'}, headers={'If-Match': etag})
+        self.assertEqual(updated.status_code, 200)
+        body = updated.get_json()
+        self.assertEqual((body['status'], body['sender_name'], body['version']), ('in_transit', 'Api Sender', 2))
+
+        stale = self.client.patch(location, json={'status': 'delivered'}, headers={'If-Match': etag})
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(self.client.patch(location, json={'weight': 'heavy'}).status_code, 400)
+        self.assertEqual(self.client.patch(location, json={'status': 'lost'}).status_code, 422)
+        self.assertEqual(self.client.patch(location, json={'version': 9}).status_code, 400)
+
+        self.assertEqual(self.client.delete(location, headers={'If-Match': etag}).status_code, 412)
+        self.assertEqual(self.client.delete(location, headers={'If-Match': updated.headers['ETag']}).status_code, 204)
+        self.assertEqual(self.client.get(location).status_code, 404)
+
+    def test_batch_is_atomic_and_idempotent(self):
+        """Test a batch with one bad item writes nothing, and a retried batch writes once"""
+        bad = self.client.post('/api/v1/shipments/batch',
+                               json={'shipments': [PARCEL, dict(PARCEL, weight=-1)]})
+        self.assertEqual(bad.status_code, 422)
+        self.assertIn('1', bad.get_json()['errors'])
+
+        batch = {'shipments': [PARCEL, dict(PARCEL, sender_name='Second')]}
+        headers = {'Idempotency-Key': 'batch-1'}
+        first = self.client.post('/api/v1/shipments/batch', json=batch, headers=headers)
+        retry = self.client.post('/api/v1/shipments/batch', json=batch, headers=headers)
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        with self.app.app_context():
+            self.assertEqual(execute_query('SELECT COUNT(*) FROM shipments WHERE user_id = ?',
+                                           (self.user.id,), fetch_one=True)[0], 2)
+
+    def test_tasks(self):
+        """Test the task endpoints share the same conventions"""
+        created = self.client.post('/api/v1/tasks', json={'title': 'Api task', 'is_urgent': True})
+        self.assertEqual(created.status_code, 201)
+        location = created.headers['Location']
+        self.assertEqual(self.client.get(location, headers={'If-None-Match': created.headers['ETag']}).status_code, 304)
+
+        updated = self.client.patch(location, json={'status': 'completed'})
+        self.assertEqual(updated.get_json()['status'], 'completed')
+        body = self.client.get('/api/v1/tasks?fields=title,status').get_json()
+        self.assertEqual(body['data'], [{'title': 'Api task', 'status': 'completed'}])
+        self.assertEqual(self.client.delete(location).status_code, 204)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
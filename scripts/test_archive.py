@@ -0,0 +1,89 @@
+"""
+Archive testing script for the Shipment Manager application
+Covers moving terminal shipments to the attached archive and reading them back
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from app import create_app
+from archive import archive_shipments, get_archive_stats
+from database import init_db, close_db_connection, execute_query
+from models.rollup import ShipmentRollup
+from models.user import User
+from models.shipment import Shipment
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.app.config['ARCHIVE_DATABASE_PATH'] = os.path.join(self.workdir.name, 'archive.db')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        close_db_connection()
+        init_db()
+
+        self.user = User.create_user('archiver', 'archivepass')
+        self.old_delivered = [self._add('delivered', days_ago=200) for _ in range(3)]
+        self.old_pending = self._add('pending', days_ago=200)
+        self.recent_returned = self._add('returned', days_ago=1)
+
+    def tearDown(self):
+        close_db_connection()
+        self.ctx.pop()
+        self.workdir.cleanup()
+
+    def _add(self, status, days_ago):
+        shipment = Shipment(sender_name='S', sender_address='1 Old St', recipient_name='R',
+                            recipient_address='2 Cold Ave', weight=1.0, status=status,
+                            user_id=self.user.id).save()
+        execute_query("UPDATE shipments SET updated_at = datetime('now', ?) WHERE id = ?",
+                      (f'-{days_ago} days', shipment.id))
+        return shipment
+
+    def test_archival_moves_only_old_terminal_shipments(self):
+        """Test chunked archival and the default hot-only reads"""
+        status_totals = Shipment.get_status_stats(self.user.id)
+        hot_before = get_archive_stats()['hot']
+
+        self.assertEqual(archive_shipments(90, batch_size=2, pause=0), 3)
+        self.assertEqual(get_archive_stats(), {'hot': hot_before - 3, 'archived': 3})
+
+        _, _, hot_count = Shipment.find_by_user(self.user.id)
+        self.assertEqual(hot_count, 2)
+        _, _, all_count = Shipment.find_by_user(self.user.id, include_archived=True)
+        self.assertEqual(all_count, 5)
+        # Rollups keep counting archived parcels
+        self.assertEqual(Shipment.get_status_stats(self.user.id), status_totals)
+
+    def test_terminal_filter_and_tracking_reach_the_archive(self):
+        """Test a delivered filter and tracking lookups include archived rows"""
+        archive_shipments(90, pause=0)
+
+        delivered, _, count = Shipment.find_by_user(self.user.id, status_filter='delivered')
+        self.assertEqual(count, 3)
+        self.assertTrue(all(s.status == 'delivered' for s in delivered))
+
+        tracking_number = self.old_delivered[0].tracking_number
+        found = Shipment.find_by_tracking_number(tracking_number, self.user.id)
+        self.assertIsNotNone(found)
+        self.assertEqual(found.id, self.old_delivered[0].id)
+        self.assertIsNone(Shipment.find_by_id(found.id, self.user.id))
+
+    def test_backfill_keeps_archived_parcels(self):
+        """Test rebuilding rollups after archival still counts the archived shipments"""
+        daily = ShipmentRollup.get_time_series(self.user.id, 'day', days=3650)
+        archive_shipments(90, pause=0)
+        for user_id in (self.user.id, None):
+            ShipmentRollup.backfill(user_id)
+            self.assertEqual(ShipmentRollup.get_time_series(self.user.id, 'day', days=3650), daily)
+        result = self.app.test_cli_runner().invoke(args=['rollups', 'backfill'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(ShipmentRollup.get_time_series(self.user.id, 'day', days=3650), daily)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
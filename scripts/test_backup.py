@@ -0,0 +1,91 @@
+"""
+Backup testing script for the Shipment Manager application
+Covers online backups, retention and the read-only reporting snapshot
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+import tempfile
+import threading
+import unittest
+from app import create_app
+from backup import list_backups, refresh_reporting_snapshot, run_backup
+from database import init_db, close_db_connection
+from models.user import User
+from models.shipment import Shipment
+
+class TestBackups(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.workdir.name, 'shipments.db')
+        self.backup_dir = os.path.join(self.workdir.name, 'backups')
+        self.app.config['DATABASE_PATH'] = self.db_path
+
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('backupuser', 'backuppass')
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _add_shipment(self, name):
+        return Shipment(sender_name=name, sender_address='1 Backup St', recipient_name='R',
+                        recipient_address='2 Restore Ave', weight=1.0, user_id=self.user.id).save()
+
+    def test_backup_during_writes_and_retention(self):
+        """Test backups stay consistent under concurrent writes and old ones are pruned"""
+        stop = threading.Event()
+
+        def writer():
+            with self.app.app_context():
+                while not stop.is_set():
+                    self._add_shipment('Concurrent')
+                close_db_connection()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            paths = [run_backup(self.db_path, self.backup_dir, keep=2, pages=1, step_sleep=0.001)
+                     for _ in range(3)]
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertEqual(list_backups(self.backup_dir), paths[1:])
+        conn = sqlite3.connect(paths[-1])
+        try:
+            self.assertEqual(conn.execute('PRAGMA integrity_check').fetchone()[0], 'ok')
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+            self.assertGreater(conn.execute('SELECT COUNT(*) FROM shipments').fetchone()[0], 0)
+        finally:
+            conn.close()
+
+    def test_exports_read_the_reporting_snapshot(self):
+        """Test reporting reads see the snapshot until it is refreshed"""
+        snapshot_path = os.path.join(self.workdir.name, 'reporting.db')
+        self.app.config['REPORTING_SNAPSHOT_PATH'] = snapshot_path
+
+        with self.app.app_context():
+            self._add_shipment('Before')
+            refresh_reporting_snapshot(self.db_path, snapshot_path)
+            self._add_shipment('After')
+
+            names = [s.sender_name for s in Shipment.iter_by_user(self.user.id, reporting=True)]
+            self.assertEqual(names, ['Before'])
+
+            refresh_reporting_snapshot(self.db_path, snapshot_path)
+            names = [s.sender_name for s in Shipment.iter_by_user(self.user.id, reporting=True)]
+            self.assertEqual(sorted(names), ['After', 'Before'])
+
+            # The primary is unaffected
+            self.assertEqual(len(list(Shipment.iter_by_user(self.user.id))), 2)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
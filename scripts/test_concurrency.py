@@ -0,0 +1,133 @@
+"""
+Concurrency testing script for the Shipment Manager application
+Covers row-version compare-and-swap saves and column-level partial updates
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import threading
+import unittest
+from app import create_app
+from database import init_db, close_db_connection, execute_query, ConcurrentModificationError
+from models.user import User
+from models.shipment import Shipment
+from models.task import Task
+
+class TestOptimisticConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        close_db_connection()
+        init_db()
+        self.user = User.create_user('racer', 'racerpass')
+        self.shipment = Shipment(sender_name='S', sender_address='1 Race St', recipient_name='R',
+                                 recipient_address='2 Finish Ave', weight=1.0, package_description='',
+                                 user_id=self.user.id).save()
+
+    def tearDown(self):
+        close_db_connection()
+        self.ctx.pop()
+        self.workdir.cleanup()
+
+    def _run_threads(self, count, target):
+        errors = []
+
+        def run(index):
+            try:
+                with self.app.app_context():
+                    target(index)
+                    close_db_connection()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def _retry(self, mutate):
+        """Read-modify-write until the compare-and-swap succeeds; returns the conflicts seen"""
+        conflicts = 0
+        while True:
+            shipment = Shipment.find_by_id(self.shipment.id, self.user.id)
+            mutate(shipment)
+            try:
+                shipment.save()
+                return conflicts
+            except ConcurrentModificationError:
+                conflicts += 1
+
+    def test_stale_save_is_rejected(self):
+        """Test a save from an outdated copy raises instead of overwriting"""
+        first = Shipment.find_by_id(self.shipment.id, self.user.id)
+        second = Shipment.find_by_id(self.shipment.id, self.user.id)
+        first.sender_name = 'First'
+        first.save()
+        second.sender_name = 'Second'
+        with self.assertRaises(ConcurrentModificationError):
+            second.save()
+        self.assertEqual(Shipment.find_by_id(self.shipment.id, self.user.id).sender_name, 'First')
+        self.assertEqual(first.version, 2)
+
+    def test_no_lost_updates_under_contention(self):
+        """Test concurrent read-modify-write appends all survive"""
+        threads, rounds = 8, 10
+
+        def append_tokens(index):
+            for round_number in range(rounds):
+                self._retry(lambda s: setattr(
+                    s, 'package_description', f'{s.package_description}[{index}.{round_number}]'))
+
+        self._run_threads(threads, append_tokens)
+
+        final = Shipment.find_by_id(self.shipment.id, self.user.id)
+        tokens = final.package_description.strip('[]').split('][')
+        self.assertEqual(len(tokens), threads * rounds)
+        self.assertEqual(len(set(tokens)), threads * rounds)
+        self.assertEqual(final.version, 1 + threads * rounds)
+        # Rollups still count the parcel exactly once
+        self.assertEqual(Shipment.get_status_stats(self.user.id)[0]['count'], 1)
+
+    def test_partial_updates_write_only_changed_columns(self):
+        """Test a status change does not write back a column another request changed"""
+        status_copy = Shipment.find_by_id(self.shipment.id, self.user.id)
+        execute_query('UPDATE shipments SET sender_name = ? WHERE id = ?', ('Feed', self.shipment.id))
+        status_copy.status = 'in_transit'
+        status_copy.save()
+
+        stored = Shipment.find_by_id(self.shipment.id, self.user.id)
+        self.assertEqual((stored.status, stored.sender_name), ('in_transit', 'Feed'))
+        # Saving without changes writes nothing and keeps the version
+        stored.save()
+        self.assertEqual(Shipment.find_by_id(self.shipment.id, self.user.id).version, stored.version)
+
+    def test_task_compare_and_swap(self):
+        """Test concurrent task toggles neither lose updates nor fail"""
+        task = Task(title='Race', description='', user_id=self.user.id).save()
+
+        def toggle(_):
+            for _ in range(5):
+                while True:
+                    current = Task.find_by_id(task.id, self.user.id)
+                    current.is_urgent = not current.is_urgent
+                    try:
+                        current.save()
+                        break
+                    except ConcurrentModificationError:
+                        pass
+
+        self._run_threads(4, toggle)
+        final = Task.find_by_id(task.id, self.user.id)
+        self.assertEqual(final.version, 1 + 4 * 5)
+        self.assertFalse(final.is_urgent)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
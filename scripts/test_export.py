@@ -0,0 +1,88 @@
+"""
+Export testing script for the Shipment Manager application
+Covers the streaming CSV / NDJSON export endpoint
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import gzip
+import io
+import json
+import tempfile
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from models.shipment import Shipment
+
+class TestShipmentExport(unittest.TestCase):
+    def setUp(self):
+        """Set up an isolated file database with a logged-in user"""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app.config['DATABASE_PATH'] = self.db_path
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('exporter', 'exportpass')
+            for i in range(7):
+                Shipment(
+                    sender_name=f'Sender {i}', sender_address=f'{i} Export St',
+                    recipient_name=f'Recipient {i}', recipient_address=f'{i} Import Ave',
+                    weight=i, status='delivered' if i % 2 else 'pending',
+                    priority='standard', user_id=self.user.id
+                ).save()
+
+        self.client.post('/auth/login', data={'username': 'exporter', 'password': 'exportpass'})
+
+    def tearDown(self):
+        close_db_connection()
+        os.close(self.db_fd)
+        os.remove(self.db_path)
+
+    def test_iter_by_user_streams_all_rows(self):
+        """Test the generator yields every matching shipment"""
+        with self.app.app_context():
+            shipments = list(Shipment.iter_by_user(self.user.id, batch_size=2))
+            self.assertEqual(len(shipments), 7)
+
+            delivered = list(Shipment.iter_by_user(self.user.id, status_filter='delivered'))
+            self.assertEqual(len(delivered), 3)
+
+    def test_csv_export(self):
+        """Test CSV export with filters"""
+        response = self.client.get('/shipments/export?format=csv&status=pending')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(row['status'] == 'pending' for row in rows))
+
+    def test_ndjson_gzip_export(self):
+        """Test gzip-compressed NDJSON export"""
+        response = self.client.get('/shipments/export?format=ndjson&gzip=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/gzip')
+
+        lines = gzip.decompress(response.data).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertIn('tracking_number', json.loads(lines[0]))
+
+    def test_date_range_validation(self):
+        """Test invalid date ranges are rejected"""
+        response = self.client.get('/shipments/export?date_from=2024-13-01')
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.get('/shipments/export?date_from=2000-01-01&date_to=2000-01-02')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 1)  # Header only
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
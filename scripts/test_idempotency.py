@@ -0,0 +1,116 @@
+"""
+Idempotency testing script for the Shipment Manager application
+Covers replaying retried shipment creation requests by idempotency key
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+import tempfile
+import unittest
+from app import create_app
+from database import init_db, close_db_connection, execute_query
+from models.shipment import Shipment
+from models.user import User
+from utils.idempotency import purge_expired_keys, recent_keys
+
+FORM = {
+    'sender_name': 'Retry Sender', 'sender_address': '1 Retry St',
+    'recipient_name': 'Retry Recipient', 'recipient_address': '2 Timeout Ave',
+    'weight': '2.5', 'status': 'pending', 'priority': 'standard',
+}
+
+class TestIdempotencyKeys(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('retrier', 'retrierpass')
+        self.client.post('/auth/login', data={'username': 'retrier', 'password': 'retrierpass'})
+        recent_keys.clear()
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _count(self):
+        with self.app.app_context():
+            return execute_query('SELECT COUNT(*) FROM shipments WHERE user_id = ?',
+                                 (self.user.id,), fetch_one=True)[0]
+
+    def _create(self, key, **overrides):
+        return self.client.post('/shipments/create', data=dict(FORM, **overrides),
+                                headers={'Idempotency-Key': key})
+
+    def test_retry_replays_without_creating(self):
+        """Test a retried request gets the original response and no duplicate"""
+        first = self._create('retry-1')
+        self.assertEqual(first.status_code, 302)
+        # Cold cache, as if the retry reached another worker process
+        recent_keys.clear()
+        retry = self._create('retry-1')
+        self.assertEqual(retry.status_code, 302)
+        self.assertEqual(retry.headers['Location'], first.headers['Location'])
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(self._count(), 1)
+
+        # Served from the in-memory cache this time
+        self.assertEqual(self._create('retry-1').headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(self._create('retry-2').status_code, 302)
+        self.assertEqual(self._count(), 2)
+
+    def test_key_reuse_with_different_body_is_rejected(self):
+        """Test a key cannot be replayed for a different request"""
+        self._create('reuse')
+        response = self._create('reuse', weight='9')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self._count(), 1)
+
+    def test_failed_save_is_retried(self):
+        """Test a create that failed with a transient error runs again on retry"""
+        save = Shipment.save
+
+        def locked(shipment):
+            raise sqlite3.OperationalError('database is locked')
+
+        Shipment.save = locked
+        try:
+            failed = self._create('transient')
+        finally:
+            Shipment.save = save
+        self.assertEqual(failed.status_code, 500)
+        self.assertEqual(self._count(), 0)
+
+        retry = self._create('transient')
+        self.assertEqual(retry.status_code, 302)
+        self.assertNotIn('Idempotent-Replayed', retry.headers)
+        self.assertEqual(self._count(), 1)
+
+    def test_form_key_and_expiry(self):
+        """Test the hidden form key deduplicates and expired keys run again"""
+        page = self.client.get('/shipments/create').get_data(as_text=True)
+        self.assertIn('name="idempotency_key"', page)
+
+        for _ in range(2):
+            self.client.post('/shipments/create', data=dict(FORM, idempotency_key='form-key'))
+        self.assertEqual(self._count(), 1)
+
+        with self.app.app_context():
+            execute_query('UPDATE idempotency_keys SET created_at = created_at - 100000')
+            recent_keys.clear()
+            self._create('fresh')
+            # Only the expired form key goes
+            self.assertEqual(purge_expired_keys(self.app.config['IDEMPOTENCY_TTL']), 1)
+        self.client.post('/shipments/create', data=dict(FORM, idempotency_key='form-key'))
+        self.assertEqual(self._count(), 3)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,96 @@
+"""
+Memory diagnostics testing script for the Shipment Manager application
+Covers tracemalloc snapshots and diffs, per-endpoint allocation peaks and memory gauges
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import tempfile
+import tracemalloc
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from utils import memory
+
+# Allocated between two snapshots so the diff has something to find
+_retained = []
+
+class TestMemoryDiagnostics(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.app.config['MEMORY_SNAPSHOT_DIR'] = os.path.join(self.workdir.name, 'snapshots')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            # The seed migration creates the admin user; admins are configured by id
+            self.app.config['ADMIN_USER_IDS'] = [User.find_by_username('admin').id]
+        self.client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def tearDown(self):
+        tracemalloc.stop()
+        _retained.clear()
+        memory._endpoint_peaks.clear()
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def test_snapshot_diff_finds_growth(self):
+        """Test two snapshots diff to the line that allocated in between"""
+        status = self.client.post('/admin/memory/tracemalloc/start?frames=5').get_json()
+        self.assertTrue(status['tracing'])
+        self.assertEqual(status['frames'], 5)
+
+        first = self.client.post('/admin/memory/snapshots').get_json()['name']
+        _retained.extend(bytearray(1024) for _ in range(2000))
+        second = self.client.post('/admin/memory/snapshots').get_json()['name']
+        listed = [entry['name'] for entry in self.client.get('/admin/memory/snapshots').get_json()['snapshots']]
+        self.assertEqual(listed, [first, second])
+
+        stats = self.client.get(f'/admin/memory/snapshots/{first}/diff/{second}?limit=5').get_json()['stats']
+        top = stats[0]
+        self.assertIn('test_memory.py', top['location'][0])
+        self.assertGreater(top['size_diff_bytes'], 2000 * 1024)
+
+        self.assertEqual(self.client.get(f'/admin/memory/snapshots/{first}/diff/nope.snap').status_code, 400)
+        self.assertFalse(self.client.post('/admin/memory/tracemalloc/stop').get_json()['tracing'])
+        self.assertEqual(self.client.post('/admin/memory/snapshots').status_code, 409)
+
+    def test_sampled_requests_record_peaks(self):
+        """Test sampled requests record a per-endpoint peak that reaches /metrics"""
+        self.app.config['MEMORY_SAMPLE_RATE'] = 1.0
+        self.client.get('/shipments/')
+        self.assertEqual(memory.endpoint_peaks(), {})
+
+        memory.start_tracing()
+        for _ in range(2):
+            self.assertEqual(self.client.get('/shipments/').status_code, 200)
+        peaks = self.client.get('/admin/memory').get_json()['endpoints']
+        self.assertEqual(peaks['shipments.list_shipments']['samples'], 2)
+        self.assertGreater(peaks['shipments.list_shipments']['max_peak_bytes'], 0)
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('memory_sampled_requests_total{endpoint="shipments.list_shipments"} 2', body)
+
+    def test_memory_gauges(self):
+        """Test RSS and watched object counts are exported as gauges"""
+        counts = memory.count_objects()
+        self.assertIn('Shipment', counts)
+        self.assertGreater(counts['dict'], 0)
+        body = self.client.get('/metrics').get_data(as_text=True)
+        rss = re.search(r'^process_resident_memory_bytes (\d+)$', body, re.MULTILINE)
+        self.assertGreater(int(rss.group(1)), 1024 * 1024)
+        peak = re.search(r'^process_peak_resident_memory_bytes (\d+)$', body, re.MULTILINE)
+        # Within a plausible range for one process, not scaled by 1024 twice
+        self.assertGreater(int(peak.group(1)), 1024 * 1024)
+        self.assertLess(int(peak.group(1)), 64 * 1024 ** 3)
+        self.assertRegex(body, r'python_objects\{type="Connection"\} \d+')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,136 @@
+"""
+Metrics testing script for the Shipment Manager application
+Covers the /metrics endpoint, per-thread counters and aggregation across worker processes
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gc
+import tempfile
+import threading
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from models.shipment import Shipment
+from utils.metrics import collect, flush, inc, observe, register_gauge, render
+
+def _counter(counters, name, **labels):
+    return counters.get((name, tuple(sorted(labels.items()))), 0)
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['METRICS_DB_STATS_INTERVAL'] = 0
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('scraper', 'scraperpass')
+            Shipment(sender_name='Counted', sender_address='1 Gauge St', recipient_name='R',
+                     recipient_address='2 Bucket Ave', weight=1.0, user_id=self.user.id).save()
+        self.client.post('/auth/login', data={'username': 'scraper', 'password': 'scraperpass'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def test_scrape_reports_requests_queries_and_caches(self):
+        """Test /metrics exposes request, SQL, connection and cache series"""
+        before = collect()[0]
+        for _ in range(3):
+            self.assertEqual(self.client.get('/shipments/').status_code, 200)
+        counters = collect()[0]
+        self.assertEqual(_counter(counters, 'http_requests_total', endpoint='shipments.list_shipments',
+                                  method='GET', status=200)
+                         - _counter(before, 'http_requests_total', endpoint='shipments.list_shipments',
+                                    method='GET', status=200), 3)
+        self.assertGreater(_counter(counters, 'db_queries_total', kind='read'),
+                           _counter(before, 'db_queries_total', kind='read'))
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        body = response.get_data(as_text=True)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="shipments.list_shipments",le="+Inf"}', body)
+        self.assertIn('db_query_duration_seconds_count{kind="read"}', body)
+        self.assertIn('db_connections{kind="primary"}', body)
+        self.assertIn('cache_hit_ratio{cache="template_fragment"}', body)
+        self.assertIn('log_queue_depth ', body)
+        # The admin user and demo shipments come from the seed migration
+        self.assertIn('app_users 2', body)
+        self.assertIn('app_shipments{status="pending"} 2', body)
+
+    def test_scrape_needs_allowed_ip_or_token(self):
+        """Test remote scrapers are refused unless they send the configured token"""
+        remote = {'REMOTE_ADDR': '203.0.113.9'}
+        self.assertEqual(self.client.get('/metrics', environ_base=remote).status_code, 403)
+        self.app.config['METRICS_TOKEN'] = 'scrape-secret'
+        wrong = self.client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(wrong.status_code, 403)
+        allowed = self.client.get('/metrics', environ_base=remote,
+                                  headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(allowed.status_code, 200)
+
+    def test_render_format(self):
+        """Test histogram buckets are cumulative and label values are escaped"""
+        body = render({('jobs_total', (('queue', 'a"b'),)): 2}, {
+            ('job_seconds', ()): [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 20.0005],
+        }, {})
+        self.assertIn('jobs_total{queue="a\\"b"} 2', body)
+        self.assertIn('job_seconds_bucket{le="0.001"} 1', body)
+        self.assertIn('job_seconds_bucket{le="10.0"} 1', body)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 2', body)
+        self.assertIn('job_seconds_count 2', body)
+
+class TestMetricsAggregation(unittest.TestCase):
+    def test_finished_threads_keep_their_counts(self):
+        """Test counts recorded on short-lived threads survive the threads"""
+        before = _counter(collect()[0], 'test_thread_events_total')
+
+        def work():
+            for _ in range(100):
+                inc('test_thread_events_total')
+                observe('test_thread_seconds', 0.002)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        del threads, thread
+        gc.collect()
+        counters, histograms, _ = collect()
+        self.assertEqual(_counter(counters, 'test_thread_events_total') - before, 400)
+        self.assertGreaterEqual(sum(histograms[('test_thread_seconds', ())][:-1]), 400)
+
+    def test_worker_processes_are_summed(self):
+        """Test a scrape sums every worker's snapshot and keeps exited workers' counters"""
+        with tempfile.TemporaryDirectory() as directory:
+            inc('test_worker_requests_total', 5)
+            register_gauge('test_worker_busy', lambda: {(): 1})
+            for _ in range(2):
+                pid = os.fork()
+                if pid == 0:
+                    inc('test_worker_requests_total', 10)
+                    flush(directory)
+                    os._exit(0)
+                os.waitpid(pid, 0)
+
+            for _ in range(2):
+                counters, _, gauges = collect(directory)
+                self.assertEqual(_counter(counters, 'test_worker_requests_total'), 25)
+                # Exited workers' gauges are gone; only this process is busy
+                self.assertEqual(gauges[('test_worker_busy', ())], 1)
+            self.assertTrue(os.path.exists(os.path.join(directory, 'retired.json')))
+            self.assertEqual(len([name for name in os.listdir(directory) if name[0].isdigit()]), 1)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
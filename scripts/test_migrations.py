@@ -0,0 +1,152 @@
+"""
+Migration testing script for the Shipment Manager application
+Covers the versioned schema migration engine
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+import tempfile
+import unittest
+import database
+from database import build_database_image, restore_database_image
+from migrations import LATEST_VERSION, get_schema_version, migrate, plan
+
+LEGACY_SCHEMA = '''
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE shipments (id INTEGER PRIMARY KEY AUTOINCREMENT, tracking_number TEXT UNIQUE NOT NULL,
+                        sender_name TEXT NOT NULL, sender_address TEXT NOT NULL,
+                        recipient_name TEXT NOT NULL, recipient_address TEXT NOT NULL,
+                        package_description TEXT, weight REAL DEFAULT 0.0,
+                        status TEXT NOT NULL DEFAULT 'pending', priority TEXT NOT NULL DEFAULT 'standard',
+                        is_express BOOLEAN NOT NULL DEFAULT 0, shipping_cost REAL DEFAULT 0.0,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, user_id INTEGER NOT NULL);
+INSERT INTO users (username, password_hash) VALUES ('admin', 'x');
+INSERT INTO shipments (tracking_number, sender_name, sender_address, recipient_name,
+                       recipient_address, weight, status, priority, shipping_cost, user_id)
+VALUES ('SHP00000001', 'A', 'a', 'B', 'b', 1.0, 'delivered', 'urgent', 14.0, 1);
+'''
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.conn = sqlite3.connect(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        os.close(self.db_fd)
+        os.remove(self.db_path)
+
+    def test_fresh_database_reaches_latest(self):
+        """Test a new database is migrated to the latest version"""
+        applied = migrate(self.conn, online_pause=0)
+        self.assertEqual(len(applied), LATEST_VERSION)
+        self.assertEqual(get_schema_version(self.conn), LATEST_VERSION)
+        self.assertEqual(plan(self.conn), [])
+
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertIn('tasks', tables)
+
+    def test_current_schema_only_reads_user_version(self):
+        """Test the fast path issues a single PRAGMA and no DDL"""
+        migrate(self.conn, online_pause=0)
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        self.assertEqual(migrate(self.conn), [])
+        self.conn.set_trace_callback(None)
+        self.assertEqual(statements, ['PRAGMA user_version'])
+
+    def test_dry_run_and_target(self):
+        """Test dry runs change nothing and targets stop early"""
+        self.assertEqual(len(migrate(self.conn, dry_run=True)), LATEST_VERSION)
+        self.assertEqual(get_schema_version(self.conn), 0)
+
+        migrate(self.conn, target=2)
+        self.assertEqual(get_schema_version(self.conn), 2)
+
+    def test_legacy_text_schema_is_converted(self):
+        """Test a database created by the old init_db keeps its data"""
+        self.conn.executescript(LEGACY_SCHEMA)
+        migrate(self.conn, online_pause=0)
+
+        row = self.conn.execute('SELECT status, priority FROM shipments').fetchone()
+        self.assertEqual(row, (4, 2))  # delivered, urgent
+        rollup = self.conn.execute('SELECT shipment_count FROM shipment_rollups_daily').fetchone()
+        self.assertEqual(rollup, (1,))
+        # The existing admin is kept, so no demo data is seeded
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM shipments').fetchone(), (1,))
+
+    def test_failed_migration_rolls_back(self):
+        """Test a failing migration leaves the version unchanged"""
+        migrate(self.conn, target=1)
+        self.conn.execute("INSERT INTO users (username, password_hash) VALUES ('u', 'x')")
+        self.conn.execute('''INSERT INTO shipments (tracking_number, sender_name, sender_address,
+                             recipient_name, recipient_address, status, priority, user_id)
+                             VALUES ('SHP1', 'A', 'a', 'B', 'b', 'pending', 'standard', 99)''')
+        self.conn.commit()
+
+        # Shipment points at a missing user, so the foreign key check fails
+        with self.assertRaises(ValueError):
+            migrate(self.conn, target=2)
+        self.assertEqual(get_schema_version(self.conn), 1)
+        status_type = self.conn.execute(
+            "SELECT type FROM pragma_table_info('shipments') WHERE name = 'status'").fetchone()[0]
+        self.assertEqual(status_type, 'TEXT')
+
+class TestDatabaseImage(unittest.TestCase):
+    def test_image_is_cloned_when_database_missing(self):
+        """Test a prebuilt image is restored into a missing database path"""
+        with tempfile.TemporaryDirectory() as workdir:
+            image_path = os.path.join(workdir, 'image.db')
+            db_path = os.path.join(workdir, 'data', 'shipments.db')
+            build_database_image(image_path)
+
+            self.assertTrue(restore_database_image(image_path, db_path))
+            conn = sqlite3.connect(db_path)
+            try:
+                self.assertEqual(get_schema_version(conn), LATEST_VERSION)
+                admin = conn.execute("SELECT id FROM users WHERE username = 'admin'").fetchone()
+                self.assertIsNotNone(admin)
+            finally:
+                conn.close()
+
+            # An existing database is never overwritten
+            self.assertFalse(restore_database_image(image_path, db_path))
+            self.assertEqual(os.listdir(os.path.dirname(db_path)), ['shipments.db'])
+
+    def test_concurrent_restore_keeps_the_first_copy(self):
+        """Test a worker finishing its clone second neither fails nor replaces the winner's database"""
+        with tempfile.TemporaryDirectory() as workdir:
+            image_path = os.path.join(workdir, 'image.db')
+            db_path = os.path.join(workdir, 'shipments.db')
+            build_database_image(image_path)
+            original_clone = database._clone_file
+
+            def clone_after_winner(source_path, target_path):
+                # Another worker restores and starts using the database while this clone runs
+                database._clone_file = original_clone
+                self.assertTrue(restore_database_image(image_path, db_path))
+                winner = sqlite3.connect(db_path)
+                winner.execute("UPDATE users SET username = 'winner' WHERE username = 'admin'")
+                winner.commit()
+                winner.close()
+                original_clone(source_path, target_path)
+
+            database._clone_file = clone_after_winner
+            try:
+                self.assertFalse(restore_database_image(image_path, db_path))
+            finally:
+                database._clone_file = original_clone
+            conn = sqlite3.connect(db_path)
+            try:
+                self.assertIsNotNone(conn.execute("SELECT 1 FROM users WHERE username = 'winner'").fetchone())
+            finally:
+                conn.close()
+            self.assertEqual(sorted(os.listdir(workdir)), ['image.db', 'shipments.db'])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
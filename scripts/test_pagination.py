@@ -0,0 +1,110 @@
+"""
+Pagination testing script for the Shipment Manager application
+Covers windowed page links and exact, estimated and lower-bound totals
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from models.shipment import Shipment
+from models.task import Task
+from utils.helpers import Pagination, count_results
+
+class TestPaginationHelpers(unittest.TestCase):
+    def test_window_is_bounded(self):
+        """Test a huge listing links a handful of pages, not all of them"""
+        pagination = Pagination(page=5000, per_page=4, total=1000000)
+        self.assertEqual(list(pagination.iter_pages(2)),
+                         [1, None, 4998, 4999, 5000, 5001, 5002, None, 250000])
+        self.assertEqual(list(Pagination(1, 4, 12).iter_pages(2)), [1, 2, 3])
+        self.assertEqual(list(Pagination(4, 4, 40).iter_pages(2)), [1, 2, 3, 4, 5, 6, None, 10])
+
+    def test_estimated_totals_do_not_link_a_last_page(self):
+        """Test an estimated total only links pages near the current one"""
+        pagination = Pagination(page=3, per_page=10, total=1234567, total_kind='estimate', has_next=True)
+        self.assertEqual(list(pagination.iter_pages(2)), [1, 2, 3, 4, 5])
+        self.assertEqual(pagination.total_label, 'about 1,200,000')
+        # The look-ahead row wins over an estimate that ran short
+        self.assertEqual(Pagination(7, 10, 50, 'estimate', has_next=True).pages, 8)
+
+    def test_count_strategy(self):
+        """Test counts are exact under the limit and estimated or bounded above it"""
+        calls = []
+
+        def capped(cap):
+            calls.append(cap)
+            return min(cap, 50000)
+
+        self.assertEqual(count_results(lambda cap: min(cap, 42), lambda: 99, limit=100), (42, 'exact'))
+        self.assertEqual(count_results(capped, lambda: 48000, limit=100), (48000, 'estimate'))
+        self.assertEqual(calls, [101])
+        self.assertEqual(count_results(capped, lambda: 7, limit=100), (101, 'estimate'))
+        total, kind = count_results(capped, limit=100)
+        self.assertEqual(Pagination(1, 10, total, kind).total_label, 'more than 100')
+
+class TestPaginatedLists(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['PAGINATION_EXACT_COUNT_LIMIT'] = 5
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('pager', 'pagerpass')
+            for index in range(30):
+                Shipment(sender_name=f'Sender {index}', sender_address='1 Page St', recipient_name='R',
+                         recipient_address='2 Window Ave', weight=1.0,
+                         priority='urgent' if index % 3 == 0 else 'standard',
+                         user_id=self.user.id).save()
+                Task(title=f'Task {index}', description='', user_id=self.user.id).save()
+        self.client.post('/auth/login', data={'username': 'pager', 'password': 'pagerpass'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def test_models_estimate_past_the_limit(self):
+        """Test rollups and sampling stand in for COUNT(*) on large results"""
+        with self.app.app_context():
+            shipments, pagination = Shipment.paginate_by_user(
+                self.user.id, priority_filter='urgent', page=2, per_page=4, count_limit=5)
+            self.assertEqual((len(shipments), pagination.total, pagination.total_kind), (4, 10, 'estimate'))
+            self.assertTrue(pagination.has_next)
+
+            _, search = Shipment.paginate_search(self.user.id, 'Sender 1', per_page=4, count_limit=5)
+            # 'Sender 1' and 'Sender 10'..'Sender 19' match 11 of the 30 sampled rows
+            self.assertEqual((search.total, search.total_kind), (11, 'estimate'))
+
+            _, exact = Shipment.paginate_by_user(self.user.id, per_page=4, count_limit=100)
+            self.assertEqual((exact.total, exact.total_kind), (30, 'exact'))
+
+            _, tasks = Task.paginate_by_user(self.user.id, per_page=4, count_limit=5)
+            self.assertEqual((tasks.total, tasks.total_kind), (6, 'at_least'))
+
+            # Without count_limit the app's PAGINATION_EXACT_COUNT_LIMIT applies
+            _, configured = Shipment.paginate_by_user(self.user.id, per_page=4)
+            self.assertEqual(configured.total_kind, 'estimate')
+
+    def test_rendered_pages(self):
+        """Test list pages render a bounded window and carry filters in page links"""
+        page = self.client.get('/shipments/?page=4&priority=standard').get_data(as_text=True)
+        self.assertIn('about 20 results', page)
+        self.assertIn('?page=5&amp;priority=standard', page)
+        self.assertNotIn('?page=7&amp;', page)
+
+        tasks = self.client.get('/tasks/?page=2').get_data(as_text=True)
+        self.assertIn('more than 5 results', tasks)
+        self.assertIn('?page=3', tasks)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,104 @@
+"""
+Profiling testing script for the Shipment Manager application
+Covers per-request cProfile capture, the stack sampler and the admin profile listing
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import threading
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from utils import profiling
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.app.config['PROFILE_DIR'] = os.path.join(self.workdir.name, 'profiles')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            User.create_user('profiled', 'profiledpass')
+            # The seed migration creates the admin user; admins are configured by id
+            self.app.config['ADMIN_USER_IDS'] = [User.find_by_username('admin').id]
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _login(self, username, password):
+        self.client.post('/auth/login', data={'username': username, 'password': password})
+
+    def test_admin_header_captures_a_profile(self):
+        """Test an admin's profile header saves a pstats file listed on the admin endpoint"""
+        self._login('admin', 'admin123')
+        response = self.client.get('/shipments/?search=Demo', headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        name = response.headers['X-Profile-Id']
+        self.assertTrue(name.endswith('.prof') and 'shipments.list_shipments' in name)
+
+        listing = self.client.get('/admin/profiles').get_json()['profiles']
+        self.assertEqual([(entry['name'], entry['kind']) for entry in listing], [(name, 'cprofile')])
+        text = self.client.get(f'/admin/profiles/{name}?format=text').get_data(as_text=True)
+        self.assertIn('function calls', text)
+        self.assertIn('paginate_search', text)
+        self.assertEqual(self.client.get('/admin/profiles/missing.prof').status_code, 404)
+
+    def test_header_needs_an_admin(self):
+        """Test other users cannot request profiles or see the listing"""
+        self.app.config['ADMIN_USER_IDS'] = []
+        self._login('admin', 'admin123')
+        self.assertEqual(self.client.get('/admin/profiles').status_code, 403)
+        self._login('profiled', 'profiledpass')
+        response = self.client.get('/shipments/', headers={'X-Profile': '1'})
+        self.assertNotIn('X-Profile-Id', response.headers)
+        self.assertEqual(self.client.get('/admin/profiles').status_code, 403)
+
+    def test_sample_rate_and_retention(self):
+        """Test sampled requests are profiled and only the newest PROFILE_MAX_FILES are kept"""
+        self.app.config['PROFILE_SAMPLE_RATE'] = 1.0
+        self.app.config['PROFILE_MAX_FILES'] = 2
+        for _ in range(4):
+            self.assertIn('X-Profile-Id', self.client.get('/auth/login').headers)
+        self.assertEqual(len(os.listdir(self.app.config['PROFILE_DIR'])), 2)
+
+    def test_sampler_folds_request_stacks(self):
+        """Test sampled stacks are folded per endpoint with the running function on top"""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_search():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=slow_search)
+        worker.start()
+        started.wait(5)
+        profiling._active[worker.ident] = 'shipments.list_shipments'
+        try:
+            for _ in range(3):
+                profiling.sample_stacks()
+        finally:
+            profiling._active.pop(worker.ident, None)
+            release.set()
+            worker.join()
+
+        path = profiling.write_stacks(self.app.config['PROFILE_DIR'])
+        with open(path) as f:
+            lines = [line for line in f if line.startswith('shipments.list_shipments;')]
+        self.assertEqual(len(lines), 1)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertTrue(stack.endswith('slow_search;threading.Event.wait;threading.Condition.wait'))
+        self.assertEqual(int(count), 3)
+        profiling._stacks.clear()
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
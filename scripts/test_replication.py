@@ -0,0 +1,183 @@
+"""
+Replication testing script for the Shipment Manager application
+Runs `flask replica ship --follow` in a second process and covers follower
+reads, the lag metric and read-your-writes routing, then drives the shipper
+directly to cover incremental shipping and full rebuilds
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import signal
+import sqlite3
+import subprocess
+import tempfile
+import time
+import unittest
+from app import create_app
+from database import init_db, close_db_connection, get_db_connection, get_replica_connection
+from models.user import User
+from models.shipment import Shipment
+from replication import ReplicaShipper, read_heartbeat, replica_status, request_resync
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestReplication(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.workdir.name, 'shipments.db')
+        self.replica_path = os.path.join(self.workdir.name, 'follower', 'replica.db')
+
+        self.app = create_app()
+        self.app.config['DATABASE_PATH'] = self.db_path
+        self.app.config['REPLICA_PATHS'] = [self.replica_path]
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('replicauser', 'replicapass')
+            self._add('Before')
+
+        env = dict(os.environ, DATABASE_PATH=self.db_path, REPLICA_PATHS=self.replica_path,
+                   REPLICATION_INTERVAL='0.05', PYTHONUNBUFFERED='1')
+        self.shipper = subprocess.Popen(
+            [sys.executable, '-m', 'flask', '--app', os.path.join(PROJECT_ROOT, 'app.py'),
+             'replica', 'ship', '--follow'],
+            env=env, cwd=self.workdir.name, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def tearDown(self):
+        self.shipper.terminate()
+        self.shipper.wait()
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _add(self, name):
+        return Shipment(sender_name=name, sender_address='1 Primary St', recipient_name='R',
+                        recipient_address='2 Follower Ave', weight=1.0,
+                        user_id=self.user.id).save()
+
+    def _wait_for_follower(self):
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            replica = get_replica_connection()
+            if replica is not None:
+                return replica
+            time.sleep(0.05)
+        self.fail('Follower never caught up')
+
+    def test_follower_reads_and_read_your_writes(self):
+        """Test reads move to the follower, and a client's own write pins it to the primary"""
+        with self.app.test_request_context():
+            replica = self._wait_for_follower()
+            self.assertEqual(Shipment.find_by_user(self.user.id)[2], 1)
+            lag = replica_status([self.replica_path])[0]['lag']
+            self.assertIsNotNone(lag)
+            self.assertLess(lag, 15)
+
+            # Until the follower has this write, this client reads the primary
+            self.shipper.send_signal(signal.SIGSTOP)
+            try:
+                self._add('After')
+                self.assertIsNone(get_replica_connection())
+                self.assertEqual(Shipment.find_by_user(self.user.id)[2], 2)
+            finally:
+                self.shipper.send_signal(signal.SIGCONT)
+
+            replica = self._wait_for_follower()
+            self.assertEqual(
+                replica.execute('SELECT COUNT(*) FROM shipments WHERE user_id = ?',
+                                (self.user.id,)).fetchone()[0], 2)
+            self.assertEqual(Shipment.find_by_user(self.user.id)[2], 2)
+
+class TestReplicaShipper(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.workdir.name, 'shipments.db')
+        self.replica_path = os.path.join(self.workdir.name, 'replica.db')
+
+        self.app = create_app()
+        self.app.config['DATABASE_PATH'] = self.db_path
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('shipperuser', 'shipperpass')
+        self.shipper = ReplicaShipper(self.db_path, [self.replica_path], heartbeat_interval=3600)
+
+    def tearDown(self):
+        self.shipper.close()
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _follower_rows(self):
+        conn = sqlite3.connect(f'file:{self.replica_path}?mode=ro', uri=True)
+        try:
+            rows = conn.execute('SELECT sender_name, status FROM shipments WHERE user_id = ? ORDER BY id',
+                                (self.user.id,)).fetchall()
+            return rows, read_heartbeat(conn)
+        finally:
+            conn.close()
+
+    def _add(self, name):
+        return Shipment(sender_name=name, sender_address='1 Primary St', recipient_name='R',
+                        recipient_address='2 Follower Ave', weight=1.0,
+                        user_id=self.user.id).save()
+
+    def test_changes_are_applied_in_place(self):
+        """Test inserts, updates and deletes reach the follower without copying it again"""
+        with self.app.app_context():
+            first = self._add('First')
+            self.assertTrue(self.shipper.ship())
+            self.assertEqual(self.shipper.resynced, 1)
+            inode = os.stat(self.replica_path).st_ino
+            self.assertEqual(self._follower_rows()[0], [('First', 0)])
+
+            second = self._add('Second')
+            first.status = 'picked_up'
+            first.save()
+            self.assertTrue(self.shipper.ship())
+            self.assertEqual(self._follower_rows()[0], [('First', 1), ('Second', 0)])
+
+            second.delete()
+            self.assertTrue(self.shipper.ship())
+            self.assertEqual(self._follower_rows()[0], [('First', 1)])
+            self.assertEqual(self.shipper.resynced, 1)
+            self.assertEqual(self.shipper.applied, 2)
+            self.assertEqual(os.stat(self.replica_path).st_ino, inode)
+
+            # Applied changes are pruned from the primary's log
+            self.assertEqual(get_db_connection().execute(
+                'SELECT COUNT(*) FROM replication_changes').fetchone()[0], 0)
+
+    def test_idle_ship_only_stamps_heartbeat(self):
+        """Test an idle primary costs nothing until the heartbeat is due, then one row"""
+        self.shipper.ship()
+        inode = os.stat(self.replica_path).st_ino
+        heartbeat = self._follower_rows()[1]
+        self.assertFalse(self.shipper.ship())
+        self.assertEqual(self._follower_rows()[1], heartbeat)
+
+        self.assertTrue(self.shipper.ship(force=True))
+        self.assertGreater(self._follower_rows()[1], heartbeat)
+        self.assertEqual((self.shipper.resynced, self.shipper.applied), (1, 0))
+        self.assertEqual(os.stat(self.replica_path).st_ino, inode)
+
+    def test_schema_change_and_resync_request_rebuild(self):
+        """Test a schema change or a resync request makes the next ship a full copy"""
+        self.shipper.ship()
+        with self.app.app_context():
+            conn = get_db_connection()
+            conn.execute('CREATE INDEX idx_test_sender ON shipments (sender_name)')
+            self._add('Indexed')
+            self.shipper.ship()
+            self.assertEqual(self.shipper.resynced, 2)
+            self.assertEqual(self._follower_rows()[0], [('Indexed', 0)])
+
+            request_resync(conn)
+            self.shipper.ship()
+            self.assertEqual(self.shipper.resynced, 3)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,97 @@
+"""
+Seed testing script for the Shipment Manager application
+Covers deterministic generation, the bulk load with deferred indexes and the `flask db seed` command
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from app import create_app
+from database import init_db, close_db_connection, get_db_connection
+from models.rollup import ROLLUP_KEY, ROLLUP_TABLES
+from seed import seed_database, shipment_rows, task_rows
+
+class TestSeed(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _indexes(self, conn):
+        return sorted(row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"))
+
+    def test_rows_are_deterministic(self):
+        """Test the same seed yields the same rows and another seed does not"""
+        users = [1, 2, 3]
+        first = list(shipment_rows(7, 500, users))
+        self.assertEqual(first, list(shipment_rows(7, 500, users)))
+        self.assertNotEqual(first, list(shipment_rows(8, 500, users)))
+        self.assertEqual(list(task_rows(7, 50, users)), list(task_rows(7, 50, users)))
+
+        statuses = {row[7] for row in first}
+        self.assertEqual(statuses, {0, 1, 2, 3, 4, 5})
+        self.assertTrue(all(row[11] <= row[12] for row in first))
+        self.assertEqual(len({row[0] for row in first}), 500)
+
+    def test_seed_loads_rows_and_restores_indexes(self):
+        """Test seeding inserts every row, rebuilds the dropped indexes and the rollups"""
+        with self.app.app_context():
+            conn = get_db_connection()
+            indexes = self._indexes(conn)
+            # Stands in for an existing user's archived shipments, which only the rollups remember
+            with conn:
+                for table, _ in ROLLUP_TABLES.values():
+                    conn.execute(f'UPDATE {table} SET shipment_count = shipment_count + 5 '
+                                 f'WHERE ({ROLLUP_KEY}) = (SELECT {ROLLUP_KEY} FROM {table} LIMIT 1)')
+            batches = []
+            counts = seed_database(conn, users=20, shipments=3000, tasks=300, seed=5, password='seeded',
+                                   batch_size=1000, progress=lambda table, done: batches.append(table))
+            self.assertEqual(counts, {'users': 20, 'shipments': 3000, 'tasks': 300})
+            self.assertEqual(batches.count('shipments'), 3)
+            self.assertEqual(self._indexes(conn), indexes)
+            self.assertEqual(conn.execute('PRAGMA foreign_keys').fetchone()[0], 1)
+            self.assertEqual(conn.execute('PRAGMA foreign_key_check').fetchall(), [])
+
+            # Rollups cover every loaded shipment and other users' rows are untouched
+            total = conn.execute('SELECT COUNT(*) FROM shipments').fetchone()[0]
+            for table, _ in ROLLUP_TABLES.values():
+                self.assertEqual(conn.execute(f'SELECT SUM(shipment_count) FROM {table}').fetchone()[0], total + 5)
+
+            with self.assertRaises(ValueError):
+                seed_database(conn, users=1, shipments=1, tasks=0, seed=5)
+            self.assertEqual(self._indexes(conn), indexes)
+
+        response = self.app.test_client().post('/auth/login', data={'username': 'seed5-0000000',
+                                                                    'password': 'seeded'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_seed_command(self):
+        """Test `flask db seed` reports its throughput and refuses a repeated seed"""
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['db', 'seed', '--users', '3', '--shipments', '200', '--tasks', '10'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Seeded 213 rows', result.output)
+        with self.app.app_context():
+            seeded = get_db_connection().execute(
+                "SELECT COUNT(*) FROM shipments WHERE tracking_number LIKE 'SD42-%'").fetchone()[0]
+        self.assertEqual(seeded, 200)
+
+        again = runner.invoke(args=['db', 'seed', '--users', '3'])
+        self.assertEqual(again.exit_code, 2)
+        self.assertIn('already loaded', again.output)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,71 @@
+"""
+Server testing script for the Shipment Manager application
+Runs `flask serve` in a subprocess and covers worker recycling, SIGHUP
+reload and graceful SIGTERM shutdown
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import signal
+import sqlite3
+import subprocess
+import tempfile
+import unittest
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestPreforkServer(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.workdir.name, 'shipments.db')
+        env = dict(os.environ, DATABASE_PATH=self.db_path, PYTHONUNBUFFERED='1')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'flask', '--app', os.path.join(PROJECT_ROOT, 'app.py'),
+             'serve', '--port', '0', '--workers', '2', '--threads', '2', '--max-requests', '2'],
+            env=env, cwd=self.workdir.name, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True
+        )
+        self.base_url = self._wait_for_listening()
+
+    def tearDown(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        self.workdir.cleanup()
+
+    def _wait_for_listening(self):
+        for line in self.process.stdout:
+            match = re.search(r'Listening on (http://\S+)', line)
+            if match:
+                return match.group(1)
+        self.fail('Server exited before listening')
+
+    def _get(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=10) as response:
+            return response.status
+
+    def test_recycle_reload_and_shutdown(self):
+        """Test workers recycle, SIGHUP keeps serving and SIGTERM exits cleanly"""
+        # More requests than workers x max-requests forces several recycles
+        for _ in range(10):
+            self.assertEqual(self._get('/auth/login'), 200)
+
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        conn.close()
+
+        self.process.send_signal(signal.SIGHUP)
+        self._wait_for_listening()
+        for _ in range(3):
+            self.assertEqual(self._get('/auth/login'), 200)
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(timeout=30), 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
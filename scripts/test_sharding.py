@@ -0,0 +1,156 @@
+"""
+Sharding testing script for the Shipment Manager application
+Covers per-user shard routing, the global tracking index, cross-shard reads and user moves
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from app import create_app
+from database import (init_db, close_db_connection, execute_query, get_db_stats,
+                      get_shard_connection, shard_for_user)
+from models.user import User
+from models.shipment import Shipment
+from models.rollup import ShipmentRollup
+from sharding import import_legacy, move_user, rebalance, recent_shipments, shard_stats
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.app.config['SHARD_DIR'] = os.path.join(self.workdir.name, 'shards')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        close_db_connection()
+        init_db()
+        # Enabled after init so the seeded demo shipments start out unsharded
+        self.app.config['SHARD_COUNT'] = 2
+
+        self.alice = User.create_user('alice', 'alicepass')
+        self.bob = User.create_user('bob', 'bobpass')
+
+    def tearDown(self):
+        close_db_connection()
+        self.ctx.pop()
+        self.workdir.cleanup()
+
+    def _add(self, user, name='S', status='pending'):
+        return Shipment(sender_name=name, sender_address='1 Shard St', recipient_name='R',
+                        recipient_address='2 Split Ave', weight=2.0, status=status,
+                        user_id=user.id).save()
+
+    def _shard_rows(self, index, user):
+        return get_shard_connection(index).execute(
+            'SELECT COUNT(*) FROM shipments WHERE user_id = ?', (user.id,)).fetchone()[0]
+
+    def test_users_are_routed_to_their_own_shard(self):
+        """Test writes land in the user's shard and reads and lookups find them"""
+        alice_shipment = self._add(self.alice)
+        self._add(self.bob)
+        alice_shard = shard_for_user(self.alice.id)
+        self.assertNotEqual(alice_shard, shard_for_user(self.bob.id))
+        self.assertEqual(self._shard_rows(alice_shard, self.alice), 1)
+        self.assertEqual(self._shard_rows(1 - alice_shard, self.alice), 0)
+
+        self.assertEqual(Shipment.find_by_id(alice_shipment.id, self.alice.id).sender_name, 'S')
+        found = Shipment.find_by_tracking_number(alice_shipment.tracking_number)
+        self.assertEqual((found.id, found.user_id), (alice_shipment.id, self.alice.id))
+        self.assertEqual(Shipment.get_status_stats(self.alice.id)[0]['count'], 1)
+
+        alice_shipment.delete()
+        self.assertIsNone(Shipment.find_by_tracking_number(alice_shipment.tracking_number))
+
+    def test_failed_batch_leaves_no_index_rows(self):
+        """Test an API batch whose second item fails rolls back the first item's index row too"""
+        client = self.app.test_client()
+        client.post('/auth/login', data={'username': 'alice', 'password': 'alicepass'})
+        parcel = {'sender_name': 'Batch', 'sender_address': '1 Shard St', 'recipient_name': 'R',
+                  'recipient_address': '2 Split Ave', 'weight': 1.0}
+        failure = [None, sqlite3.OperationalError('disk I/O error')]
+        with mock.patch.object(ShipmentRollup, 'add_shipment', side_effect=failure):
+            response = client.post('/api/v1/shipments/batch',
+                                   json={'shipments': [parcel, dict(parcel, sender_name='Second')]})
+        self.assertEqual(response.status_code, 500)
+
+        self.assertEqual(execute_query('SELECT COUNT(*) FROM shipment_index WHERE user_id = ?',
+                                       (self.alice.id,), fetch_one=True)[0], 0)
+        self.assertEqual(self._shard_rows(shard_for_user(self.alice.id), self.alice), 0)
+
+        # The same batch goes through once nothing fails
+        response = client.post('/api/v1/shipments/batch', json={'shipments': [parcel]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(execute_query('SELECT COUNT(*) FROM shipment_index WHERE user_id = ?',
+                                       (self.alice.id,), fetch_one=True)[0], 1)
+
+    def test_ids_are_globally_unique_and_reads_merge(self):
+        """Test index-allocated ids never collide and fan-out reads see every shard"""
+        legacy_max = execute_query('SELECT MAX(id) FROM shipments', fetch_one=True)[0]
+        shipments = [self._add(user, name=f'{user.username}{i}')
+                     for i in range(3) for user in (self.alice, self.bob)]
+        ids = [s.id for s in shipments]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertGreater(min(ids), legacy_max)
+
+        recent = recent_shipments(4)
+        self.assertEqual(len(recent), 4)
+        stamps = [(s.created_at, s.id) for s in recent]
+        self.assertEqual(stamps, sorted(stamps, reverse=True))
+        self.assertEqual(sum(row['shipments'] for row in shard_stats()), 6)
+
+    def test_move_user_keeps_data_and_writers_follow(self):
+        """Test a move copies shipments and rollups while concurrent writes follow the user"""
+        for _ in range(5):
+            self._add(self.alice)
+        source = shard_for_user(self.alice.id)
+
+        errors = []
+
+        def writer():
+            try:
+                with self.app.app_context():
+                    for _ in range(10):
+                        self._add(self.alice, name='During')
+                    close_db_connection()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        self.assertGreaterEqual(move_user(self.alice.id, 1 - source), 5)
+        thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(shard_for_user(self.alice.id), 1 - source)
+        self.assertEqual(self._shard_rows(source, self.alice), 0)
+        self.assertEqual(self._shard_rows(1 - source, self.alice), 15)
+        self.assertEqual(Shipment.find_by_user(self.alice.id)[2], 15)
+        self.assertEqual(Shipment.get_status_stats(self.alice.id)[0]['count'], 15)
+
+    def test_rebalance_and_legacy_import(self):
+        """Test legacy rows move into shards and rebalancing evens out shard sizes"""
+        admin = User.find_by_username('admin')
+        import_legacy()
+        self.assertEqual(Shipment.find_by_user(admin.id)[2], 5)
+        self.assertEqual(get_db_stats()['shipments'], 5)
+
+        # Pile everyone onto one shard, then let the rebalancer spread them
+        for user in (self.alice, self.bob, admin):
+            move_user(user.id, 0)
+        for _ in range(4):
+            self._add(self.bob)
+        moves = rebalance()
+        self.assertTrue(moves)
+        sizes = [row['shipments'] for row in shard_stats()]
+        self.assertLessEqual(max(sizes) - min(sizes), 5)
+        ShipmentRollup.backfill()
+        self.assertEqual(Shipment.get_status_stats(self.bob.id)[0]['count'], 4)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
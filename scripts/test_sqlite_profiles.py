@@ -0,0 +1,71 @@
+"""
+SQLite profile testing script for the Shipment Manager application
+Covers per-connection PRAGMA profiles and the background WAL checkpointer
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import time
+import unittest
+from app import create_app
+from database import init_db, close_db_connection, get_db_connection, start_checkpointer
+
+class TestSqliteProfiles(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        with self.app.app_context():
+            close_db_connection()
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def test_profile_pragmas_are_applied(self):
+        """Test each new connection gets the configured profile"""
+        self.app.config['SQLITE_PROFILE'] = 'durable'
+        with self.app.app_context():
+            conn = get_db_connection()
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 2)  # FULL
+            self.assertEqual(conn.execute('PRAGMA mmap_size').fetchone()[0], 0)
+
+    def test_unknown_profile_is_rejected(self):
+        """Test a typo in SQLITE_PROFILE fails loudly"""
+        self.app.config['SQLITE_PROFILE'] = 'fastest'
+        with self.app.app_context():
+            with self.assertRaises(ValueError):
+                get_db_connection()
+
+    def test_checkpointer_truncates_large_wal(self):
+        """Test the background checkpointer resets a WAL past the page limit"""
+        self.app.config['SQLITE_CHECKPOINT_INTERVAL'] = 0.05
+        self.app.config['SQLITE_CHECKPOINT_TRUNCATE_PAGES'] = 10
+        self.app.config['SQLITE_PROFILE'] = 'throughput'
+        wal_path = self.app.config['DATABASE_PATH'] + '-wal'
+
+        with self.app.app_context():
+            init_db()
+            conn = get_db_connection()
+            conn.execute('CREATE TABLE filler (data BLOB)')
+            conn.executemany('INSERT INTO filler VALUES (zeroblob(4000))', [()] * 200)
+            conn.commit()
+            self.assertGreater(os.path.getsize(wal_path), 0)
+
+            checkpointer = start_checkpointer(self.app)
+            try:
+                deadline = time.time() + 5
+                while os.path.getsize(wal_path) > 0 and time.time() < deadline:
+                    time.sleep(0.05)
+            finally:
+                checkpointer.stop()
+            self.assertEqual(os.path.getsize(wal_path), 0)
+            self.assertIsNone(checkpointer.last_error)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
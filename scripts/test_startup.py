@@ -0,0 +1,83 @@
+"""
+Startup testing script for the Shipment Manager application
+Covers the startup profiler and lazily loaded task views
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subprocess
+import tempfile
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from utils.startup import LazyView, parse_importtime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_OUTPUT = '''import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     models
+import time:       990 |       1109 |   models.enums
+import time:      1735 |     165081 | app
+'''
+
+class TestStartupProfile(unittest.TestCase):
+    def test_parse_importtime(self):
+        """Test -X importtime output is parsed into module timings"""
+        modules = parse_importtime(IMPORTTIME_OUTPUT)
+        self.assertEqual(modules, [('models', 120, 120, 2), ('models.enums', 990, 1109, 1),
+                                   ('app', 1735, 165081, 0)])
+
+    def test_create_app_records_phases(self):
+        """Test create_app stores its phase timings on the app"""
+        app = create_app()
+        profile = app.extensions['startup_profile']
+        self.assertEqual([name for name, _ in profile.phases],
+                         ['config', 'init_db', 'blueprints', 'commands'])
+        self.assertGreaterEqual(profile.total_ms, 0)
+
+    def test_create_app_leaves_task_model_unloaded(self):
+        """Test neither the task pages nor the task API import models.task at startup"""
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, DATABASE_PATH=os.path.join(workdir, 'shipments.db'))
+            result = subprocess.run(
+                [sys.executable, '-c', 'import sys; from app import create_app; create_app(); '
+                                       "print('models.task' in sys.modules)"],
+                cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False')
+
+class TestLazyTaskViews(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app.config['DATABASE_PATH'] = self.db_path
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            User.create_user('lazyuser', 'lazypass')
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        os.close(self.db_fd)
+        os.remove(self.db_path)
+
+    def test_task_routes_resolve_on_request(self):
+        """Test task endpoints are registered lazily and still serve requests"""
+        view = self.app.view_functions['tasks.list_tasks']
+        self.assertIsInstance(view, LazyView)
+        self.assertIsInstance(self.app.view_functions['api.list_tasks'], LazyView)
+
+        self.client.post('/auth/login', data={'username': 'lazyuser', 'password': 'lazypass'})
+        response = self.client.get('/tasks/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(callable(view.view))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
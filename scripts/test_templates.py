@@ -0,0 +1,94 @@
+"""
+Template caching testing script for the Shipment Manager application
+Covers shipment card fragment caching and the compiled-template cache
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from flask import Flask
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from models.shipment import Shipment
+from utils.templating import configure_templates, warm_templates
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestTemplateCaching(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('renderer', 'renderpass')
+            self.shipment = Shipment(sender_name='Cached Sender', sender_address='1 Card St',
+                                     recipient_name='R', recipient_address='2 Fragment Ave',
+                                     weight=1.0, user_id=self.user.id).save()
+        self.client.post('/auth/login', data={'username': 'renderer', 'password': 'renderpass'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def test_cards_are_cached_by_version(self):
+        """Test repeat renders reuse card markup and a save renders a fresh card"""
+        cache = self.app.jinja_env.fragment_cache
+        first = self.client.get('/shipments/').get_data(as_text=True)
+        self.assertIn('Cached Sender', first)
+        misses = cache.misses
+        self.assertIn('Cached Sender', self.client.get('/shipments/').get_data(as_text=True))
+        self.assertEqual(cache.misses, misses)
+        self.assertGreater(cache.hits, 0)
+
+        with self.app.app_context():
+            shipment = Shipment.find_by_id(self.shipment.id, self.user.id)
+            shipment.sender_name = 'Renamed Sender'
+            shipment.save()
+        page = self.client.get('/shipments/').get_data(as_text=True)
+        self.assertIn('Renamed Sender', page)
+        self.assertNotIn('Cached Sender', page)
+
+        # Filter selections are part of the filter block's key
+        filtered = self.client.get('/shipments/?status=delivered').get_data(as_text=True)
+        self.assertIn('value="delivered" selected', filtered)
+        self.assertNotIn('value="delivered" selected', self.client.get('/shipments/').get_data(as_text=True))
+
+    def test_cache_can_be_disabled(self):
+        """Test a zero-sized cache renders without storing fragments"""
+        self.app.config['TEMPLATE_FRAGMENT_CACHE_SIZE'] = 0
+        self.app.jinja_env.fragment_cache.clear()
+        self.assertIn('Cached Sender', self.client.get('/shipments/').get_data(as_text=True))
+        self.assertEqual(len(self.app.jinja_env.fragment_cache), 0)
+
+    def test_warmup_fills_bytecode_cache(self):
+        """Test warming compiles templates into the configured bytecode directory"""
+        app = Flask('app', root_path=PROJECT_ROOT)
+        app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = os.path.join(self.workdir.name, 'jinja')
+        configure_templates(app)
+        compiled = warm_templates(app)
+        self.assertGreater(compiled, 0)
+        self.assertEqual(len(os.listdir(app.config['TEMPLATE_BYTECODE_CACHE_DIR'])), compiled)
+
+    def test_warmup_logs_broken_templates(self):
+        """Test a template that fails to compile is logged and skipped"""
+        os.makedirs(os.path.join(self.workdir.name, 'templates'))
+        for name, source in (('good.html', '<p>{{ name }}</p>'), ('broken.html', '{% if %}')):
+            with open(os.path.join(self.workdir.name, 'templates', name), 'w') as f:
+                f.write(source)
+        app = Flask('app', root_path=self.workdir.name)
+        configure_templates(app)
+        with self.assertLogs('shipment_manager', 'ERROR') as logs:
+            self.assertEqual(warm_templates(app), 1)
+        self.assertIn('broken.html', logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
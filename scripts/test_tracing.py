@@ -0,0 +1,113 @@
+"""
+Tracing testing script for the Shipment Manager application
+Covers sampled request traces, JSON log records and the non-blocking log queue
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import json
+import logging
+import queue
+import tempfile
+import unittest
+from app import create_app
+from database import init_db, close_db_connection
+from models.user import User
+from models.shipment import Shipment
+from utils.tracing import DroppingQueueHandler, Trace, log, start_logging, stop_logging, tracing_stats
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['DATABASE_PATH'] = os.path.join(self.workdir.name, 'shipments.db')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            close_db_connection()
+            init_db()
+            self.user = User.create_user('tracer', 'tracerpass')
+            Shipment(sender_name='Traced', sender_address='1 Span St', recipient_name='R',
+                     recipient_address='2 Sample Ave', weight=1.0, user_id=self.user.id).save()
+        self.client.post('/auth/login', data={'username': 'tracer', 'password': 'tracerpass'})
+        # Capture this process's JSON log stream
+        stop_logging()
+        self.output = io.StringIO()
+        start_logging(stream=self.output)
+
+    def tearDown(self):
+        stop_logging()
+        with self.app.app_context():
+            close_db_connection()
+        self.workdir.cleanup()
+
+    def _records(self):
+        stop_logging()
+        records = [json.loads(line) for line in self.output.getvalue().splitlines()]
+        self.output = io.StringIO()
+        start_logging(stream=self.output)
+        return records
+
+    def test_sampled_request_trace(self):
+        """Test a sampled request logs one trace with route, model, SQL and render spans"""
+        self.app.config['TRACE_SAMPLE_RATE'] = 1.0
+        self.assertEqual(self.client.get('/shipments/').status_code, 200)
+
+        traces = [record for record in self._records() if record['message'] == 'trace']
+        self.assertEqual(len(traces), 1)
+        spans = traces[0]['trace']['spans']
+        names = [span['name'] for span in spans]
+        self.assertEqual(names[0], 'request')
+        self.assertIn('Shipment.paginate_by_user', names)
+        self.assertIn('sql', names)
+        self.assertIn('render', names)
+
+        request_span = spans[0]
+        self.assertEqual(request_span['attrs']['endpoint'], 'shipments.list_shipments')
+        self.assertEqual(request_span['attrs']['status'], 200)
+        self.assertEqual(request_span['attrs']['shipments'], 1)
+        model = names.index('Shipment.paginate_by_user')
+        self.assertEqual(spans[model]['parent'], 0)
+        self.assertTrue(any(span['name'] == 'sql' and span['parent'] == model for span in spans))
+        self.assertTrue(all('duration_ms' in span for span in spans))
+
+    def test_unsampled_requests_log_nothing(self):
+        """Test a zero sample rate emits no traces"""
+        self.app.config['TRACE_SAMPLE_RATE'] = 0.0
+        for _ in range(5):
+            self.client.get('/shipments/')
+        self.assertEqual([record for record in self._records() if record['message'] == 'trace'], [])
+
+    def test_errors_are_json_records(self):
+        """Test error logs become JSON records tagged with the trace that saw them"""
+        self.app.config['TRACE_SAMPLE_RATE'] = 1.0
+        with self.app.test_request_context():
+            self.app.preprocess_request()
+            log.error("Error finding shipment by ID: %s", 'boom')
+            self.app.do_teardown_request()
+        records = self._records()
+        error = next(record for record in records if record['level'] == 'ERROR')
+        trace = next(record for record in records if record['message'] == 'trace')
+        self.assertEqual(error['message'], 'Error finding shipment by ID: boom')
+        self.assertEqual(error['trace_id'], trace['trace_id'])
+
+    def test_emission_is_bounded(self):
+        """Test a full queue drops records instead of blocking, and traces cap their spans"""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        for index in range(3):
+            handler.handle(logging.makeLogRecord({'msg': f'record {index}'}))
+        self.assertEqual(handler.dropped, 2)
+
+        trace = Trace(max_spans=3)
+        for _ in range(5):
+            with trace.span('sql'):
+                pass
+        finished = trace.finish()
+        self.assertEqual((len(finished['spans']), finished['dropped_spans']), (3, 2))
+        self.assertEqual(tracing_stats()['dropped'], 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
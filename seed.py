@@ -0,0 +1,220 @@
+"""
+Deterministic synthetic data for load tests and benchmarks (`flask db seed`)
+
+The same options and --seed always produce the same users, shipments and
+tasks. Rows go in through executemany in large transactions with the
+secondary indexes (and any triggers) of the seeded tables dropped first and
+rebuilt once at the end, which is several times faster than maintaining
+them row by row; the seeded users' rollups are built from their shipments afterwards.
+"""
+
+import bisect
+import calendar
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from models.enums import PRIORITY_COST_MULTIPLIERS, ShipmentPriority, ShipmentStatus
+from models.rollup import ShipmentRollup
+from replication import request_resync
+
+SEEDED_TABLES = ('users', 'shipments', 'tasks')
+
+# Latest timestamp generated unless --until says otherwise, so output does not drift with the clock
+DEFAULT_UNTIL = datetime(2024, 6, 1)
+
+# (value, weight) pairs: most parcels are long delivered, a few are moving
+STATUS_WEIGHTS = (
+    (ShipmentStatus.DELIVERED, 62),
+    (ShipmentStatus.IN_TRANSIT, 14),
+    (ShipmentStatus.OUT_FOR_DELIVERY, 5),
+    (ShipmentStatus.PICKED_UP, 6),
+    (ShipmentStatus.PENDING, 10),
+    (ShipmentStatus.RETURNED, 3),
+)
+PRIORITY_WEIGHTS = (
+    (ShipmentPriority.STANDARD, 72),
+    (ShipmentPriority.PRIORITY, 21),
+    (ShipmentPriority.URGENT, 7),
+)
+EXPRESS_SHARE = 0.15
+TASK_STATUS_WEIGHTS = (('completed', 55), ('in_progress', 20), ('pending', 25))
+TASK_PRIORITY_WEIGHTS = (('low', 30), ('medium', 50), ('high', 20))
+
+FIRST_NAMES = ('James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Carlos', 'Maria', 'Wei', 'Aisha', 'Ahmed', 'Yuki', 'Olga', 'Priya', 'Mateo', 'Fatima')
+LAST_NAMES = ('Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Chen',
+              'Nguyen', 'Patel', 'Kim', 'Schmidt', 'Kowalski', 'Okafor', 'Silva', 'Tanaka')
+STREETS = ('Main St', 'Oak Ave', 'Maple Dr', 'Cedar Ln', 'Pine St', 'Elm St', 'Washington Blvd',
+           'Lake Rd', 'Hill St', 'Park Ave', 'Sunset Blvd', 'River Rd', 'Broadway', 'Market St', '2nd St')
+CITIES = (('New York', 'NY', 10001), ('Los Angeles', 'CA', 90001), ('Chicago', 'IL', 60601),
+          ('Houston', 'TX', 77001), ('Phoenix', 'AZ', 85001), ('Philadelphia', 'PA', 19101),
+          ('San Antonio', 'TX', 78201), ('San Diego', 'CA', 92101), ('Dallas', 'TX', 75201),
+          ('Seattle', 'WA', 98101), ('Denver', 'CO', 80201), ('Boston', 'MA', 2101),
+          ('Atlanta', 'GA', 30301), ('Miami', 'FL', 33101), ('Portland', 'OR', 97201),
+          ('Minneapolis', 'MN', 55401), ('Detroit', 'MI', 48201), ('Nashville', 'TN', 37201))
+CONTENTS = ('Books', 'Electronics', 'Clothing', 'Kitchenware', 'Toys', 'Documents', 'Auto Parts',
+            'Cosmetics', 'Sporting Goods', 'Medical Supplies', 'Office Supplies', 'Garden Tools',
+            'Handmade Crafts', 'Computer Accessories', 'Furniture Parts', 'Pet Supplies')
+TASK_VERBS = ('Review', 'Schedule', 'Confirm', 'Update', 'Prepare', 'Call', 'Audit', 'Reconcile')
+TASK_OBJECTS = ('pickup window', 'carrier invoice', 'customs forms', 'warehouse count', 'returns queue',
+                'route plan', 'damaged parcel claim', 'customer address')
+
+# Every combination, so a row costs one random() per field rather than several randrange()s
+NAMES = tuple(f'{first} {last}' for first in FIRST_NAMES for last in LAST_NAMES)
+PLACES = tuple(f'{street}, {city}, {state} {zip_code:05d}' for street in STREETS for city, state, zip_code in CITIES)
+TASK_TITLES = tuple(f'{verb} {thing}' for verb in TASK_VERBS for thing in TASK_OBJECTS)
+
+def _picker(rng, values):
+    """Uniform choice from a sequence; cheaper than rng.choice in a tight loop"""
+    random_, size = rng.random, len(values)
+    return lambda: values[int(random_() * size)]
+
+def _chooser(rng, weighted):
+    """Weighted choice over (value, weight) pairs"""
+    values = [value for value, _ in weighted]
+    cumulative = list(itertools.accumulate(weight for _, weight in weighted))
+    random_, total = rng.random, cumulative[-1]
+    return lambda: values[bisect.bisect(cumulative, random_() * total)]
+
+def _timestamps(rng, until, days):
+    """Random 'YYYY-MM-DD HH:MM:SS' within `days` before `until`, plus a later companion"""
+    # Naive datetimes are treated as UTC so the output does not depend on the local timezone
+    random_, span, latest = rng.random, days * 86400, calendar.timegm(until.timetuple())
+    stamp = lambda seconds: time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+
+    def pick(later_within=0):
+        created = latest - int(random_() * span)
+        updated = min(created + 1 + int(random_() * later_within), latest) if later_within else created
+        return stamp(created), stamp(updated)
+    return pick
+
+def _cost(weight, priority, is_express):
+    # Shipment.calculate_shipping_cost on codes instead of labels
+    cost = (5.0 + weight * 2.0) * PRIORITY_COST_MULTIPLIERS[priority]
+    return round(cost * 1.8 if is_express else cost, 2)
+
+def shipment_rows(seed, count, user_ids, until=DEFAULT_UNTIL, days=365):
+    """Yield shipment rows (INSERT column order) for the given users"""
+    rng = random.Random(f'{seed}:shipments')
+    random_ = rng.random
+    # A few heavy shippers and a long tail, like real accounts
+    owner = _chooser(rng, [(user_id, 1 / rank ** 0.8) for rank, user_id in enumerate(user_ids, 1)])
+    status = _chooser(rng, STATUS_WEIGHTS)
+    priority = _chooser(rng, PRIORITY_WEIGHTS)
+    name, place, contents = _picker(rng, NAMES), _picker(rng, PLACES), _picker(rng, CONTENTS)
+    timestamps = _timestamps(rng, until, days)
+    for index in range(count):
+        code = status()
+        level = priority()
+        is_express = random_() < EXPRESS_SHARE
+        # Parcels are mostly light: log-normal around 2 kg, capped at 70 kg
+        weight = round(min(max(rng.lognormvariate(0.7, 0.9), 0.1), 70.0), 1)
+        # Anything past pending has moved since it was created, within a week
+        created, updated = timestamps(7 * 86400 if code else 0)
+        yield (f'SD{seed}-{index:09d}', name(), f'{1 + int(random_() * 9998)} {place()}',
+               name(), f'{1 + int(random_() * 9998)} {place()}', contents(),
+               weight, int(code), int(level), is_express, _cost(weight, level, is_express),
+               created, updated, owner())
+
+def task_rows(seed, count, user_ids, until=DEFAULT_UNTIL, days=365):
+    """Yield task rows (INSERT column order) spread evenly over the given users"""
+    rng = random.Random(f'{seed}:tasks')
+    status = _chooser(rng, TASK_STATUS_WEIGHTS)
+    priority = _chooser(rng, TASK_PRIORITY_WEIGHTS)
+    title = _picker(rng, TASK_TITLES)
+    timestamps = _timestamps(rng, until, days)
+    for index in range(count):
+        created, updated = timestamps(3 * 86400)
+        level = priority()
+        yield (title(), f'Seeded task {index}', status(), level, level == 'high' and rng.random() < 0.5,
+               created, updated, user_ids[index % len(user_ids)])
+
+def _batched(rows, size):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _defer_schema_objects(conn):
+    """Drop secondary indexes and triggers on the seeded tables; returns their SQL"""
+    marks = ', '.join('?' * len(SEEDED_TABLES))
+    # sql IS NULL marks UNIQUE/PRIMARY KEY autoindexes, which cannot be dropped
+    objects = conn.execute(
+        f'''SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND tbl_name IN ({marks}) AND sql IS NOT NULL''',
+        SEEDED_TABLES).fetchall()
+    for kind, name, _ in objects:
+        conn.execute(f'DROP {kind.upper()} "{name}"')
+    return [sql for _, _, sql in objects]
+
+def seed_database(conn, users=100, shipments=10000, tasks=1000, seed=42, password='seedpass',
+                  batch_size=100000, until=DEFAULT_UNTIL, days=365, progress=None):
+    """Bulk-load deterministic users, shipments and tasks; returns {table: rows inserted}"""
+    from werkzeug.security import generate_password_hash
+
+    if users < 1:
+        raise ValueError("At least one user is needed to own the seeded rows")
+    prefix = f'seed{seed}-'
+    if conn.execute('SELECT 1 FROM users WHERE username LIKE ? LIMIT 1', (f'{prefix}%',)).fetchone():
+        raise ValueError(f"Seed {seed} is already loaded; use another --seed or a fresh database")
+
+    report = progress or (lambda table, done: None)
+    counts = {}
+    previous = {name: conn.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('foreign_keys', 'synchronous')}
+    # Rows reference users created in the same run; skip per-row checks and fsyncs
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    # DDL autocommits, so the indexes come back in `finally` even if a batch fails
+    deferred = _defer_schema_objects(conn)
+    try:
+        # Every account shares one hash: hashing is deliberately slow
+        password_hash = generate_password_hash(password)
+        joined = (until - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        with conn:
+            conn.executemany('INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)',
+                             ((f'{prefix}{index:07d}', password_hash, joined) for index in range(users)))
+        user_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM users WHERE username LIKE ? ORDER BY id', (f'{prefix}%',))]
+        counts['users'] = len(user_ids)
+        report('users', counts['users'])
+
+        for table, rows, insert in (
+            ('shipments', shipment_rows(seed, shipments, user_ids, until, days),
+             '''INSERT INTO shipments (tracking_number, sender_name, sender_address, recipient_name,
+                                       recipient_address, package_description, weight, status,
+                                       priority, is_express, shipping_cost, created_at, updated_at, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''),
+            ('tasks', task_rows(seed, tasks, user_ids, until, days),
+             '''INSERT INTO tasks (title, description, status, priority, is_urgent, created_at,
+                                   updated_at, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''),
+        ):
+            counts[table] = 0
+            for batch in _batched(rows, batch_size):
+                with conn:
+                    conn.executemany(insert, batch)
+                counts[table] += len(batch)
+                report(table, counts[table])
+    finally:
+        report('indexes', len(deferred))
+        for sql in deferred:
+            conn.execute(sql)
+        for name, value in previous.items():
+            conn.execute(f'PRAGMA {name} = {int(value)}')
+
+    with conn:
+        # One grouped pass over the seeded users, who were inserted in one transaction
+        # and so hold consecutive ids and have nothing archived; other users' rollups
+        # need no rebuild
+        for query, params in ShipmentRollup.backfill_statements(user_range=(user_ids[0], user_ids[-1])):
+            conn.execute(query, params)
+    conn.execute('ANALYZE')
+    # The load ran with the replica change triggers dropped too
+    request_resync(conn)
+    return counts
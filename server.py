@@ -0,0 +1,301 @@
+"""
+Pre-forking production server used by `flask serve`
+
+The master binds the listening socket, preloads the app, switches SQLite to
+WAL and forks worker processes that accept on the shared socket. Each worker
+runs a Werkzeug server with a bounded request thread pool.
+
+Signals (master):
+    SIGTERM / SIGINT  graceful shutdown: workers finish in-flight requests
+    SIGHUP            reload: drain the workers, then re-exec the master with
+                      the listening socket inherited, picking up new code and
+                      configuration without refusing connections
+"""
+
+import errno
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from archive import start_archiver
+from backup import start_maintenance
+from database import close_db_connection, enable_wal, start_checkpointer
+from replication import start_replication
+from utils.idempotency import start_key_expiry
+from utils.metrics import flush, register_gauge, reset_directory, start_metrics_flush
+from utils.templating import warm_templates
+
+# Environment variable carrying the listening socket across a SIGHUP re-exec
+LISTEN_FD_ENV = 'SHIPMENTS_LISTEN_FD'
+
+WORKER_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGHUP}
+
+class _RequestHandler(WSGIRequestHandler):
+    # One request per connection, so idle keep-alive clients cannot pin pool threads
+    protocol_version = 'HTTP/1.0'
+
+class WorkerServer(BaseWSGIServer):
+    """Werkzeug server for one worker: a bounded thread pool and a request budget"""
+    multithread = True
+
+    def __init__(self, host, port, app, fd, threads=4, max_requests=0):
+        super().__init__(host, port, app, handler=_RequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        # Accept only while a thread is free, so a busy worker leaves
+        # connections in the backlog for its idle siblings to accept
+        self._slots = threading.BoundedSemaphore(threads)
+        register_gauge('server_threads', lambda: {(): threads})
+        register_gauge('server_busy_threads', lambda: {(): threads - self._slots._value})
+        self.max_requests = max_requests
+        self.handled = 0
+        self._stopping = False
+
+    def get_request(self):
+        self._slots.acquire()
+        try:
+            return super().get_request()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+        self.handled += 1
+        if self.max_requests and self.handled >= self.max_requests:
+            self.stop()
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def stop(self):
+        """Stop accepting new connections; in-flight requests keep running"""
+        if not self._stopping:
+            self._stopping = True
+            # shutdown() blocks until serve_forever returns, so it needs its own thread
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def serve(self):
+        """Serve until stopped, then wait for in-flight requests to finish"""
+        self.serve_forever(poll_interval=0.5)
+        self.pool.shutdown(wait=True)
+
+class PreforkServer:
+    """Master process that keeps a fixed number of worker processes running"""
+
+    def __init__(self, app, host='127.0.0.1', port=8000, workers=2, threads=4,
+                 max_requests=0, max_requests_jitter=0, graceful_timeout=30):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.worker_count = workers
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.workers = {}  # pid -> start time
+        # One worker at a time also runs scheduled backups and snapshot refreshes
+        self.maintenance_pid = None
+        self.socket = None
+        self._signals = []
+        self._stop_deadline = None
+        self._reload = False
+        self._respawn_after = 0
+
+    def _listen(self):
+        """Bind the listening socket, or adopt the one inherited from a reload"""
+        inherited = os.environ.pop(LISTEN_FD_ENV, None)
+        if inherited is not None:
+            sock = socket.socket(fileno=int(inherited))
+        else:
+            family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+            sock = socket.create_server((self.host, self.port), family=family, backlog=2048)
+        # Non-blocking so workers that lose the accept race go back to select()
+        sock.setblocking(False)
+        return sock
+
+    def _prepare_database(self):
+        """Enable WAL and make sure the master holds no connection when forking"""
+        with self.app.app_context():
+            mode = enable_wal()
+            if mode not in ('wal', 'memory'):
+                print(f"Warning: SQLite journal mode is {mode}, not WAL")
+            close_db_connection()
+
+    def _prepare_metrics(self, fresh):
+        """Give the workers a shared METRICS_DIR; a reload keeps its totals"""
+        directory = self.app.config.get('METRICS_DIR')
+        if not directory:
+            directory = tempfile.mkdtemp(prefix='shipment-metrics-')
+            self.app.config['METRICS_DIR'] = directory
+            # A re-exec'd master reads its config from the environment
+            os.environ['METRICS_DIR'] = directory
+        elif fresh:
+            reset_directory(directory)
+
+    def _budget(self):
+        if not self.max_requests:
+            return 0
+        return self.max_requests + random.randint(0, self.max_requests_jitter)
+
+    def _spawn_worker(self):
+        # Hold back signals across fork() so a SIGTERM sent to a newborn worker
+        # waits for the worker's own handler instead of hitting the master's
+        maintenance = self.maintenance_pid not in self.workers
+        signal.pthread_sigmask(signal.SIG_BLOCK, WORKER_SIGNALS)
+        pid = os.fork()
+        if pid:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, WORKER_SIGNALS)
+            self.workers[pid] = time.monotonic()
+            if maintenance:
+                self.maintenance_pid = pid
+            return pid
+        self._run_worker(maintenance)
+
+    def _run_worker(self, maintenance=False):
+        """Worker process body; never returns"""
+        status = 0
+        try:
+            # Reloads are the master's job; a stray SIGHUP must not kill a worker
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.set_wakeup_fd(-1)
+
+            server = WorkerServer(self.host, self.port, self.app, self.socket.fileno(),
+                                  threads=self.threads, max_requests=self._budget())
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda *args: server.stop())
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, WORKER_SIGNALS)
+            # Threads do not survive fork(), so each worker runs its own checkpointer
+            tasks = [start_checkpointer(self.app), start_metrics_flush(self.app)]
+            if maintenance:
+                tasks.extend(start_maintenance(self.app))
+                tasks.append(start_archiver(self.app))
+                tasks.append(start_replication(self.app))
+                tasks.append(start_key_expiry(self.app))
+            server.serve()
+            for task in tasks:
+                if task:
+                    task.stop()
+            # os._exit skips atexit; leave the final counts for the next scrape
+            flush(self.app.config['METRICS_DIR'])
+        except Exception as e:
+            print(f"Worker {os.getpid()} crashed: {e}")
+            status = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(status)
+
+    def _reap_workers(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                print(f"Worker {pid} exited with status {code}")
+                if time.monotonic() - started < 1:
+                    # Crashing on boot: back off instead of fork-looping
+                    self._respawn_after = time.monotonic() + 1
+
+    def _signal_workers(self, signum):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+    def _begin_stop(self, reload=False):
+        if self._stop_deadline is None:
+            self._stop_deadline = time.monotonic() + self.graceful_timeout
+            self._signal_workers(signal.SIGTERM)
+        self._reload = self._reload or reload
+
+    def _handle_signals(self):
+        while self._signals:
+            signum = self._signals.pop(0)
+            if signum in (signal.SIGTERM, signal.SIGINT):
+                print("Shutting down gracefully")
+                self._begin_stop()
+            elif signum == signal.SIGHUP:
+                print("Reloading")
+                self._begin_stop(reload=True)
+
+    def _install_signals(self):
+        wakeup_read, wakeup_write = os.pipe()
+        os.set_blocking(wakeup_read, False)
+        os.set_blocking(wakeup_write, False)
+        signal.set_wakeup_fd(wakeup_write)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        return wakeup_read
+
+    def _on_signal(self, signum, frame):
+        # SIGCHLD only needs to wake the loop (via the wakeup fd) to reap
+        if signum != signal.SIGCHLD:
+            self._signals.append(signum)
+
+    def _reexec(self):
+        """Replace the master process, handing over the listening socket"""
+        self.socket.set_inheritable(True)
+        os.environ[LISTEN_FD_ENV] = str(self.socket.fileno())
+        sys.stdout.flush()
+        os.execv(sys.executable, sys.orig_argv)
+
+    def run(self):
+        fresh = LISTEN_FD_ENV not in os.environ
+        self.socket = self._listen()
+        self._prepare_metrics(fresh)
+        self._prepare_database()
+        # Workers inherit the compiled templates instead of each compiling its own
+        warm_templates(self.app)
+        wakeup = self._install_signals()
+        host, port = self.socket.getsockname()[:2]
+        print(f"Listening on http://{host}:{port} "
+              f"({self.worker_count} workers x {self.threads} threads, master {os.getpid()})")
+        sys.stdout.flush()
+
+        while True:
+            self._reap_workers()
+            self._handle_signals()
+
+            if self._stop_deadline is None:
+                while len(self.workers) < self.worker_count and time.monotonic() >= self._respawn_after:
+                    self._spawn_worker()
+            elif not self.workers:
+                break
+            elif time.monotonic() > self._stop_deadline:
+                print("Graceful timeout reached, killing workers")
+                self._signal_workers(signal.SIGKILL)
+
+            try:
+                select.select([wakeup], [], [], 1.0)
+                os.read(wakeup, 512)
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                if e.errno != errno.EINTR:
+                    raise
+
+        if self._reload:
+            self._reexec()
+        self.socket.close()
+        print("Server stopped")
@@ -0,0 +1,177 @@
+"""
+User-sharded shipment storage
+
+With SHARD_COUNT > 0 each user's shipments and rollups live in one shard file,
+so writes from different tenants take different SQLite write locks. The
+global database keeps users, tasks, `shard_directory` (user -> shard) and
+`shipment_index`, which allocates shipment ids and maps tracking numbers to
+users. This module holds the cross-shard reads and the tools that move users
+between shards.
+"""
+
+import heapq
+import os
+from itertools import islice
+from flask import current_app
+from database import (fan_out, get_db_connection, get_shard_connection, iter_shards,
+                      shard_for_user, shard_path, sharding_enabled)
+from models.shipment import SHIPMENT_COLUMNS, Shipment
+
+# Per-user tables that live in the shards and move with their user
+USER_TABLES = ('shipments', 'shipment_rollups_hourly', 'shipment_rollups_daily')
+
+def _require_sharding():
+    if not sharding_enabled():
+        raise ValueError("Sharding is not enabled (set SHARD_COUNT)")
+    return current_app.config['SHARD_COUNT']
+
+def recent_shipments(limit=20):
+    """Newest shipments across all users, merged from each shard's own newest rows"""
+    query = f'SELECT {SHIPMENT_COLUMNS} FROM shipments ORDER BY created_at DESC, id DESC LIMIT ?'
+    # Each stream is already sorted, so the heap merge reads at most `limit` rows from each
+    streams = iter_shards(query, (limit,), batch_size=limit, raw=True)
+    merged = heapq.merge(*streams, key=lambda row: (row[12], row[0]), reverse=True)
+    return [Shipment._from_db_row(row) for row in islice(merged, limit)]
+
+def shard_stats():
+    """Users, shipments and file size per shard"""
+    shard_count = _require_sharding()
+    placed = dict(get_db_connection().execute(
+        'SELECT shard, COUNT(*) FROM shard_directory GROUP BY shard'
+    ).fetchall())
+    counts = fan_out('SELECT COUNT(*), COUNT(DISTINCT user_id) FROM shipments')
+    stats = []
+    for index in range(shard_count):
+        path = shard_path(index)
+        stats.append({
+            'shard': index,
+            'users': placed.get(index, 0),
+            'active_users': counts[index][0][1],
+            'shipments': counts[index][0][0],
+            'bytes': os.path.getsize(path) if os.path.exists(path) else 0,
+        })
+    return stats
+
+def _copy_user_rows(source, target, user_id):
+    """Replace a user's rows in the target connection with those from the source"""
+    moved = 0
+    for table in USER_TABLES:
+        # Clears leftovers of an interrupted earlier move
+        target.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+        rows = source.execute(f'SELECT * FROM {table} WHERE user_id = ?', (user_id,)).fetchall()
+        if rows:
+            marks = ', '.join('?' * len(rows[0]))
+            target.executemany(f'INSERT INTO {table} VALUES ({marks})', [tuple(row) for row in rows])
+        if table == 'shipments':
+            moved = len(rows)
+    return moved
+
+def move_user(user_id, target):
+    """Move one user's shipments and rollups to another shard; returns shipments moved"""
+    shard_count = _require_sharding()
+    if not 0 <= target < shard_count:
+        raise ValueError(f"Shard must be between 0 and {shard_count - 1}")
+    source = shard_for_user(user_id)
+    if source == target:
+        return 0
+
+    src = get_shard_connection(source)
+    dst = get_shard_connection(target)
+    glob = get_db_connection()
+    # Holding the source write lock blocks the user's writers for the whole move;
+    # they re-read the directory once they get the lock and follow the user
+    src.execute('BEGIN IMMEDIATE')
+    try:
+        dst.execute('BEGIN IMMEDIATE')
+        try:
+            moved = _copy_user_rows(src, dst, user_id)
+            dst.commit()
+        except Exception:
+            dst.rollback()
+            raise
+        # Copy, then repoint, then delete: a crash at any step leaves a copy, never a loss
+        glob.execute('UPDATE shard_directory SET shard = ? WHERE user_id = ?', (target, user_id))
+        glob.commit()
+        for table in USER_TABLES:
+            src.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+        src.commit()
+    except Exception:
+        src.rollback()
+        raise
+    return moved
+
+def plan_rebalance():
+    """Return (user_id, source, target) moves that even out shipments per shard"""
+    shard_count = _require_sharding()
+    glob = get_db_connection()
+    placement = dict(glob.execute('SELECT user_id, shard FROM shard_directory').fetchall())
+    sizes = {}
+    for rows in fan_out('SELECT user_id, COUNT(*) FROM shipments GROUP BY user_id'):
+        sizes.update(dict(rows))
+
+    loads = [0] * shard_count
+    for user_id, shard in placement.items():
+        loads[shard] += sizes.get(user_id, 0)
+
+    # Greedy: move the largest user off the fullest shard while that narrows the gap
+    moves = []
+    users_by_shard = {index: sorted((u for u, s in placement.items() if s == index),
+                                    key=lambda u: sizes.get(u, 0), reverse=True)
+                      for index in range(shard_count)}
+    while True:
+        fullest = max(range(shard_count), key=loads.__getitem__)
+        emptiest = min(range(shard_count), key=loads.__getitem__)
+        gap = loads[fullest] - loads[emptiest]
+        candidate = next((u for u in users_by_shard[fullest]
+                          if 0 < sizes.get(u, 0) < gap), None)
+        if candidate is None:
+            return moves
+        users_by_shard[fullest].remove(candidate)
+        users_by_shard[emptiest].append(candidate)
+        loads[fullest] -= sizes[candidate]
+        loads[emptiest] += sizes[candidate]
+        moves.append((candidate, fullest, emptiest))
+
+def rebalance(dry_run=False):
+    """Apply plan_rebalance(); returns the planned moves"""
+    moves = plan_rebalance()
+    if not dry_run:
+        for user_id, _, target in moves:
+            move_user(user_id, target)
+    return moves
+
+def import_legacy():
+    """Move shipments from the unsharded global tables into the shards; returns rows moved"""
+    _require_sharding()
+    glob = get_db_connection()
+    # Ids handed out from now on must stay above the legacy ones
+    glob.execute('''UPDATE sqlite_sequence
+                    SET seq = MAX(seq, (SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence
+                                        WHERE name = 'shipments'))
+                    WHERE name = 'shipment_index' ''')
+    glob.commit()
+
+    moved = 0
+    user_ids = [row[0] for row in glob.execute('SELECT DISTINCT user_id FROM shipments').fetchall()]
+    for user_id in user_ids:
+        target = get_shard_connection(shard_for_user(user_id))
+        glob.execute('BEGIN IMMEDIATE')
+        try:
+            target.execute('BEGIN IMMEDIATE')
+            try:
+                moved += _copy_user_rows(glob, target, user_id)
+                target.commit()
+            except Exception:
+                target.rollback()
+                raise
+            # Index rows and the global delete commit together
+            glob.execute('''INSERT OR REPLACE INTO shipment_index (id, tracking_number, user_id)
+                            SELECT id, tracking_number, user_id FROM shipments WHERE user_id = ?''',
+                         (user_id,))
+            for table in USER_TABLES:
+                glob.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+            glob.commit()
+        except Exception:
+            glob.rollback()
+            raise
+    return moved
@@ -0,0 +1,252 @@
+"""
+Columnar snapshot of the shipments table for analytics.
+
+A snapshot file holds one typed, fixed-width array per column, laid out as:
+
+    MAGIC | header length (uint32) | JSON header | padding | column data...
+
+Each column starts on an 8-byte boundary so the file can be memory-mapped and
+every column exposed as a zero-copy ``memoryview`` (or ``numpy.frombuffer``
+when NumPy is installed). Status and priority keep their integer enum codes as
+uint8 with the label dictionary in the header; timestamps are epoch seconds.
+"""
+
+from array import array
+from database import iter_query, iter_shards, sharding_enabled
+from models.enums import STATUS_NAMES, PRIORITY_NAMES
+import heapq
+import json
+import mmap
+import os
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; aggregation falls back to pure Python
+    np = None
+
+MAGIC = b'SHPCOL1\0'
+ALIGNMENT = 8
+SECONDS_PER_DAY = 86400
+
+# (column name, array typecode, SQL expression)
+SNAPSHOT_COLUMNS = [
+    ('id', 'q', 'id'),
+    ('user_id', 'q', 'user_id'),
+    ('weight', 'd', 'COALESCE(weight, 0.0)'),
+    ('shipping_cost', 'd', 'COALESCE(shipping_cost, 0.0)'),
+    ('status', 'B', 'status'),
+    ('priority', 'B', 'priority'),
+    ('is_express', 'B', 'is_express'),
+    ('created_at', 'q', "CAST(COALESCE(strftime('%s', created_at), 0) AS INTEGER)"),
+    ('updated_at', 'q', "CAST(COALESCE(strftime('%s', updated_at), 0) AS INTEGER)"),
+]
+
+def read_shipment_columns(user_id=None, batch_size=5000):
+    """Read the shipments table into typed column arrays using chunked reads"""
+    columns = {name: array(typecode) for name, typecode, _ in SNAPSHOT_COLUMNS}
+    dictionaries = {
+        'status': list(STATUS_NAMES),
+        'priority': list(PRIORITY_NAMES),
+    }
+
+    select = ', '.join(expression for _, _, expression in SNAPSHOT_COLUMNS)
+    query = f'SELECT {select} FROM shipments'
+    params = []
+    if user_id is not None:
+        query += ' WHERE user_id = ?'
+        params.append(user_id)
+    query += ' ORDER BY id'
+
+    if user_id is not None or not sharding_enabled():
+        rows = iter_query(query, params, batch_size=batch_size, raw=True, reporting=True,
+                          shard_key=user_id)
+    else:
+        # Every shard streams in id order; merging keeps the snapshot sorted by id
+        rows = heapq.merge(*iter_shards(query, params, batch_size=batch_size, raw=True))
+
+    # Status and priority are already stored as enum codes, so rows append as-is
+    appenders = [columns[name].append for name, _, _ in SNAPSHOT_COLUMNS]
+    for row in rows:
+        for append, value in zip(appenders, row):
+            append(value)
+
+    return columns, dictionaries
+
+def write_snapshot(path, columns, dictionaries):
+    """Write column arrays to a compact, mmap-friendly columnar file"""
+    row_count = len(columns['id'])
+    layout = []
+    offset = 0
+    for name, typecode, _ in SNAPSHOT_COLUMNS:
+        nbytes = len(columns[name]) * columns[name].itemsize
+        layout.append({'name': name, 'type': typecode, 'offset': offset, 'nbytes': nbytes})
+        offset += nbytes + (-nbytes % ALIGNMENT)
+
+    header = json.dumps({
+        'rows': row_count,
+        'columns': layout,
+        'dictionaries': dictionaries,
+    }).encode('utf-8')
+    preamble = len(MAGIC) + 4 + len(header)
+    data_start = preamble + (-preamble % ALIGNMENT)
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(b'\0' * (data_start - preamble))
+        for column in layout:
+            data = columns[column['name']]
+            data.tofile(f)
+            f.write(b'\0' * (-column['nbytes'] % ALIGNMENT))
+    # Atomic swap so readers never map a half-written file
+    os.replace(tmp_path, path)
+    return row_count
+
+def export_snapshot(path, user_id=None, batch_size=5000):
+    """Read the shipments table and write it as a columnar snapshot"""
+    columns, dictionaries = read_shipment_columns(user_id=user_id, batch_size=batch_size)
+    return write_snapshot(path, columns, dictionaries)
+
+class ColumnarSnapshot:
+    """Memory-mapped, read-only view over a columnar snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        if bytes(self._buffer[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"Not a shipment snapshot file: {path}")
+
+        header_length = struct.unpack_from('<I', self._mmap, len(MAGIC))[0]
+        header_start = len(MAGIC) + 4
+        header = json.loads(bytes(self._buffer[header_start:header_start + header_length]))
+        preamble = header_start + header_length
+        data_start = preamble + (-preamble % ALIGNMENT)
+
+        self.rows = header['rows']
+        self.dictionaries = header['dictionaries']
+        self._columns = {}
+        for column in header['columns']:
+            start = data_start + column['offset']
+            view = self._buffer[start:start + column['nbytes']]
+            self._columns[column['name']] = view.cast(column['type'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        """Release column views and unmap the file"""
+        for view in getattr(self, '_columns', {}).values():
+            view.release()
+        self._columns = {}
+        if getattr(self, '_buffer', None) is not None:
+            self._buffer.release()
+            self._buffer = None
+        if getattr(self, '_mmap', None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if getattr(self, '_file', None) is not None:
+            self._file.close()
+            self._file = None
+
+    def column(self, name):
+        """Return a zero-copy view of a column"""
+        return self._columns[name]
+
+    def as_numpy(self, name):
+        """Return a column as a NumPy array sharing the mapped memory"""
+        if np is None:
+            raise RuntimeError("NumPy is not installed")
+        view = self._columns[name]
+        return np.frombuffer(view, dtype=np.dtype(view.format))
+
+    def decode(self, name, code):
+        """Decode a dictionary-encoded value"""
+        return self.dictionaries[name][code]
+
+    def _key_column(self, key):
+        if key == 'day':
+            if np is not None:
+                return self.as_numpy('created_at') // SECONDS_PER_DAY
+            return [ts // SECONDS_PER_DAY for ts in self._columns['created_at']]
+        if np is not None:
+            return self.as_numpy(key)
+        return self._columns[key]
+
+    def _decode_key(self, key, value):
+        if key in self.dictionaries:
+            return self.decode(key, int(value))
+        return int(value)
+
+    def group_by(self, keys=('status',), metrics=('weight', 'shipping_cost')):
+        """Aggregate count, sum and mean of metric columns per group key"""
+        if isinstance(keys, str):
+            keys = (keys,)
+        for key in keys:
+            if key != 'day' and key not in self._columns:
+                raise ValueError(f"Unknown group-by column: {key}")
+
+        if self.rows == 0:
+            return {}
+
+        if np is not None:
+            return self._group_by_numpy(keys, metrics)
+        return self._group_by_python(keys, metrics)
+
+    def _group_by_numpy(self, keys, metrics):
+        key_arrays = [self._key_column(key).astype(np.int64) for key in keys]
+        stacked = np.stack(key_arrays, axis=1)
+        groups, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse, minlength=len(groups))
+        sums = {metric: np.bincount(inverse, weights=self.as_numpy(metric), minlength=len(groups))
+                for metric in metrics}
+
+        result = {}
+        for index, group in enumerate(groups):
+            group_key = tuple(self._decode_key(key, value) for key, value in zip(keys, group))
+            result[group_key] = self._summary(
+                int(counts[index]), {metric: float(sums[metric][index]) for metric in metrics}
+            )
+        return result
+
+    def _group_by_python(self, keys, metrics):
+        key_columns = [self._key_column(key) for key in keys]
+        metric_columns = [self._columns[metric] for metric in metrics]
+        counts = {}
+        sums = {}
+        for group, values in zip(zip(*key_columns), zip(*metric_columns)):
+            if group in counts:
+                counts[group] += 1
+                totals = sums[group]
+                for index, value in enumerate(values):
+                    totals[index] += value
+            else:
+                counts[group] = 1
+                sums[group] = list(values)
+
+        result = {}
+        for group, count in counts.items():
+            group_key = tuple(self._decode_key(key, value) for key, value in zip(keys, group))
+            result[group_key] = self._summary(count, dict(zip(metrics, sums[group])))
+        return result
+
+    @staticmethod
+    def _summary(count, totals):
+        summary = {'count': count}
+        for metric, total in totals.items():
+            summary[f'sum_{metric}'] = round(total, 2)
+            summary[f'avg_{metric}'] = round(total / count, 2) if count else 0.0
+        return summary
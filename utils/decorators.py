@@ -1,5 +1,6 @@
+import hmac
 from functools import wraps
-from flask import session, redirect, url_for, flash
+from flask import session, redirect, url_for, flash, jsonify, abort, current_app, request
 
 def login_required(f):
     """Decorator to require login for protected routes"""
@@ -11,6 +12,20 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def api_login_required(f):
+    """Decorator to require login for JSON API routes, answering 401 instead of redirecting"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Authentication required'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+def is_admin():
+    """Check whether the logged-in user's id is listed in ADMIN_USER_IDS"""
+    user_id = session.get('user_id')
+    return user_id is not None and user_id in current_app.config.get('ADMIN_USER_IDS', ())
+
 def admin_required(f):
     """Decorator to require admin privileges"""
     @wraps(f)
@@ -19,7 +34,21 @@ def admin_required(f):
             flash('Please log in to access this page.', 'error')
             return redirect(url_for('auth.login'))
         
-        # Add admin check logic here if needed
-        # For now, we'll assume all logged-in users have access
+        if not is_admin():
+            abort(403)
         return f(*args, **kwargs)
     return decorated_function
+
+def metrics_access_required(f):
+    """Decorator to limit scrape endpoints to METRICS_ALLOWED_IPS or a METRICS_TOKEN bearer"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        config = current_app.config
+        token = config.get('METRICS_TOKEN')
+        supplied = request.headers.get('Authorization', '')
+        if token and hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return f(*args, **kwargs)
+        if request.remote_addr in config.get('METRICS_ALLOWED_IPS', ()):
+            return f(*args, **kwargs)
+        abort(403)
+    return decorated_function
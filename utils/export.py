@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+import zlib
+from operator import attrgetter
+
+# Column order used by every export format
+EXPORT_COLUMNS = [
+    'id', 'tracking_number', 'sender_name', 'sender_address',
+    'recipient_name', 'recipient_address', 'package_description',
+    'weight', 'status', 'priority', 'is_express', 'shipping_cost',
+    'created_at', 'updated_at'
+]
+
+# Reads export columns straight off model attributes, skipping to_dict()
+_export_values = attrgetter(*EXPORT_COLUMNS)
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+def generate_csv(shipments, flush_every=200):
+    """Yield CSV chunks for an iterable of shipments, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    rows_in_buffer = 0
+    for shipment in shipments:
+        writer.writerow(_export_values(shipment))
+        rows_in_buffer += 1
+
+        if rows_in_buffer >= flush_every:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows_in_buffer = 0
+
+    # Always emit the remainder (at least the header)
+    yield buffer.getvalue()
+
+def generate_ndjson(shipments, flush_every=200):
+    """Yield newline-delimited JSON chunks for an iterable of shipments"""
+    lines = []
+    for shipment in shipments:
+        lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, _export_values(shipment)))))
+
+        if len(lines) >= flush_every:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def gzip_stream(chunks, level=6):
+    """Compress a stream of text chunks into a gzip byte stream"""
+    # wbits=31 selects the gzip container instead of raw zlib
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def generate_export(shipments, export_format='csv', compress=False):
+    """Build the chunk generator for the requested export format"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    if export_format == 'ndjson':
+        chunks = generate_ndjson(shipments)
+    else:
+        chunks = generate_csv(shipments)
+
+    if compress:
+        return gzip_stream(chunks)
+    return chunks
@@ -1,4 +1,7 @@
 from datetime import datetime
+from flask import current_app
+from urllib.parse import urlencode
+import math
 import re
 
 def format_datetime(dt_string):
@@ -46,5 +49,89 @@ def paginate_query_string(page, **filters):
         if value:
             params[key] = value
     
-    query_parts = [f"{key}={value}" for key, value in params.items()]
-    return '&'.join(query_parts)
+    return urlencode(params)
+
+def count_results(capped_count, estimate=None, limit=None):
+    """Count exactly up to `limit` rows and estimate past it; returns (total, kind)
+
+    capped_count(n) counts at most n matching rows (a LIMITed subquery), so the
+    exact path never reads more than limit + 1 rows. kind is 'exact', 'estimate',
+    or 'at_least' when there is no estimator and limit + 1 is all that is known.
+    limit defaults to the app's PAGINATION_EXACT_COUNT_LIMIT.
+    """
+    if limit is None:
+        limit = current_app.config['PAGINATION_EXACT_COUNT_LIMIT']
+    count = capped_count(limit + 1)
+    if count <= limit:
+        return count, 'exact'
+    estimated = estimate() if estimate else None
+    if estimated is None:
+        return count, 'at_least'
+    # Never report fewer rows than were actually counted
+    return max(count, estimated), 'estimate'
+
+def estimate_from_sample(total, sample_size, sample_matches):
+    """Scale the match rate of a sample up to the whole population"""
+    if not sample_size:
+        return 0
+    return round(total * sample_matches / sample_size)
+
+def _round_estimate(value):
+    """Round to two significant figures, so an estimate does not look exact"""
+    if value < 100:
+        return value
+    magnitude = 10 ** (len(str(value)) - 2)
+    return round(value / magnitude) * magnitude
+
+class Pagination:
+    """One page of a listing: a bounded window of page links and an exact or estimated total"""
+    
+    def __init__(self, page, per_page, total, total_kind='exact', has_next=None):
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.total_kind = total_kind
+        self.pages = max(1, math.ceil(total / per_page))
+        self.has_next = page < self.pages if has_next is None else has_next
+        if self.has_next and self.pages <= page:
+            # The estimate ran short of the rows actually there
+            self.pages = page + 1
+    
+    @property
+    def exact(self):
+        return self.total_kind == 'exact'
+    
+    @property
+    def has_prev(self):
+        return self.page > 1
+    
+    @property
+    def total_label(self):
+        """Total for display: '1,234', 'about 1,200,000' or 'more than 10,000'"""
+        if self.total_kind == 'estimate':
+            return f'about {_round_estimate(self.total):,}'
+        if self.total_kind == 'at_least':
+            return f'more than {self.total - 1:,}'
+        return f'{self.total:,}'
+    
+    def iter_pages(self, window=2):
+        """Page numbers to link around the current page, with None marking skipped runs
+
+        The first page is always linked; the last only when the total is exact,
+        since an estimated last page may not exist.
+        """
+        last = self.pages if self.exact else min(self.pages, self.page + window)
+        start = max(1, self.page - window)
+        end = min(last, self.page + window)
+        if start > 1:
+            yield 1
+            if start > 2:
+                yield None
+        yield from range(start, end + 1)
+        if end < last:
+            if end < last - 1:
+                yield None
+            yield last
+    
+    def query_string(self, page, **filters):
+        return paginate_query_string(page, **filters)
@@ -0,0 +1,201 @@
+"""
+Idempotency keys for retried POST requests
+
+A client sends an `Idempotency-Key` header (browser forms carry it as a
+hidden `idempotency_key` field). The first request with a key claims it and
+its response is stored with a hash of the request; a retry with the same key
+and the same request gets the stored response back without running the view,
+and a retry with a different request is rejected. Keys expire after
+IDEMPOTENCY_TTL seconds. Completed keys are also kept in a small per-process
+LRU so hot retries skip the database.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, g, jsonify, request, session
+from database import execute_query, transaction
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 255
+# Response headers replayed to retries; cookies belong to the original response only
+REPLAYED_HEADERS = ('Location', 'Content-Type', 'ETag')
+
+class RecentKeys:
+    """Thread-safe LRU of completed idempotency records"""
+
+    def __init__(self, size=1024):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope):
+        with self._lock:
+            record = self._entries.get(scope)
+            if record is None:
+                self.misses += 1
+                return None
+            if record['expires_at'] <= time.time():
+                del self._entries[scope]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(scope)
+            self.hits += 1
+            return record
+
+    def put(self, scope, record):
+        with self._lock:
+            self._entries[scope] = record
+            self._entries.move_to_end(scope)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+recent_keys = RecentKeys()
+
+def request_fingerprint():
+    """Hash the method, path and body of the current request"""
+    digest = hashlib.sha256(f'{request.method} {request.path}\0'.encode('utf-8'))
+    if request.mimetype in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        # Hash parsed fields, so the key field itself and field order do not matter
+        fields = sorted((name, value) for name, value in request.form.items(multi=True)
+                        if name != IDEMPOTENCY_FIELD)
+        digest.update(json.dumps(fields).encode('utf-8'))
+    else:
+        digest.update(request.get_data())
+    return digest.hexdigest()
+
+def _load_record(scope, ttl):
+    """Read a live key from the primary; status_code is None while its request runs"""
+    # Inside a transaction the read cannot be served by a lagging replica
+    with transaction():
+        row = execute_query(
+            '''SELECT request_hash, status_code, headers, body, created_at FROM idempotency_keys
+               WHERE user_id = ? AND endpoint = ? AND idempotency_key = ? AND created_at > ?''',
+            (*scope, time.time() - ttl),
+            fetch_one=True
+        )
+    if row is None:
+        return None
+    return {
+        'request_hash': row['request_hash'],
+        'status_code': row['status_code'],
+        'headers': json.loads(row['headers']) if row['headers'] else {},
+        'body': row['body'],
+        'expires_at': row['created_at'] + ttl,
+    }
+
+def _claim_key(scope, fingerprint, ttl):
+    """Reserve a key for this request; False if another request holds it"""
+    now = time.time()
+    with transaction():
+        # An expired key may be reused
+        execute_query(
+            '''DELETE FROM idempotency_keys
+               WHERE user_id = ? AND endpoint = ? AND idempotency_key = ? AND created_at <= ?''',
+            (*scope, now - ttl)
+        )
+        claimed = execute_query(
+            '''INSERT OR IGNORE INTO idempotency_keys
+               (user_id, endpoint, idempotency_key, request_hash, created_at)
+               VALUES (?, ?, ?, ?, ?)''',
+            (*scope, fingerprint, now),
+            rowcount=True
+        )
+    return claimed == 1
+
+def _complete_key(scope, response, resource_id):
+    """Store the response of a claimed key"""
+    headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+    body = response.get_data()
+    execute_query(
+        '''UPDATE idempotency_keys SET status_code = ?, headers = ?, body = ?, resource_id = ?
+           WHERE user_id = ? AND endpoint = ? AND idempotency_key = ?''',
+        (response.status_code, json.dumps(headers), body, resource_id, *scope)
+    )
+    return {'status_code': response.status_code, 'headers': headers, 'body': body}
+
+def _release_key(scope):
+    """Drop a claim whose request failed, so a retry runs it again"""
+    execute_query(
+        'DELETE FROM idempotency_keys WHERE user_id = ? AND endpoint = ? AND idempotency_key = ?',
+        scope
+    )
+
+def _replay(record, fingerprint):
+    """Return the stored response, or an error if the key belongs to another request"""
+    if record['request_hash'] != fingerprint:
+        return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}), 422
+    if record['status_code'] is None:
+        response = jsonify({'error': 'A request with this idempotency key is still in progress'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    response = Response(record['body'], status=record['status_code'], headers=record['headers'])
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(f):
+    """Decorator to replay the stored response when a POST repeats its idempotency key"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER) or request.form.get(IDEMPOTENCY_FIELD)
+        if request.method != 'POST' or not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} is longer than {MAX_KEY_LENGTH} characters'}), 400
+
+        ttl = current_app.config.get('IDEMPOTENCY_TTL', 86400)
+        scope = (session.get('user_id', 0), request.endpoint, key)
+        fingerprint = request_fingerprint()
+
+        record = recent_keys.get(scope) or _load_record(scope, ttl)
+        if record is None and not _claim_key(scope, fingerprint, ttl):
+            # Lost the race for the key: replay whatever the winner has stored
+            record = _load_record(scope, ttl)
+        if record is not None:
+            return _replay(record, fingerprint)
+
+        try:
+            response = current_app.make_response(f(*args, **kwargs))
+        except Exception:
+            _release_key(scope)
+            raise
+        if response.status_code >= 500:
+            _release_key(scope)
+            return response
+
+        record = _complete_key(scope, response, g.get('idempotent_resource_id'))
+        record.update(request_hash=fingerprint, expires_at=time.time() + ttl)
+        recent_keys.size = current_app.config.get('IDEMPOTENCY_CACHE_SIZE', recent_keys.size)
+        recent_keys.put(scope, record)
+        return response
+    return decorated_function
+
+def purge_expired_keys(ttl):
+    """Delete expired idempotency keys; returns the number removed"""
+    return execute_query('DELETE FROM idempotency_keys WHERE created_at <= ?',
+                         (time.time() - ttl,), rowcount=True)
+
+def start_key_expiry(app):
+    """Start the periodic purge of expired idempotency keys for this process"""
+    from utils.scheduler import PeriodicTask
+
+    config = app.config
+    if not config.get('IDEMPOTENCY_PURGE_INTERVAL'):
+        return None
+
+    def run_purge():
+        with app.app_context():
+            purge_expired_keys(config['IDEMPOTENCY_TTL'])
+
+    return PeriodicTask('idempotency-expiry', config['IDEMPOTENCY_PURGE_INTERVAL'], run_purge).start()
@@ -0,0 +1,207 @@
+"""
+Memory diagnostics: tracemalloc snapshots, per-endpoint allocation peaks and
+RSS / object-count gauges
+
+Everything here is per process; under `flask serve` an admin request acts on
+whichever worker answers it, and responses carry that worker's pid.
+
+- tracemalloc is off unless started (admin endpoint or MEMORY_TRACEMALLOC_FRAMES
+  at startup). Snapshots are dumped to MEMORY_SNAPSHOT_DIR and can be diffed
+  to see which lines grew between two points in time.
+- While tracemalloc runs, MEMORY_SAMPLE_RATE of requests record their peak
+  allocation per endpoint. tracemalloc's peak is process-wide, so one sampled
+  request runs at a time and overlapping ones are skipped rather than mixed.
+- Object counts walk the whole heap, so a background task refreshes them
+  every MEMORY_GAUGE_INTERVAL seconds and /metrics reports the cached values;
+  RSS is cheap and read at scrape time (current RSS only where /proc exists,
+  peak RSS everywhere).
+"""
+
+import gc
+import glob
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from flask import g, request
+
+# Types whose live instance counts are always reported
+WATCHED_TYPES = ('Shipment', 'Task', 'User', 'Connection', 'Cursor', 'Row', 'dict', 'list', 'tuple')
+TOP_TYPES = 10
+
+_state = {'pid': None, 'task': None}
+_state_lock = threading.Lock()
+_sample_lock = threading.Lock()
+# endpoint -> (sampled requests, summed peak bytes, max peak bytes)
+_endpoint_peaks = {}
+_object_counts = {'at': None, 'total': 0, 'by_type': {}}
+
+# Allocations made by tracemalloc and the import system are noise in diffs
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+def start_tracing(frames=1):
+    """Start tracemalloc with `frames` frames of traceback per allocation"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return tracing_status()
+
+def stop_tracing():
+    """Stop tracemalloc and free its traces"""
+    tracemalloc.stop()
+    return tracing_status()
+
+def tracing_status():
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'pid': os.getpid(),
+        'tracing': tracemalloc.is_tracing(),
+        'frames': tracemalloc.get_traceback_limit(),
+        'traced_bytes': current,
+        'peak_bytes': peak,
+    }
+
+def take_snapshot(directory):
+    """Dump a tracemalloc snapshot of this process; returns its file name"""
+    if not tracemalloc.is_tracing():
+        raise ValueError("tracemalloc is not running")
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}.snap"
+    tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS).dump(os.path.join(directory, name))
+    return name
+
+def list_snapshots(directory):
+    """Saved snapshots, oldest first"""
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.snap')), key=os.path.getmtime):
+        stat = os.stat(path)
+        entries.append({
+            'name': os.path.basename(path),
+            'size': stat.st_size,
+            'modified': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(stat.st_mtime)),
+        })
+    return entries
+
+def _load_snapshot(directory, name):
+    path = os.path.join(directory, os.path.basename(name))
+    if not name.endswith('.snap') or not os.path.isfile(path):
+        raise ValueError(f"Unknown snapshot: {name}")
+    return tracemalloc.Snapshot.load(path)
+
+def diff_snapshots(directory, first, second, group_by='lineno', limit=25):
+    """Top allocation changes from snapshot `first` to `second`"""
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        raise ValueError(f"Unsupported grouping: {group_by}")
+    older = _load_snapshot(directory, first)
+    newer = _load_snapshot(directory, second)
+    stats = newer.compare_to(older, group_by)
+    return [{
+        'location': [f'{frame.filename}:{frame.lineno}' for frame in stat.traceback],
+        'size_bytes': stat.size,
+        'size_diff_bytes': stat.size_diff,
+        'count': stat.count,
+        'count_diff': stat.count_diff,
+    } for stat in stats[:limit]]
+
+def endpoint_peaks():
+    """Sampled requests and their peak allocation per endpoint"""
+    return {endpoint: {'samples': samples, 'mean_peak_bytes': total // samples, 'max_peak_bytes': peak}
+            for endpoint, (samples, total, peak) in dict(_endpoint_peaks).items()}
+
+def resident_memory():
+    """Current RSS in bytes, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_resident_memory():
+    """Highest RSS this process has reached, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak * 1024 if sys.platform.startswith('linux') else peak
+
+def count_objects():
+    """Count gc-tracked objects by type name; walks the whole heap"""
+    by_type = {}
+    objects = gc.get_objects()
+    for obj in objects:
+        name = type(obj).__name__
+        by_type[name] = by_type.get(name, 0) + 1
+    top = sorted(by_type.items(), key=lambda item: item[1], reverse=True)[:TOP_TYPES]
+    reported = dict(top)
+    for name in WATCHED_TYPES:
+        reported[name] = by_type.get(name, 0)
+    _object_counts.update(at=time.time(), total=len(objects), by_type=reported)
+    return reported
+
+def start_object_counter(interval):
+    """Refresh object counts periodically in this process (again after fork)"""
+    from utils.scheduler import PeriodicTask
+
+    if not interval:
+        return None
+    if _state['pid'] == os.getpid():
+        return _state['task']
+    with _state_lock:
+        if _state['pid'] != os.getpid():
+            task = PeriodicTask('object-counter', interval, count_objects, run_immediately=True).start()
+            _state.update(pid=os.getpid(), task=task)
+        return _state['task']
+
+def _object_gauges():
+    return {(('type', name),): count for name, count in _object_counts['by_type'].items()}
+
+def configure_memory(app):
+    """Install request allocation sampling and export memory gauges to /metrics"""
+    from utils.metrics import register_counter, register_gauge
+
+    config = app.config
+    if config.get('MEMORY_TRACEMALLOC_FRAMES'):
+        start_tracing(config['MEMORY_TRACEMALLOC_FRAMES'])
+
+    register_gauge('process_resident_memory_bytes',
+                   lambda: {(): rss} if (rss := resident_memory()) is not None else {})
+    register_gauge('process_peak_resident_memory_bytes', lambda: {(): peak_resident_memory()})
+    register_gauge('python_gc_objects', lambda: {(): _object_counts['total']} if _object_counts['at'] else {})
+    register_gauge('python_objects', _object_gauges)
+    # Sums rather than maxima, so workers add up; sum / count is the mean peak
+    register_counter('memory_sampled_requests_total', lambda: {
+        (('endpoint', endpoint),): samples for endpoint, (samples, _, _) in dict(_endpoint_peaks).items()})
+    register_counter('memory_request_peak_bytes_total', lambda: {
+        (('endpoint', endpoint),): total for endpoint, (_, total, _) in dict(_endpoint_peaks).items()})
+
+    @app.before_request
+    def begin_allocation_sample():
+        start_object_counter(config.get('MEMORY_GAUGE_INTERVAL', 0))
+        rate = config.get('MEMORY_SAMPLE_RATE', 0.0)
+        if rate <= 0 or not tracemalloc.is_tracing() or random.random() >= rate:
+            return
+        # One sampled request per process at a time: the peak is process-wide
+        if not _sample_lock.acquire(blocking=False):
+            return
+        g.memory_baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    @app.teardown_request
+    def end_allocation_sample(exc=None):
+        baseline = g.pop('memory_baseline', None)
+        if baseline is None:
+            return
+        try:
+            if tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                endpoint = request.endpoint or 'none'
+                samples, total, largest = _endpoint_peaks.get(endpoint, (0, 0, 0))
+                _endpoint_peaks[endpoint] = (samples + 1, total + peak, max(largest, peak))
+        finally:
+            _sample_lock.release()
@@ -0,0 +1,377 @@
+"""
+Prometheus metrics served at /metrics
+
+Counters and histograms live in per-thread shards: a request thread only ever
+updates its own dicts, so recording takes no lock, and a scrape copies each
+shard (a dict copy is atomic under the GIL) without stopping anyone. Shards of
+finished threads fold into a retired shard so totals never go backwards.
+
+With several worker processes (`flask serve`) each worker writes a snapshot
+file to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds, and whichever
+worker answers a scrape sums every file, its own freshly written. Files of
+workers that have exited are folded into retired.json, so their requests stay
+counted; their gauges are dropped.
+"""
+
+import bisect
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from flask import g, request
+
+# Latency buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by endpoint, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint.'),
+    'http_requests_in_flight': ('gauge', 'Requests being handled right now.'),
+    'db_queries_total': ('counter', 'SQL statements run through execute_query, by kind.'),
+    'db_query_duration_seconds': ('histogram', 'SQL statement latency by kind.'),
+    'db_connections': ('gauge', 'Open SQLite connections by kind.'),
+    'db_connections_opened_total': ('counter', 'SQLite connections opened, by kind.'),
+    'db_connections_closed_total': ('counter', 'SQLite connections closed, by kind.'),
+    'cache_hits_total': ('counter', 'Cache lookups that hit, by cache.'),
+    'cache_misses_total': ('counter', 'Cache lookups that missed, by cache.'),
+    'cache_hit_ratio': ('gauge', 'Hits over lookups since start, by cache.'),
+    'log_queue_depth': ('gauge', 'Log records waiting for the writer thread.'),
+    'log_records_dropped_total': ('counter', 'Log records dropped because the queue was full.'),
+    'traces_emitted_total': ('counter', 'Sampled request traces logged.'),
+    'server_busy_threads': ('gauge', 'Worker request threads handling a connection.'),
+    'server_threads': ('gauge', 'Worker request threads.'),
+    'process_resident_memory_bytes': ('gauge', 'Resident set size of each worker, summed (Linux only).'),
+    'process_peak_resident_memory_bytes': ('gauge', 'Peak resident set size of each worker, summed.'),
+    'python_gc_objects': ('gauge', 'Objects tracked by the garbage collector.'),
+    'python_objects': ('gauge', 'Live gc-tracked objects of watched and most common types.'),
+    'memory_request_peak_bytes_total': ('counter', 'Summed allocation peaks of sampled requests, by endpoint.'),
+    'memory_sampled_requests_total': ('counter', 'Requests sampled for allocation peaks, by endpoint.'),
+    'app_users': ('gauge', 'Registered users.'),
+    'app_shipments': ('gauge', 'Stored shipments by status.'),
+}
+
+class _Shard:
+    """One thread's counters and histograms"""
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def merge(self, counters, histograms):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, buckets in histograms.items():
+            merged = self.histograms.get(key)
+            if merged is None:
+                self.histograms[key] = list(buckets)
+            else:
+                for index, value in enumerate(buckets):
+                    merged[index] += value
+
+class _ShardOwner:
+    """Lives in a thread's local storage; retires the shard when the thread ends"""
+    __slots__ = ('shard', 'pid')
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.pid = os.getpid()
+
+    def __del__(self):
+        # A forked child drops the parent's thread locals; those counts stay the parent's
+        if self.pid != os.getpid():
+            return
+        with _registry_lock:
+            _retired.merge(dict(self.shard.counters), dict(self.shard.histograms))
+            _shards.discard(self.shard)
+
+_local = threading.local()
+_shards = set()
+_retired = _Shard()
+# Taken only when a thread records its first metric or exits, and by scrapes
+_registry_lock = threading.RLock()
+# name -> callable returning {labels tuple: value}, evaluated at snapshot time
+_process_gauges = {}
+_process_counters = {}
+
+def _shard():
+    owner = getattr(_local, 'owner', None)
+    if owner is None:
+        shard = _Shard()
+        with _registry_lock:
+            _shards.add(shard)
+        owner = _local.owner = _ShardOwner(shard)
+    return owner.shard
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+def inc(name, value=1, **labels):
+    """Add to a counter"""
+    counters = _shard().counters
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    """Record one histogram observation"""
+    histograms = _shard().histograms
+    key = _key(name, labels)
+    buckets = histograms.get(key)
+    if buckets is None:
+        # One slot per bucket, one for +Inf, then the running sum
+        buckets = histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+    buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+    buckets[-1] += seconds
+
+def register_gauge(name, func):
+    """Report func() -> {labels dict as tuple: value} as a per-process gauge"""
+    _process_gauges[name] = func
+
+def register_counter(name, func):
+    """Report a counter kept elsewhere in this process (e.g. cache hit totals)"""
+    _process_counters[name] = func
+
+def _reset_after_fork():
+    global _local, _shards, _retired, _registry_lock
+    # The parent's counts belong to the parent; a worker starts from zero
+    _local = threading.local()
+    _shards = set()
+    _retired = _Shard()
+    _registry_lock = threading.RLock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def snapshot():
+    """This process's metrics as plain data: counters, histograms and gauges"""
+    with _registry_lock:
+        shards = list(_shards)
+        merged = _Shard()
+        merged.merge(dict(_retired.counters), dict(_retired.histograms))
+    for shard in shards:
+        merged.merge(dict(shard.counters), dict(shard.histograms))
+    for name, func in list(_process_counters.items()):
+        for labels, value in func().items():
+            key = (name, labels)
+            merged.counters[key] = merged.counters.get(key, 0) + value
+    started = merged.counters.pop(('http_requests_started_total', ()), 0)
+    finished = merged.counters.pop(('http_requests_finished_total', ()), 0)
+    gauges = {('http_requests_in_flight', ()): started - finished}
+    for (name, labels), opened in list(merged.counters.items()):
+        if name == 'db_connections_opened_total':
+            closed = merged.counters.get(('db_connections_closed_total', labels), 0)
+            gauges[('db_connections', labels)] = opened - closed
+    for name, func in list(_process_gauges.items()):
+        for labels, value in func().items():
+            gauges[(name, labels)] = value
+    return {
+        'counters': [[name, labels, value] for (name, labels), value in merged.counters.items()],
+        'histograms': [[name, labels, buckets] for (name, labels), buckets in merged.histograms.items()],
+        'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+    }
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def flush(directory):
+    """Write this process's snapshot for the other workers' scrapes"""
+    os.makedirs(directory, exist_ok=True)
+    _write(os.path.join(directory, f'{os.getpid()}.json'), snapshot())
+
+def reset_directory(directory):
+    """Remove snapshots left by an earlier server run"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _combine(snapshots, include_gauges=True):
+    """Sum snapshots into {(name, labels): value} maps"""
+    counters, histograms, gauges = {}, {}, {}
+    for data in snapshots:
+        for name, labels, value in data['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets in data['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [0] * len(buckets))
+            for index, value in enumerate(buckets):
+                merged[index] += value
+        if include_gauges:
+            for name, labels, value in data['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+def collect(directory=None):
+    """Metrics of every worker process (or just this one without a directory)"""
+    if not directory:
+        return _with_ratios(*_combine([snapshot()]))
+    flush(directory)
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(directory, 'retired.json')
+        retired = _load(retired_path) or {'counters': [], 'histograms': [], 'gauges': []}
+        live, dead_paths = [], []
+        for path in glob.glob(os.path.join(directory, '[0-9]*.json')):
+            data = _load(path)
+            if data is None:
+                continue
+            if _alive(int(os.path.basename(path).split('.')[0])):
+                live.append(data)
+            else:
+                retired = _fold(retired, data)
+                dead_paths.append(path)
+        if dead_paths:
+            _write(retired_path, retired)
+            for path in dead_paths:
+                os.remove(path)
+    counters, histograms, _ = _combine([retired], include_gauges=False)
+    live_counters, live_histograms, gauges = _combine(live)
+    for key, value in live_counters.items():
+        counters[key] = counters.get(key, 0) + value
+    for key, buckets in live_histograms.items():
+        merged = histograms.setdefault(key, [0] * len(buckets))
+        for index, value in enumerate(buckets):
+            merged[index] += value
+    return _with_ratios(counters, histograms, gauges)
+
+def _with_ratios(counters, histograms, gauges):
+    """Add cache_hit_ratio gauges computed from the summed hit and miss counters"""
+    for (name, labels), hits in list(counters.items()):
+        if name == 'cache_hits_total':
+            lookups = hits + counters.get(('cache_misses_total', labels), 0)
+            gauges[('cache_hit_ratio', labels)] = round(hits / lookups, 4) if lookups else 0.0
+    return counters, histograms, gauges
+
+def _fold(retired, data):
+    """Add a dead worker's counters and histograms to the retired totals"""
+    counters, histograms, _ = _combine([retired, data], include_gauges=False)
+    return {
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        'histograms': [[name, labels, buckets] for (name, labels), buckets in histograms.items()],
+        'gauges': [],
+    }
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def render(counters, histograms, gauges):
+    """Prometheus text exposition format (0.0.4)"""
+    series = {}
+    for (name, labels), value in sorted(counters.items()) + sorted(gauges.items()):
+        series.setdefault(name, []).append(f'{name}{_labels(labels)} {value}')
+    for (name, labels), buckets in sorted(histograms.items()):
+        lines = series.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), buckets[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {buckets[-1]}')
+        lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+
+    output = []
+    for name in sorted(series):
+        kind, help_text = METRICS.get(name, ('untyped', ''))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(series[name])
+    return '\n'.join(output) + '\n'
+
+def configure_metrics(app):
+    """Time every request and report caches and the log queue of this process"""
+    from utils.idempotency import recent_keys
+    from utils.tracing import tracing_stats
+
+    fragments = app.jinja_env.fragment_cache
+    register_counter('cache_hits_total', lambda: {
+        (('cache', 'template_fragment'),): fragments.hits,
+        (('cache', 'idempotency'),): recent_keys.hits,
+    })
+    register_counter('cache_misses_total', lambda: {
+        (('cache', 'template_fragment'),): fragments.misses,
+        (('cache', 'idempotency'),): recent_keys.misses,
+    })
+    register_counter('log_records_dropped_total', lambda: {(): tracing_stats()['dropped']})
+    register_counter('traces_emitted_total', lambda: {(): tracing_stats()['traces']})
+    register_gauge('log_queue_depth', lambda: {(): tracing_stats()['queued']})
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        inc('http_requests_started_total')
+
+    @app.after_request
+    def remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        endpoint = request.endpoint or 'none'
+        status = g.pop('metrics_status', 500)
+        inc('http_requests_total', endpoint=endpoint, method=request.method, status=status)
+        observe('http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+        inc('http_requests_finished_total')
+
+def start_metrics_flush(app):
+    """Write this worker's snapshot to METRICS_DIR periodically"""
+    from utils.scheduler import PeriodicTask
+
+    directory = app.config.get('METRICS_DIR')
+    if not directory or not app.config.get('METRICS_FLUSH_INTERVAL'):
+        return None
+    return PeriodicTask('metrics-flush', app.config['METRICS_FLUSH_INTERVAL'],
+                        lambda: flush(directory), run_immediately=True).start()
+
+_db_stats = {'at': None, 'gauges': {}}
+
+def _database_gauges(max_age):
+    """User and shipment totals, recounted at most every max_age seconds"""
+    from database import get_db_stats
+
+    if _db_stats['at'] is None or time.monotonic() - _db_stats['at'] >= max_age:
+        stats = get_db_stats()
+        gauges = {}
+        if stats is not None:
+            gauges[('app_users', ())] = stats['users']
+            for status, count in stats['status_distribution'].items():
+                gauges[('app_shipments', (('status', status),))] = count
+        _db_stats.update(at=time.monotonic(), gauges=gauges)
+    return _db_stats['gauges']
+
+def metrics_text(config):
+    """The /metrics response body for all workers of this server"""
+    counters, histograms, gauges = collect(config.get('METRICS_DIR'))
+    # Database totals are the same from every worker, so they are not summed
+    gauges.update(_database_gauges(config.get('METRICS_DB_STATS_INTERVAL', 60)))
+    return render(counters, histograms, gauges)
@@ -0,0 +1,161 @@
+"""
+On-demand profiling of live requests
+
+Two independent tools, both writing to PROFILE_DIR:
+
+- cProfile capture of single requests, chosen by PROFILE_SAMPLE_RATE or asked
+  for by an admin with the PROFILE_HEADER request header. Each one is saved as
+  a pstats file (open with `python -m pstats` or snakeviz).
+- A statistical stack sampler: a background thread looks at every request
+  thread each PROFILE_SAMPLER_INTERVAL seconds and counts the stacks it finds
+  per endpoint. Counts are written as folded stacks (`endpoint;frame;... N`),
+  the input format of flamegraph.pl and speedscope. Request threads never
+  run any sampler code, so the overhead is one dict update per request.
+"""
+
+import cProfile
+import glob
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from flask import g, request
+from utils.decorators import is_admin
+
+_state = {'pid': None, 'sampler': None}
+_state_lock = threading.Lock()
+# thread id -> endpoint, for threads inside a request
+_active = {}
+# (endpoint, folded stack) -> samples; only the sampler thread writes it
+_stacks = {}
+
+MAX_STACK_DEPTH = 64
+
+def _folded_stack(frame):
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def sample_stacks():
+    """Count the current stack of every thread that is handling a request"""
+    frames = sys._current_frames()
+    for thread_id, endpoint in list(_active.items()):
+        frame = frames.get(thread_id)
+        if frame is not None:
+            key = (endpoint, _folded_stack(frame))
+            _stacks[key] = _stacks.get(key, 0) + 1
+
+def write_stacks(directory):
+    """Write this process's folded stack counts; returns the file path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'stacks-{os.getpid()}.folded')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        for (endpoint, stack), count in sorted(dict(_stacks).items()):
+            f.write(f'{endpoint};{stack} {count}\n')
+    os.replace(tmp_path, path)
+    return path
+
+def start_sampler(interval, directory, flush_interval):
+    """Start this process's sampler thread (again after fork, where threads are lost)"""
+    from utils.scheduler import PeriodicTask
+
+    if not interval:
+        return None
+    if _state['pid'] == os.getpid():
+        return _state['sampler']
+    with _state_lock:
+        if _state['pid'] == os.getpid():
+            return _state['sampler']
+        _active.clear()
+        _stacks.clear()
+        last_write = [time.monotonic()]
+
+        def tick():
+            sample_stacks()
+            if time.monotonic() - last_write[0] >= flush_interval:
+                write_stacks(directory)
+                last_write[0] = time.monotonic()
+
+        sampler = PeriodicTask('stack-sampler', interval, tick).start()
+        _state.update(pid=os.getpid(), sampler=sampler)
+        return sampler
+
+def sampler_running():
+    """Whether this process has a stack sampler thread"""
+    return _state['pid'] == os.getpid()
+
+def stop_sampler():
+    """Stop this process's sampler thread"""
+    with _state_lock:
+        if _state['pid'] == os.getpid():
+            _state['sampler'].stop()
+            _state.update(pid=None, sampler=None)
+
+def _prune(directory, keep):
+    profiles = sorted(glob.glob(os.path.join(directory, '*.prof')), key=os.path.getmtime)
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        os.remove(path)
+
+def save_profile(profiler, directory, endpoint, keep=200):
+    """Dump one request's cProfile stats; returns the file name"""
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}.prof"
+    profiler.dump_stats(os.path.join(directory, name))
+    _prune(directory, keep)
+    return name
+
+def list_profiles(directory):
+    """Saved request profiles and stack files, newest first"""
+    entries = []
+    for path in glob.glob(os.path.join(directory, '*.prof')) + glob.glob(os.path.join(directory, '*.folded')):
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        entries.append({
+            'name': name,
+            'kind': 'cprofile' if name.endswith('.prof') else 'stacks',
+            'size': stat.st_size,
+            'modified': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(stat.st_mtime)),
+        })
+    return sorted(entries, key=lambda entry: entry['modified'], reverse=True)
+
+def configure_profiling(app):
+    """Install per-request cProfile capture and stack sampler bookkeeping on the app"""
+    config = app.config
+
+    @app.before_request
+    def begin_profile():
+        start_sampler(config.get('PROFILE_SAMPLER_INTERVAL', 0), config['PROFILE_DIR'],
+                      config.get('PROFILE_SAMPLER_FLUSH_INTERVAL', 30))
+        if sampler_running():
+            _active[threading.get_ident()] = request.endpoint or 'none'
+
+        requested = request.headers.get(config.get('PROFILE_HEADER', 'X-Profile')) == '1' and is_admin()
+        rate = config.get('PROFILE_SAMPLE_RATE', 0.0)
+        if requested or (rate > 0 and random.random() < rate):
+            # cProfile hooks only the calling thread, so other requests run unprofiled
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def end_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            name = save_profile(profiler, config['PROFILE_DIR'], request.endpoint or 'none',
+                                config.get('PROFILE_MAX_FILES', 200))
+            response.headers['X-Profile-Id'] = name
+        return response
+
+    @app.teardown_request
+    def forget_request(exc=None):
+        _active.pop(threading.get_ident(), None)
+        # A request that failed before after_request still has its profiler running
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
@@ -0,0 +1,42 @@
+import threading
+from utils.tracing import log
+
+class PeriodicTask:
+    """Run a function every N seconds on a daemon thread until stopped"""
+
+    def __init__(self, name, interval, func, run_immediately=False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_immediately = run_immediately
+        self.runs = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        if self.run_immediately:
+            self._run_once()
+        # Event.wait doubles as an interruptible sleep
+        while not self._stop.wait(self.interval):
+            self._run_once()
+
+    def _run_once(self):
+        try:
+            self.func()
+            self.runs += 1
+        except Exception as e:
+            self.last_error = e
+            log.exception("Error in periodic task %s", self.name)
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from importlib import import_module
+import sys
+import time
+
+class StartupProfile:
+    """Wall-clock timings for the phases of create_app()"""
+
+    def __init__(self):
+        self.phases = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block and record it under name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - start) * 1000))
+
+    @property
+    def total_ms(self):
+        return sum(ms for _, ms in self.phases)
+
+    def to_dict(self):
+        return {
+            'phases': [{'name': name, 'ms': round(ms, 3)} for name, ms in self.phases],
+            'total_ms': round(self.total_ms, 3),
+        }
+
+class LazyView:
+    """View that imports its implementation on the first request it serves"""
+
+    def __init__(self, import_name):
+        self.import_name = import_name
+        self.__name__ = import_name.rsplit('.', 1)[1]
+        self._view = None
+
+    @property
+    def view(self):
+        if self._view is None:
+            module, name = self.import_name.rsplit('.', 1)
+            self._view = getattr(import_module(module), name)
+        return self._view
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
+
+def add_lazy_rules(blueprint, module, rules):
+    """Register (rule, view name, methods) triples whose views live in module"""
+    for rule, name, methods in rules:
+        blueprint.add_url_rule(rule, view_func=LazyView(f'{module}.{name}'), methods=methods)
+
+def parse_importtime(output):
+    """Parse `python -X importtime` stderr into (module, self_us, cumulative_us, depth) tuples"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # column header
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return modules
+
+def profile_imports(statement='import app', cwd=None):
+    """Run statement in a fresh interpreter with -X importtime and parse the report"""
+    import subprocess
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Import profiling failed: {result.stderr.strip().splitlines()[-1:]}")
+    return parse_importtime(result.stderr)
@@ -0,0 +1,110 @@
+"""
+Template rendering caches
+
+`{% cache 'name', key, ... %}...{% endcache %}` keeps the rendered markup of
+a block in a per-environment LRU, keyed by the tag's arguments. Keys must
+name everything the block shows: shipment cards use the id and row version,
+so any save renders a fresh card and stale entries simply age out.
+
+Compiled templates go to an on-disk bytecode cache, and `warm_templates`
+compiles them all up front: the `flask serve` master does so before forking,
+so workers start with every template loaded and a re-exec or cold start
+reads bytecode instead of recompiling.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError, nodes
+from jinja2.ext import Extension
+from utils.tracing import log
+
+class FragmentCache:
+    """Thread-safe LRU of rendered template fragments"""
+
+    def __init__(self, size=2048):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            markup = self._entries.get(key)
+            if markup is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return markup
+
+    def put(self, key, markup):
+        with self._lock:
+            self._entries[key] = markup
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+class FragmentCacheExtension(Extension):
+    """Jinja `cache` tag backed by the environment's FragmentCache"""
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.Tuple(key, 'load')]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        cache = self.environment.fragment_cache
+        if has_app_context():
+            cache.size = current_app.config.get('TEMPLATE_FRAGMENT_CACHE_SIZE', cache.size)
+        if not cache.size:
+            return caller()
+        markup = cache.get(key)
+        if markup is None:
+            markup = caller()
+            cache.put(key, markup)
+        return markup
+
+def configure_templates(app):
+    """Install the fragment cache tag and the bytecode cache (before jinja_env is first used)"""
+    options = dict(app.jinja_options)
+    options['extensions'] = [*options.get('extensions', ()), FragmentCacheExtension]
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # No directory = Jinja's private per-user temp dir
+        options['bytecode_cache'] = FileSystemBytecodeCache(directory or None)
+    app.jinja_options = options
+
+def warm_templates(app):
+    """Compile every template now, filling the bytecode cache; returns how many compiled"""
+    env = app.jinja_env
+    compiled = 0
+    for name in env.list_templates(extensions=('html',)):
+        try:
+            env.get_template(name)
+            compiled += 1
+        except TemplateSyntaxError:
+            # Left for the request that renders it to report
+            log.exception("Error compiling template %s", name)
+    return compiled
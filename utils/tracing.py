@@ -0,0 +1,276 @@
+"""
+Structured logging and sampled request tracing
+
+`log` is the application logger. Its records go through a bounded queue to a
+listener thread that writes one JSON object per line, so a request never
+waits on stdout; when the queue is full records are dropped and counted
+instead of blocking the request.
+
+A sampled request (TRACE_SAMPLE_RATE) collects spans for the request itself,
+model calls, SQL statements and template renders, and emits them as a single
+`trace` record when it ends, at most TRACE_MAX_SPANS of them. On unsampled
+requests each span site costs one context variable lookup.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
+from flask import before_render_template, g, request, template_rendered
+
+log = logging.getLogger('shipment_manager')
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+_NO_SPAN = nullcontext()
+_WHITESPACE = re.compile(r'\s+')
+
+class Span:
+    """A timed operation inside a trace"""
+    __slots__ = ('trace', 'index', 'start')
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.index = trace._open(name, attrs)
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace._close(self, exc_type)
+        return False
+
+class Trace:
+    """The spans recorded for one sampled request"""
+
+    def __init__(self, max_spans=200):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+        self._stack = []
+
+    def span(self, name, **attrs):
+        """Open a span nested in the innermost open one; close it with `with` or _close"""
+        span = Span(self, name, attrs)
+        self._stack.append(span)
+        return span
+
+    def annotate(self, **attrs):
+        """Add attributes to the innermost open span"""
+        for span in reversed(self._stack):
+            if span.index is not None:
+                self.spans[span.index]['attrs'].update(attrs)
+                return
+
+    def _open(self, name, attrs):
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        parent = next((span.index for span in reversed(self._stack) if span.index is not None), None)
+        self.spans.append({'name': name, 'parent': parent, 'attrs': attrs,
+                           'start_ms': round((time.perf_counter() - self.started) * 1000, 3)})
+        return len(self.spans) - 1
+
+    def _close(self, span, exc_type=None):
+        if span in self._stack:
+            # Spans left open by an exception inside this one close with it
+            while self._stack.pop() is not span:
+                pass
+        if span.index is not None:
+            record = self.spans[span.index]
+            record['duration_ms'] = round((time.perf_counter() - span.start) * 1000, 3)
+            if exc_type is not None:
+                record['attrs']['error'] = exc_type.__name__
+
+    def finish(self):
+        """Close whatever is still open and return the trace as a dict"""
+        while self._stack:
+            self._close(self._stack[-1])
+        return {'trace_id': self.trace_id, 'spans': self.spans, 'dropped_spans': self.dropped}
+
+def current_trace():
+    return _current_trace.get()
+
+def span(name, **attrs):
+    """Context manager timing `name` in the current trace (a no-op when unsampled)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return trace.span(name, **attrs)
+
+def sql_span(query, shard_key=None):
+    """Span for one SQL statement, labelled with its first line of text"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    statement = _WHITESPACE.sub(' ', query).strip()[:120]
+    return trace.span('sql', statement=statement, shard=shard_key)
+
+def annotate(**attrs):
+    """Attach attributes to the innermost open span of a sampled request"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.annotate(**attrs)
+
+def traced(f):
+    """Decorator recording each call of a model method as a span"""
+    name = f.__qualname__
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        trace = _current_trace.get()
+        if trace is None:
+            return f(*args, **kwargs)
+        with trace.span(name):
+            return f(*args, **kwargs)
+    return decorated_function
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage(),
+        }
+        for name in ('trace_id', 'trace'):
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record and counts it"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Runs on the calling thread: resolve everything the listener cannot see
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, 'trace_id', None) is None:
+            trace = _current_trace.get()
+            record.trace_id = trace.trace_id if trace is not None else None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_state = {'pid': None, 'handler': None, 'listener': None, 'traces': 0}
+_state_lock = threading.Lock()
+
+def start_logging(queue_size=10000, level='INFO', stream=None):
+    """Route `log` through a fresh queue and listener thread owned by this process"""
+    if _state['pid'] == os.getpid():
+        return _state['handler']
+    with _state_lock:
+        if _state['pid'] == os.getpid():
+            return _state['handler']
+        # A forked child inherits the handler but not the listener thread
+        if _state['handler'] is not None:
+            log.removeHandler(_state['handler'])
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        listener = QueueListener(handler.queue, output, respect_handler_level=False)
+        listener.start()
+        log.addHandler(handler)
+        log.setLevel(level)
+        log.propagate = False
+        _state.update(pid=os.getpid(), handler=handler, listener=listener, traces=0)
+        return handler
+
+def stop_logging():
+    """Flush queued records and stop this process's listener"""
+    with _state_lock:
+        if _state['pid'] != os.getpid():
+            return
+        _state['listener'].stop()
+        log.removeHandler(_state['handler'])
+        _state.update(pid=None, handler=None, listener=None)
+
+atexit.register(stop_logging)
+
+def tracing_stats():
+    """Queue depth, dropped records and emitted traces for this process"""
+    handler = _state['handler'] if _state['pid'] == os.getpid() else None
+    return {
+        'queued': handler.queue.qsize() if handler else 0,
+        'dropped': handler.dropped if handler else 0,
+        'traces': _state['traces'],
+    }
+
+def configure_tracing(app):
+    """Install JSON logging and per-request trace sampling on the app"""
+    config = app.config
+
+    def ensure_logging():
+        start_logging(config.get('LOG_QUEUE_SIZE', 10000), config.get('LOG_LEVEL', 'INFO'))
+
+    @app.before_request
+    def begin_trace():
+        ensure_logging()
+        rate = config.get('TRACE_SAMPLE_RATE', 0.0)
+        if rate <= 0 or random.random() >= rate:
+            return
+        trace = Trace(config.get('TRACE_MAX_SPANS', 200))
+        g.trace_token = _current_trace.set(trace)
+        trace.span('request', endpoint=request.endpoint, method=request.method, path=request.path)
+
+    @app.after_request
+    def annotate_status(response):
+        annotate(status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def end_trace(exc=None):
+        token = g.pop('trace_token', None)
+        if token is None:
+            return
+        trace = _current_trace.get()
+        _current_trace.reset(token)
+        if exc is not None:
+            trace.annotate(error=type(exc).__name__)
+        log.info('trace', extra={'trace': trace.finish(), 'trace_id': trace.trace_id})
+        _state['traces'] += 1
+
+    def render_started(sender, template, context, **extra):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.span('render', template=template.name)
+
+    def render_finished(sender, template, context, **extra):
+        trace = _current_trace.get()
+        if trace is not None and trace._stack:
+            trace._close(trace._stack[-1])
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+    ensure_logging()
@@ -1,3 +1,6 @@
+from datetime import datetime
+from models.enums import STATUS_NAMES, PRIORITY_NAMES
+
 def validate_shipment_data(form_data):
     """Validate shipment form data"""
     errors = []
@@ -44,13 +47,11 @@ def validate_shipment_data(form_data):
             errors.append('Weight must be a valid number!')
     
     # Status validation
-    valid_statuses = ['pending', 'picked_up', 'in_transit', 'out_for_delivery', 'delivered', 'returned']
-    if status not in valid_statuses:
+    if status not in STATUS_NAMES:
         errors.append('Invalid status selected!')
     
     # Priority validation
-    valid_priorities = ['standard', 'priority', 'urgent']
-    if priority not in valid_priorities:
+    if priority not in PRIORITY_NAMES:
         errors.append('Invalid priority selected!')
     
     # Package description validation
@@ -60,6 +61,24 @@ def validate_shipment_data(form_data):
     
     return errors
 
+def validate_date_range(date_from, date_to):
+    """Validate optional YYYY-MM-DD date range filters"""
+    errors = []
+    parsed = {}
+    
+    for label, value in (('Start date', date_from), ('End date', date_to)):
+        if not value:
+            continue
+        try:
+            parsed[label] = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            errors.append(f'{label} must be in YYYY-MM-DD format!')
+    
+    if len(parsed) == 2 and parsed['Start date'] > parsed['End date']:
+        errors.append('Start date must be before end date!')
+    
+    return errors
+
 def validate_task_data(form_data):
     """Validate task form data"""
     errors = []